@@ -0,0 +1,16 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """The cron is triggered at the autoclose deadlines, so the periodic run
+    is only kept as a daily fallback.
+    """
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    cron = env.ref(
+        "hr_attendance_autoclose.check_attendance_cron", raise_if_not_found=False
+    )
+    if cron:
+        cron.write({"interval_number": 1, "interval_type": "days"})
+    env["hr.attendance"]._schedule_autoclose()
@@ -1,9 +1,26 @@
 # Copyright 2018 ForgeFlow, S.L.
 # License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
 
+from collections import defaultdict
 from datetime import datetime, timedelta
 
 from odoo import api, fields, models
+from odoo.tools import SQL
+
+# Open attendances to close automatically, with their deadline
+AUTOCLOSE_FROM = SQL(
+    """
+    FROM hr_attendance AS a
+    INNER JOIN hr_employee AS e ON e.id = a.employee_id
+    INNER JOIN res_company AS c ON c.id = e.company_id
+    WHERE a.check_out IS NULL
+    AND c.attendance_maximum_hours_per_day > 0
+    AND NOT coalesce(e.no_autoclose, FALSE)
+    """
+)
+AUTOCLOSE_DEADLINE = SQL(
+    "a.check_in + c.attendance_maximum_hours_per_day * interval '1 hour'"
+)
 
 
 class HrAttendance(models.Model):
@@ -23,12 +40,21 @@ class HrAttendance(models.Model):
 
     def autoclose_attendance(self, reason):
         self.ensure_one()
-        max_hours = self.employee_id.company_id.attendance_maximum_hours_per_day
-        leave_time = self.check_in + timedelta(hours=max_hours)
-        vals = {"check_out": leave_time}
-        if reason:
-            vals["attendance_reason_ids"] = [(4, reason.id)]
-        self.write(vals)
+        self._autoclose_attendances(reason)
+
+    def _autoclose_attendances(self, reason):
+        """Close the attendances at the maximum hours of their company, with
+        a single write for all the attendances closed at the same time.
+        """
+        ids_by_leave_time = defaultdict(list)
+        for att in self:
+            max_hours = att.employee_id.company_id.attendance_maximum_hours_per_day
+            ids_by_leave_time[att.check_in + timedelta(hours=max_hours)].append(att.id)
+        for leave_time, ids in ids_by_leave_time.items():
+            vals = {"check_out": leave_time}
+            if reason:
+                vals["attendance_reason_ids"] = [(4, reason.id)]
+            self.browse(ids).write(vals)
 
     def needs_autoclose(self):
         self.ensure_one()
@@ -36,12 +62,118 @@ class HrAttendance(models.Model):
         close = not self.employee_id.no_autoclose
         return close and max_hours and self.open_worked_hours > max_hours
 
+    @api.model
+    def _flush_autoclose(self):
+        self.flush_model(["employee_id", "check_in", "check_out"])
+        self.env["hr.employee"].flush_model(["company_id", "no_autoclose"])
+        self.env["res.company"].flush_model(["attendance_maximum_hours_per_day"])
+
+    @api.model
+    def _get_autoclose_candidates(self):
+        """Select with a single query the open attendances exceeding the
+        maximum hours of the company of their employee, unless the employee
+        is excluded from the automatic closing.
+
+        :return: Dictionary of attendances by company.
+        """
+        self._flush_autoclose()
+        self.env.cr.execute(
+            SQL(
+                """
+                SELECT e.company_id, array_agg(a.id ORDER BY a.id)
+                %s AND %s < %s
+                GROUP BY e.company_id
+                """,
+                AUTOCLOSE_FROM,
+                AUTOCLOSE_DEADLINE,
+                fields.Datetime.now(),
+            )
+        )
+        return {
+            self.env["res.company"].browse(company_id): self.browse(ids)
+            for company_id, ids in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def _get_autoclose_deadline(self):
+        """Get the earliest time when an open attendance has to be closed
+        automatically, or None if there isn't any.
+        """
+        self._flush_autoclose()
+        self.env.cr.execute(
+            SQL("SELECT min(%s) %s", AUTOCLOSE_DEADLINE, AUTOCLOSE_FROM)
+        )
+        return self.env.cr.fetchone()[0]
+
+    def _get_autoclose_deadlines(self):
+        """Get the times when these attendances have to be closed
+        automatically, skipping the ones that don't.
+        """
+        deadlines = []
+        for att in self.sudo():
+            employee = att.employee_id
+            max_hours = employee.company_id.attendance_maximum_hours_per_day
+            if att.check_out or not max_hours or employee.no_autoclose:
+                continue
+            deadlines.append(att.check_in + timedelta(hours=max_hours))
+        return deadlines
+
+    @api.model
+    def _schedule_autoclose(self, deadline=None):
+        """Trigger the autoclose cron at the given deadline, by default the
+        earliest one of the open attendances, unless the cron is already
+        triggered before it. Each run schedules the next deadline, so a later
+        deadline doesn't need a trigger of its own.
+        """
+        if deadline is None:
+            deadline = self._get_autoclose_deadline()
+        cron = self.env.ref(
+            "hr_attendance_autoclose.check_attendance_cron", raise_if_not_found=False
+        )
+        if not deadline or not cron:
+            return
+        now = fields.Datetime.now()
+        if (
+            self.env["ir.cron.trigger"]
+            .sudo()
+            .search_count(
+                [
+                    ("cron_id", "=", cron.id),
+                    ("call_at", ">=", now),
+                    ("call_at", "<=", deadline),
+                ],
+                limit=1,
+            )
+        ):
+            return
+        cron.sudo()._trigger(max(deadline, now))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        deadlines = records._get_autoclose_deadlines()
+        if deadlines:
+            self._schedule_autoclose(min(deadlines))
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Closing an attendance can only delay the earliest deadline, which is
+        # then handled by the next run
+        if {"employee_id", "check_in", "check_out"} & set(vals):
+            deadlines = self._get_autoclose_deadlines()
+            if deadlines:
+                self._schedule_autoclose(min(deadlines))
+        return res
+
     @api.model
     def check_for_incomplete_attendances(self):
-        stale_attendances = self.search([("check_out", "=", False)])
-        reason = self.env.company.hr_attendance_autoclose_reason
-        for att in stale_attendances.filtered(lambda a: a.needs_autoclose()):
-            att.autoclose_attendance(reason)
+        for company, attendances in self._get_autoclose_candidates().items():
+            # In the company of the attendances, which the validity check
+            # takes the autoclose reason from
+            attendances = attendances.sudo().with_company(company)
+            attendances._autoclose_attendances(company.hr_attendance_autoclose_reason)
+        self._schedule_autoclose()
 
     @api.constrains("check_in", "check_out", "employee_id")
     def _check_validity(self):
@@ -50,8 +182,9 @@ class HrAttendance(models.Model):
         """
         reason = self.env.company.hr_attendance_autoclose_reason
         if reason and self.filtered(
-            lambda att: att.attendance_reason_ids
-            and reason in att.attendance_reason_ids
+            lambda att: (
+                att.attendance_reason_ids and reason in att.attendance_reason_ids
+            )
         ):
             return True
         return super()._check_validity()
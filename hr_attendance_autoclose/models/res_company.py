@@ -14,3 +14,9 @@ class ResCompany(models.Model):
             raise_if_not_found=False,
         ),
     )
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "attendance_maximum_hours_per_day" in vals:
+            self.env["hr.attendance"]._schedule_autoclose()
+        return res
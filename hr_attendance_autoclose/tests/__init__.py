@@ -1 +1,2 @@
 from . import test_hr_attendance_auto_close
+from . import test_benchmark
@@ -0,0 +1,26 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+from datetime import datetime, timedelta
+
+
+def create_open_attendances(env, check_in_hours, no_autoclose=None):
+    """Create an open attendance for a new employee for each of the given
+    numbers of hours elapsed since the check in.
+
+    :param no_autoclose: Optional list with the value of the `no_autoclose`
+      flag of each employee.
+    """
+    no_autoclose = no_autoclose or [False] * len(check_in_hours)
+    employees = env["hr.employee"].create(
+        [
+            {"name": f"Open employee {index}", "no_autoclose": excluded}
+            for index, excluded in enumerate(no_autoclose)
+        ]
+    )
+    now = datetime.now().replace(microsecond=0)
+    return env["hr.attendance"].create(
+        [
+            {"employee_id": employee.id, "check_in": now - timedelta(hours=hours)}
+            for employee, hours in zip(employees, check_in_hours, strict=True)
+        ]
+    )
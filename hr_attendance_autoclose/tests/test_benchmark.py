@@ -0,0 +1,49 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+import logging
+import random
+
+from odoo.tests import tagged
+
+from odoo.addons.base.tests.common import BaseCommon
+from odoo.addons.hr_attendance_reason.tests.common import measure
+
+from .common import create_open_attendances
+
+_logger = logging.getLogger(__name__)
+
+# Number of employees with an open attendance of each measured dataset
+BENCHMARK_SIZES = [50, 200, 1000]
+
+
+@tagged("-standard", "benchmark")
+class TestHrAttendanceAutocloseBenchmark(BaseCommon):
+    """Measure wall time and SQL queries of the automatic closing of
+    attendances on generated data of several sizes. Not run by default: use
+    `--test-tags benchmark`.
+    """
+
+    def test_benchmark_check_for_incomplete_attendances(self):
+        attendance_model = self.env["hr.attendance"]
+        for size in BENCHMARK_SIZES:
+            with self.env.cr.savepoint() as savepoint:
+                # Around a half of them exceeding the maximum hours, with some
+                # employees excluded from the automatic closing
+                rand = random.Random(0)
+                create_open_attendances(
+                    self.env,
+                    [rand.randint(1, 22) for __ in range(size)],
+                    [rand.random() < 0.1 for __ in range(size)],
+                )
+                duration, queries = measure(
+                    self.env, attendance_model.check_for_incomplete_attendances
+                )
+                _logger.info(
+                    "Benchmark check_for_incomplete_attendances (%s open "
+                    "attendances): %.3f s, %s queries",
+                    size,
+                    duration,
+                    queries,
+                )
+                savepoint.rollback()
+            self.env.invalidate_all()
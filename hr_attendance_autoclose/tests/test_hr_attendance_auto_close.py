@@ -10,6 +10,14 @@ from odoo.tests import new_test_user, users
 from odoo.tools import DEFAULT_SERVER_DATETIME_FORMAT as DF
 
 from odoo.addons.base.tests.common import BaseCommon
+from odoo.addons.hr_attendance_reason.tests.common import measure
+
+from .common import create_open_attendances
+
+# Maximum number of queries closing the overdue attendances
+AUTOCLOSE_MAX_QUERIES = 40
+# Queries allowed over the count of the run on half of the attendances
+QUERY_COUNT_TOLERANCE = 3
 
 
 class TestHrAttendanceReason(BaseCommon):
@@ -55,6 +63,97 @@ class TestHrAttendanceReason(BaseCommon):
         self.hr_attendance.check_for_incomplete_attendances()
         self.assertFalse(att2.attendance_reason_ids)
 
+    def test_autoclose_candidates(self):
+        recent_employee, excluded = self.env["hr.employee"].create(
+            [{"name": "Recent"}, {"name": "Excluded", "no_autoclose": True}]
+        )
+        check_in = datetime.now() - relativedelta(hours=12)
+        attendances = self.hr_attendance.create(
+            [
+                {"employee_id": self.employee.id, "check_in": check_in},
+                {
+                    "employee_id": recent_employee.id,
+                    "check_in": datetime.now() - relativedelta(hours=2),
+                },
+                {"employee_id": excluded.id, "check_in": check_in},
+            ]
+        )
+        company = self.employee.company_id
+        candidates = self.hr_attendance._get_autoclose_candidates()
+        self.assertEqual(candidates[company] & attendances, attendances[0])
+        company.attendance_maximum_hours_per_day = 13
+        candidates = self.hr_attendance._get_autoclose_candidates()
+        self.assertFalse(candidates.get(company, self.hr_attendance) & attendances)
+        company.attendance_maximum_hours_per_day = 11
+        self.hr_attendance.check_for_incomplete_attendances()
+        self.assertEqual(
+            attendances[0].check_out, attendances[0].check_in + relativedelta(hours=11)
+        )
+        self.assertFalse(attendances[1].check_out)
+        self.assertFalse(attendances[2].check_out)
+
+    def test_autoclose_company_reason(self):
+        reason = self.env["hr.attendance.reason"].create(
+            {"name": "Closed in other company", "code": "OTHER-CO"}
+        )
+        company = self.env["res.company"].create(
+            {
+                "name": "Other company",
+                "attendance_maximum_hours_per_day": 8,
+                "hr_attendance_autoclose_reason": reason.id,
+            }
+        )
+        employees = self.env["hr.employee"].create(
+            [
+                {"name": "Other company %s" % index, "company_id": company.id}
+                for index in range(2)
+            ]
+        )
+        check_in = datetime.now().replace(microsecond=0) - relativedelta(hours=12)
+        attendances = self.hr_attendance.create(
+            [
+                {"employee_id": employee.id, "check_in": check_in}
+                for employee in employees
+            ]
+        )
+        self.hr_attendance.check_for_incomplete_attendances()
+        for attendance in attendances:
+            self.assertEqual(attendance.check_out, check_in + relativedelta(hours=8))
+            self.assertEqual(attendance.attendance_reason_ids, reason)
+
+    def _get_trigger_times(self):
+        cron = self.env.ref("hr_attendance_autoclose.check_attendance_cron")
+        return (
+            self.env["ir.cron.trigger"]
+            .search([("cron_id", "=", cron.id)])
+            .mapped("call_at")
+        )
+
+    def test_autoclose_schedule(self):
+        # Leave aside the open attendances of other data
+        open_attendances = self.hr_attendance.search([("check_out", "=", False)])
+        open_attendances.employee_id.no_autoclose = True
+        self.env.company.attendance_maximum_hours_per_day = 11
+        cron = self.env.ref("hr_attendance_autoclose.check_attendance_cron")
+        self.env["ir.cron.trigger"].search([("cron_id", "=", cron.id)]).unlink()
+        now = datetime.now().replace(microsecond=0)
+        other = self.env["hr.employee"].create({"name": "Other"})
+        self.hr_attendance.create(
+            {"employee_id": other.id, "check_in": now - relativedelta(hours=2)}
+        )
+        deadline = now + relativedelta(hours=9)
+        self.assertEqual(self.hr_attendance._get_autoclose_deadline(), deadline)
+        self.assertEqual(self._get_trigger_times(), [deadline])
+        # A later deadline is handled by the run of the earlier one
+        attendance = self.hr_attendance.create(
+            {"employee_id": self.employee.id, "check_in": now - relativedelta(hours=1)}
+        )
+        attendance.check_out = now
+        self.assertEqual(self._get_trigger_times(), [deadline])
+        # An earlier deadline is triggered
+        self.env.company.attendance_maximum_hours_per_day = 5
+        self.assertIn(now + relativedelta(hours=3), self._get_trigger_times())
+
     @users("test-user")
     def test_hr_employee_can_still_read_employee_and_hr_public_employee(self):
         """This test ensure the following comment from hr.employee model has been take
@@ -68,3 +167,17 @@ class TestHrAttendanceReason(BaseCommon):
         """
         for empl in self.env["hr.employee"].search([]):
             self.assertTrue(empl.name)
+
+    def test_check_for_incomplete_attendances_query_count(self):
+        """The number of queries doesn't grow with the closed attendances."""
+        self.env.company.attendance_maximum_hours_per_day = 11
+        autoclose = self.hr_attendance.check_for_incomplete_attendances
+        attendances = create_open_attendances(self.env, [12] * 10)
+        __, count = measure(self.env, autoclose)
+        self.assertLessEqual(count, AUTOCLOSE_MAX_QUERIES)
+        self.assertTrue(all(attendances.mapped("check_out")))
+        attendances = create_open_attendances(self.env, [12] * 20)
+        self.assertLessEqual(
+            measure(self.env, autoclose)[1], count + QUERY_COUNT_TOLERANCE
+        )
+        self.assertTrue(all(attendances.mapped("check_out")))
@@ -4,7 +4,7 @@
 
 {
     "name": "HR Attendance Reason",
-    "version": "17.0.1.1.0",
+    "version": "17.0.1.2.0",
     "category": "Human Resources",
     "website": "https://github.com/OCA/hr-attendance",
     "author": "Odoo S.A., Tecnativa, Odoo Community Association (OCA)",
@@ -17,6 +17,7 @@
         "views/hr_attendance_reason_view.xml",
         "views/hr_attendance_view.xml",
         "views/res_config_settings_view.xml",
+        "wizards/hr_attendance_import_views.xml",
     ],
     "demo": [
         "demo/hr_attendance_reason_demo.xml",
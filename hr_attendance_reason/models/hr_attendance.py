@@ -2,7 +2,11 @@
 # Copyright 2018 ForgeFlow, S.L.
 # License LGPL-3 - See http://www.gnu.org/licenses/lgpl-3.0.html
 
-from odoo import fields, models
+from odoo import _, api, fields, models
+from odoo.exceptions import ValidationError
+
+# Maximum number of overlaps listed in the error of a bulk import
+BULK_IMPORT_MAX_ERRORS = 10
 
 
 class HrAttendance(models.Model):
@@ -14,3 +18,122 @@ class HrAttendance(models.Model):
         help="Specifies the reason for signing In/signing Out in case of "
         "less or extra hours.",
     )
+
+    @api.constrains("check_in", "check_out", "employee_id")
+    def _check_validity(self):
+        # Bulk imports check the overlaps of the whole batch beforehand. The
+        # context key is only honored while `_bulk_import` runs in the current
+        # transaction, so clients can't send it for skipping the check.
+        if self.env.context.get(
+            "attendance_bulk_import"
+        ) and self.env.cr.precommit.data.get("attendance_bulk_import"):
+            return
+        return super()._check_validity()
+
+    @api.model
+    def _bulk_import(self, vals_list, chunk_size=1000):
+        """Create a large batch of attendances, checking the overlaps of the
+        whole batch at once instead of record by record, and inserting them
+        in chunks. The attendances of an employee and day are never split
+        between chunks, so that the values computed per day are computed
+        once.
+
+        :param vals_list: List of dictionaries with `employee_id`, `check_in`,
+          optionally `check_out` and any other field of the attendance.
+        :param chunk_size: Number of attendances created at once.
+        :return: Created attendances.
+        """
+        vals_list = sorted(
+            (
+                dict(
+                    vals,
+                    check_in=fields.Datetime.to_datetime(vals["check_in"]),
+                    check_out=fields.Datetime.to_datetime(vals.get("check_out")),
+                )
+                for vals in vals_list
+            ),
+            key=lambda vals: (vals["employee_id"], vals["check_in"]),
+        )
+        self._bulk_import_check_overlaps(vals_list)
+        bulk_self = self.with_context(attendance_bulk_import=True)
+        data = self.env.cr.precommit.data
+        data["attendance_bulk_import"] = True
+        ids = []
+        try:
+            for chunk in self._bulk_import_chunks(vals_list, chunk_size):
+                ids += bulk_self.create(chunk).ids
+                self.env.flush_all()
+                # Keep the memory bounded on large batches
+                self.env.invalidate_all()
+        finally:
+            data.pop("attendance_bulk_import", None)
+        return self.browse(ids)
+
+    @api.model
+    def _bulk_import_chunks(self, vals_list, chunk_size):
+        """Split the sorted values in chunks of about `chunk_size` elements
+        without splitting the attendances of an employee and day.
+        """
+        chunk = []
+        for vals in vals_list:
+            if len(chunk) >= chunk_size and (
+                chunk[-1]["employee_id"],
+                chunk[-1]["check_in"].date(),
+            ) != (vals["employee_id"], vals["check_in"].date()):
+                yield chunk
+                chunk = []
+            chunk.append(vals)
+        if chunk:
+            yield chunk
+
+    @api.model
+    def _bulk_import_check_overlaps(self, vals_list):
+        """Check that the sorted values don't overlap between them nor with
+        the existing attendances, with the same rules as `_check_validity`:
+        an attendance without check out overlaps with everything after its
+        check in.
+        """
+        overlaps = []
+        for previous, vals in zip(vals_list, vals_list[1:], strict=False):
+            if previous["employee_id"] == vals["employee_id"] and (
+                not previous["check_out"] or previous["check_out"] > vals["check_in"]
+            ):
+                overlaps.append(vals)
+        if vals_list:
+            self.flush_model(["employee_id", "check_in", "check_out"])
+            self.env.cr.execute(
+                """
+                SELECT DISTINCT b.index
+                FROM unnest(%s::int[], %s::int[], %s::timestamp[], %s::timestamp[])
+                    AS b(index, employee_id, check_in, check_out)
+                INNER JOIN hr_attendance AS a
+                    ON a.employee_id = b.employee_id
+                    AND a.check_in < COALESCE(b.check_out, 'infinity')
+                    AND COALESCE(a.check_out, 'infinity') > b.check_in
+                ORDER BY b.index
+                """,
+                (
+                    list(range(len(vals_list))),
+                    [vals["employee_id"] for vals in vals_list],
+                    [vals["check_in"] for vals in vals_list],
+                    [vals["check_out"] for vals in vals_list],
+                ),
+            )
+            overlaps += [vals_list[row[0]] for row in self.env.cr.fetchall()]
+        if not overlaps:
+            return
+        employees = self.env["hr.employee"].browse(
+            {vals["employee_id"] for vals in overlaps}
+        )
+        names = dict(zip(employees.ids, employees.mapped("name"), strict=True))
+        raise ValidationError(
+            _(
+                "Cannot import %(count)s attendances overlapping with other ones "
+                "of the same employee:\n%(lines)s",
+                count=len(overlaps),
+                lines="\n".join(
+                    f"{names[vals['employee_id']]}: {vals['check_in']}"
+                    for vals in overlaps[:BULK_IMPORT_MAX_ERRORS]
+                ),
+            )
+        )
@@ -1 +1,2 @@
 from . import test_hr_attendance_reason
+from . import test_benchmark
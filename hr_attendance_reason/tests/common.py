@@ -0,0 +1,17 @@
+# License LGPL-3 - See http://www.gnu.org/licenses/lgpl-3.0.html
+
+import time
+
+
+def measure(env, function):
+    """Run the function with empty caches, flushing what it writes.
+
+    :return: Tuple (wall time in seconds, number of SQL queries issued).
+    """
+    env.flush_all()
+    env.invalidate_all()
+    queries = env.cr.sql_log_count
+    start = time.perf_counter()
+    function()
+    env.flush_all()
+    return time.perf_counter() - start, env.cr.sql_log_count - queries
@@ -0,0 +1,95 @@
+# License LGPL-3 - See http://www.gnu.org/licenses/lgpl-3.0.html
+
+import json
+import logging
+import random
+
+from odoo.tests import HttpCase, tagged
+
+from .common import measure
+
+_logger = logging.getLogger(__name__)
+
+# (reasons, employees) of each measured dataset
+BENCHMARK_SIZES = [(10, 20), (100, 100), (500, 200)]
+
+
+@tagged("-standard", "benchmark", "post_install", "-at_install")
+class TestHrAttendanceReasonBenchmark(HttpCase):
+    """Measure wall time and SQL queries of the kiosk reason endpoints on
+    generated data of several sizes. Not run by default: use
+    `--test-tags benchmark`.
+    """
+
+    def _generate(self, reasons, employees, seed=0):
+        rand = random.Random(seed)
+        self.env["hr.attendance.reason"].create(
+            [
+                {
+                    "name": f"Generated reason {index}",
+                    "code": f"GEN{index}",
+                    "action_type": rand.choice(["sign_in", "sign_out"]),
+                    "show_on_attendance_screen": rand.random() < 0.8,
+                }
+                for index in range(reasons)
+            ]
+        )
+        return self.env["hr.employee"].create(
+            [{"name": f"Generated employee {index}"} for index in range(employees)]
+        )
+
+    def _json_call(self, route, params):
+        response = self.url_open(
+            route,
+            data=json.dumps({"jsonrpc": "2.0", "method": "call", "params": params}),
+            headers={"Content-Type": "application/json"},
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json().get("result")
+
+    def _benchmark(self, name, size, calls):
+        def call():
+            for route, params in calls:
+                self._json_call(route, params)
+
+        duration, queries = measure(self.env, call)
+        _logger.info(
+            "Benchmark %s (%s reasons, %s employees, %s calls): %.3f s, %s queries",
+            name,
+            size[0],
+            size[1],
+            len(calls),
+            duration,
+            queries,
+        )
+
+    def test_benchmark_kiosk_endpoints(self):
+        token = self.env.company.attendance_kiosk_key
+        for size in BENCHMARK_SIZES:
+            with self.env.cr.savepoint() as savepoint:
+                employees = self._generate(*size)
+                self._benchmark(
+                    "/hr_attendance_reason/get_reasons",
+                    size,
+                    [
+                        (
+                            "/hr_attendance_reason/get_reasons",
+                            {
+                                "token": token,
+                                "employee_id": employee.id,
+                                "pin_code": "",
+                            },
+                        )
+                        for employee in employees
+                    ],
+                )
+                self._benchmark(
+                    "/hr_attendance_reason/reason_settings",
+                    size,
+                    [
+                        ("/hr_attendance_reason/reason_settings", {"token": token})
+                        for _employee in employees
+                    ],
+                )
+                savepoint.rollback()
+            self.env.invalidate_all()
@@ -3,8 +3,10 @@
 # Copyright 2023 Tecnativa - Víctor Martínez
 # License LGPL-3 - See http://www.gnu.org/licenses/lgpl-3.0.html
 
+import base64
 from datetime import datetime
 
+from odoo.exceptions import ValidationError
 from odoo.tests import new_test_user, users
 from odoo.tools import DEFAULT_SERVER_DATETIME_FORMAT as DF
 
@@ -59,3 +61,115 @@ class TestHrAttendanceReason(BaseCommon):
             attendance_reason_id=self.att_reason_out.id
         )._attendance_action_change({})
         self.assertIn(self.att_reason_out, attendance.attendance_reason_ids)
+
+    def test_bulk_import(self):
+        attendances = self.env["hr.attendance"]._bulk_import(
+            [
+                {
+                    "employee_id": self.employee.id,
+                    "check_in": "2020-01-02 13:00:00",
+                    "check_out": "2020-01-02 17:00:00",
+                    "attendance_reason_ids": [(4, self.att_reason_out.id)],
+                },
+                {
+                    "employee_id": self.employee.id,
+                    "check_in": "2020-01-02 08:00:00",
+                    "check_out": "2020-01-02 12:00:00",
+                },
+                {
+                    "employee_id": self.employee.id,
+                    "check_in": "2020-01-03 08:00:00",
+                    "check_out": "2020-01-03 12:00:00",
+                },
+            ],
+            chunk_size=1,
+        )
+        self.assertEqual(len(attendances), 3)
+        self.assertEqual(
+            attendances.mapped("check_in"),
+            [
+                datetime(2020, 1, 2, 8),
+                datetime(2020, 1, 2, 13),
+                datetime(2020, 1, 3, 8),
+            ],
+        )
+        self.assertEqual(attendances[1].attendance_reason_ids, self.att_reason_out)
+        # Overlap between the imported attendances
+        with self.assertRaises(ValidationError):
+            self.env["hr.attendance"]._bulk_import(
+                [
+                    {
+                        "employee_id": self.employee.id,
+                        "check_in": "2020-01-06 08:00:00",
+                    },
+                    {
+                        "employee_id": self.employee.id,
+                        "check_in": "2020-01-06 13:00:00",
+                        "check_out": "2020-01-06 17:00:00",
+                    },
+                ]
+            )
+        # Overlap with an existing attendance
+        with self.assertRaises(ValidationError):
+            self.env["hr.attendance"]._bulk_import(
+                [
+                    {
+                        "employee_id": self.employee.id,
+                        "check_in": "2020-01-03 11:00:00",
+                        "check_out": "2020-01-03 13:00:00",
+                    },
+                ]
+            )
+
+    def test_bulk_import_context(self):
+        vals = {
+            "employee_id": self.employee.id,
+            "check_in": "2020-01-02 09:00:00",
+            "check_out": "2020-01-02 10:00:00",
+        }
+        attendance_obj = self.env["hr.attendance"].with_context(
+            attendance_bulk_import=True
+        )
+        attendance_obj.create(dict(vals, check_out="2020-01-02 12:00:00"))
+        # The context key of the imports sent by a client doesn't skip the
+        # check of the records, before nor after an import
+        with self.assertRaises(ValidationError):
+            attendance_obj.create(vals)
+        attendance_obj._bulk_import([dict(vals, check_in="2020-01-03 09:00:00")])
+        self.assertFalse(self.env.cr.precommit.data.get("attendance_bulk_import"))
+        with self.assertRaises(ValidationError):
+            attendance_obj.create(vals)
+        # Nor the overlaps checked by the imports
+        with self.assertRaises(ValidationError):
+            attendance_obj._bulk_import([vals])
+
+    def test_bulk_import_chunks(self):
+        vals_list = [
+            {"employee_id": employee_id, "check_in": datetime(2020, 1, day, hour)}
+            for employee_id in (1, 2)
+            for day in (1, 2)
+            for hour in (8, 13)
+        ]
+        chunks = list(self.env["hr.attendance"]._bulk_import_chunks(vals_list, 3))
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 4])
+
+    def test_import_wizard(self):
+        self.employee.barcode = "BADGE1"
+        content = (
+            "barcode,check_in,check_out,reason_codes\n"
+            "BADGE1,2020-02-03 08:00:00,2020-02-03 12:00:00,BB WORK\n"
+            "BADGE1,2020-02-03 13:00:00,,\n"
+        )
+        wizard = self.env["hr.attendance.import"].create(
+            {"file": base64.b64encode(content.encode())}
+        )
+        wizard.action_import()
+        attendances = self.env["hr.attendance"].search(
+            [("employee_id", "=", self.employee.id)], order="check_in"
+        )
+        self.assertEqual(len(attendances), 2)
+        self.assertEqual(
+            attendances[0].attendance_reason_ids,
+            self.att_reason_in | self.att_reason_out,
+        )
+        self.assertFalse(attendances[1].check_out)
@@ -0,0 +1 @@
+from . import hr_attendance_import
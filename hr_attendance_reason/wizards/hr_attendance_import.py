@@ -0,0 +1,107 @@
+# License LGPL-3 - See http://www.gnu.org/licenses/lgpl-3.0.html
+
+import base64
+import csv
+import io
+
+from odoo import Command, _, fields, models
+from odoo.exceptions import UserError
+
+
+class HrAttendanceImport(models.TransientModel):
+    _name = "hr.attendance.import"
+    _description = "Import attendances in bulk"
+
+    file = fields.Binary(required=True)
+    filename = fields.Char()
+    delimiter = fields.Char(default=",", required=True, size=1)
+    chunk_size = fields.Integer(
+        default=1000,
+        required=True,
+        help="Number of attendances created at once.",
+    )
+
+    def _read_rows(self):
+        """Read the rows of the CSV file as dictionaries."""
+        content = base64.b64decode(self.file).decode("utf-8-sig")
+        return csv.DictReader(io.StringIO(content), delimiter=self.delimiter)
+
+    def _prepare_vals_list(self, rows):
+        """Convert the rows of the file to attendance values, resolving the
+        badges and reason codes with a query for the whole file.
+
+        The columns are `barcode` (badge ID of the employee), `check_in`,
+        `check_out` (optional) and `reason_codes` (optional, codes separated
+        by spaces), with the dates in UTC.
+        """
+        rows = list(rows)
+        if rows and not {"barcode", "check_in"} <= set(rows[0]):
+            raise UserError(_("The file must have barcode and check_in columns."))
+        employees = self.env["hr.employee"].search_read(
+            [("barcode", "in", list({row["barcode"] for row in rows}))],
+            ["barcode"],
+        )
+        employee_ids = {employee["barcode"]: employee["id"] for employee in employees}
+        codes = {
+            code for row in rows for code in (row.get("reason_codes") or "").split()
+        }
+        reasons = self.env["hr.attendance.reason"].search_read(
+            [("code", "in", list(codes))], ["code"]
+        )
+        reason_ids = {reason["code"]: reason["id"] for reason in reasons}
+        vals_list = []
+        for line, row in enumerate(rows, start=2):
+            if row["barcode"] not in employee_ids:
+                raise UserError(
+                    _(
+                        "Line %(line)s: no employee with badge ID %(barcode)s.",
+                        line=line,
+                        barcode=row["barcode"],
+                    )
+                )
+            row_codes = (row.get("reason_codes") or "").split()
+            unknown = set(row_codes) - set(reason_ids)
+            if unknown:
+                raise UserError(
+                    _(
+                        "Line %(line)s: unknown reason codes %(codes)s.",
+                        line=line,
+                        codes=", ".join(sorted(unknown)),
+                    )
+                )
+            try:
+                check_in = fields.Datetime.to_datetime(row["check_in"])
+                check_out = fields.Datetime.to_datetime(row.get("check_out") or False)
+            except ValueError as error:
+                raise UserError(
+                    _("Line %(line)s: wrong date (%(error)s).", line=line, error=error)
+                ) from error
+            vals = {
+                "employee_id": employee_ids[row["barcode"]],
+                "check_in": check_in,
+                "check_out": check_out,
+            }
+            if row_codes:
+                vals["attendance_reason_ids"] = [
+                    Command.set([reason_ids[code] for code in row_codes])
+                ]
+            vals_list.append(vals)
+        return vals_list
+
+    def action_import(self):
+        self.ensure_one()
+        if self.chunk_size <= 0:
+            raise UserError(_("The chunk size must be positive."))
+        vals_list = self._prepare_vals_list(self._read_rows())
+        attendances = self.env["hr.attendance"]._bulk_import(
+            vals_list, chunk_size=self.chunk_size
+        )
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "type": "success",
+                "message": _("%s attendances imported.") % len(attendances),
+                "next": {"type": "ir.actions.act_window_close"},
+            },
+        }
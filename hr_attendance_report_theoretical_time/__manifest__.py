@@ -2,7 +2,7 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 {
     "name": "Theoretical vs Attended Time Analysis",
-    "version": "17.0.1.1.0",
+    "version": "17.0.1.2.0",
     "category": "Human Resources",
     "website": "https://github.com/OCA/hr-attendance",
     "author": "Tecnativa, Odoo Community Association (OCA)",
@@ -12,10 +12,14 @@
     "data": [
         "security/ir.model.access.csv",
         "security/hr_attendance_report_theoretical_time_security.xml",
+        "data/ir_cron_data.xml",
         "views/hr_leave_type_views.xml",
         "views/hr_employee_views.xml",
+        "views/res_config_settings_views.xml",
         "reports/hr_attendance_report_views.xml",
         "reports/hr_attendance_theoretical_time_report_views.xml",
+        "reports/hr_attendance_theoretical_time_stats_views.xml",
+        "views/hr_attendance_theoretical_time_job_views.xml",
         "wizards/recompute_theoretical_attendance_views.xml",
         "wizards/wizard_theoretical_time.xml",
     ],
@@ -0,0 +1,116 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import logging
+import multiprocessing
+import optparse
+import sys
+from pathlib import Path
+
+import odoo
+from odoo.cli import Command
+from odoo.fields import Date
+
+_logger = logging.getLogger(__name__)
+
+
+def run_job(dbname, job_id):
+    """Run the given recompute job with a new database connection."""
+    with odoo.registry(dbname).cursor() as cr:
+        env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+        env["hr.attendance.theoretical.time.job"].browse(job_id)._run()
+
+
+class TheoreticalTimeRecompute(Command):
+    """Recompute the theoretical hours of attendances in parallel processes"""
+
+    name = "theoretical_time_recompute"
+
+    def run(self, cmdargs):
+        parser = odoo.tools.config.parser
+        parser.prog = f"{Path(sys.argv[0]).name} {self.name}"
+        group = optparse.OptionGroup(parser, "Theoretical Time Recompute")
+        group.add_option("--date-from", dest="recompute_date_from")
+        group.add_option("--date-to", dest="recompute_date_to")
+        group.add_option(
+            "--employees",
+            dest="recompute_employees",
+            help="Comma separated employee IDs. All the employees if not given.",
+        )
+        # Not --workers, which is an option of the server
+        group.add_option(
+            "--recompute-workers",
+            dest="recompute_workers",
+            type="int",
+            default=1,
+            help="Number of processes recomputing disjoint sets of employees.",
+        )
+        group.add_option("--chunk-employees", dest="chunk_employees", type="int")
+        group.add_option("--chunk-days", dest="chunk_days", type="int")
+        group.add_option(
+            "--job",
+            dest="recompute_job",
+            type="int",
+            help="Run or resume the given recompute job.",
+        )
+        parser.add_option_group(group)
+        opt = odoo.tools.config.parse_config(cmdargs)
+        dbname = odoo.tools.config["db_name"]
+        if not dbname:
+            sys.exit("A database is required (-d).")
+        registry = odoo.registry(dbname)
+        if opt.recompute_job:
+            run_job(dbname, opt.recompute_job)
+            return
+        if not opt.recompute_date_from or not opt.recompute_date_to:
+            sys.exit("--date-from and --date-to are required.")
+        with registry.cursor() as cr:
+            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+            employees = env["hr.employee"].with_context(active_test=False)
+            if opt.recompute_employees:
+                employees = employees.browse(
+                    int(employee_id)
+                    for employee_id in opt.recompute_employees.split(",")
+                ).exists()
+            else:
+                employees = employees.search([])
+            vals = {}
+            if opt.chunk_employees:
+                vals["chunk_employees"] = opt.chunk_employees
+            if opt.chunk_days:
+                vals["chunk_days"] = opt.chunk_days
+            job_ids = (
+                env["hr.attendance.theoretical.time.job"]
+                ._create_partitions(
+                    employees,
+                    Date.to_date(opt.recompute_date_from),
+                    Date.to_date(opt.recompute_date_to),
+                    opt.recompute_workers,
+                    **vals,
+                )
+                .ids
+            )
+        # The worker processes are forked with the loaded registry, and must
+        # not share the connections of this one
+        odoo.sql_db.close_all()
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=run_job, args=(dbname, job_id)) for job_id in job_ids
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        with registry.cursor() as cr:
+            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+            jobs = env["hr.attendance.theoretical.time.job"].browse(job_ids)
+            failed = False
+            for job, process in zip(jobs, processes, strict=True):
+                _logger.info(
+                    "Recompute job %s: %s (exit code %s)",
+                    job.name,
+                    job.state,
+                    process.exitcode,
+                )
+                failed |= job.state != "done" or bool(process.exitcode)
+        if failed:
+            sys.exit(1)
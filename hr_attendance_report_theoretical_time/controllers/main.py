@@ -0,0 +1,49 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, http
+from odoo.http import Response, content_disposition, request, route
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv;charset=utf8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+class TheoreticalTimeExport(http.Controller):
+    @route(
+        "/hr_attendance_report_theoretical_time/export/<int:wizard_id>/<string:file_format>",
+        type="http",
+        auth="user",
+    )
+    def export_theoretical_time(self, wizard_id, file_format):
+        if file_format not in EXPORT_CONTENT_TYPES:
+            return request.not_found()
+        wizard = request.env["wizard.theoretical.time"].browse(wizard_id).exists()
+        if not wizard:
+            return request.not_found()
+        wizard.check_access_rule("read")
+        return Response(
+            self._stream_export(
+                request.env.registry,
+                request.env.uid,
+                dict(request.env.context),
+                wizard_id,
+                file_format,
+            ),
+            headers=[
+                ("Content-Type", EXPORT_CONTENT_TYPES[file_format]),
+                (
+                    "Content-Disposition",
+                    content_disposition("theoretical_time.%s" % file_format),
+                ),
+            ],
+            direct_passthrough=True,
+        )
+
+    def _stream_export(self, registry, uid, context, wizard_id, file_format):
+        # The response is sent once the request cursor is closed, so the
+        # export is generated with its own cursor.
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            wizard = env["wizard.theoretical.time"].browse(wizard_id)
+            yield from getattr(wizard, "_export_%s" % file_format)()
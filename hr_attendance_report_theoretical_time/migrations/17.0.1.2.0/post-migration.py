@@ -0,0 +1,13 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """The stored mode now keeps period totals and balances next to the
+    stored days, so regenerate all of them when it's already enabled.
+    """
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    report = env["hr.attendance.theoretical.time.report"]
+    if report._is_stored_mode():
+        env["hr.attendance.theoretical.time.day"]._rebuild()
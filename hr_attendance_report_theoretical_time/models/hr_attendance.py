@@ -2,6 +2,10 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 from odoo import api, fields, models
+from odoo.tools import float_compare
+
+# Number of changed attendances detailed in the recompute results
+THEORETICAL_HOURS_CHANGES_SAMPLE = 20
 
 
 class HrAttendance(models.Model):
@@ -13,11 +17,187 @@ class HrAttendance(models.Model):
 
     @api.depends("check_in", "employee_id")
     def _compute_theoretical_hours(self):
-        obj = self.env["hr.attendance.theoretical.time.report"]
+        values = self._get_theoretical_hours_values()
         for record in self:
-            record.theoretical_hours = obj._theoretical_hours(
-                record.employee_id, record.check_in
+            record.theoretical_hours = values[record.id]
+
+    def _get_theoretical_hours_values(self):
+        """Compute the theoretical hours of the attendances without assigning
+        them.
+
+        :return: Dictionary of theoretical hours by attendance ID.
+        """
+        obj = self.env["hr.attendance.theoretical.time.report"]
+        with obj._instrument("compute_theoretical_hours"):
+            hours = obj._theoretical_hours_by_day(
+                (record.employee_id, record.check_in.date())
+                for record in self
+                if record.employee_id and record.check_in
+            )
+        return {
+            record.id: hours.get(
+                (record.employee_id.id, record.check_in and record.check_in.date()),
+                0.0,
             )
+            for record in self
+        }
+
+    def _update_theoretical_hours(
+        self, dry_run=False, sample_size=THEORETICAL_HOURS_CHANGES_SAMPLE
+    ):
+        """Recompute the theoretical hours of the attendances, writing only the
+        changed ones with a single UPDATE. The unchanged rows, usually most of
+        them, are neither written nor trigger the fields depending on them.
+
+        :param dry_run: Only compare the values, without writing them.
+        :return: Dictionary with the `count` of changed attendances and a
+          `sample` of up to `sample_size` (attendance ID, current hours,
+          recomputed hours) tuples.
+        """
+        self.flush_recordset(["theoretical_hours"])
+        values = self._get_theoretical_hours_values()
+        changes = [
+            (record.id, record.theoretical_hours, values[record.id])
+            for record in self
+            if float_compare(
+                record.theoretical_hours, values[record.id], precision_digits=6
+            )
+        ]
+        if changes and not dry_run:
+            ids, __, hours = zip(*changes, strict=True)
+            self.env.cr.execute(
+                """
+                UPDATE hr_attendance AS a SET theoretical_hours = v.hours
+                FROM unnest(%s::int[], %s::float8[]) AS v(id, hours)
+                WHERE a.id = v.id
+                """,
+                (list(ids), list(hours)),
+            )
+            records = self.browse(ids)
+            records.invalidate_recordset(["theoretical_hours"])
+            records.modified(["theoretical_hours"])
+        return {"count": len(changes), "sample": changes[:sample_size]}
+
+    def _get_theoretical_time_days(self):
+        """Return the (employee id, date) pairs of the report where these
+        attendances are counted.
+        """
+        return {
+            (record.employee_id.id, record.check_in.date())
+            for record in self
+            if record.check_in
+        }
+
+    @api.model
+    def _recompute_theoretical_time_ranges(self, ranges, dry_run=False):
+        """Recompute the theoretical hours of the attendances and the stored
+        days of the report in the given ranges, looking up the attendances of
+        all of them with a single query.
+
+        :param ranges: Iterable of (employee id or None for all of them,
+          first date, last date) tuples.
+        :param dry_run: Only get the changes, without writing anything.
+        :return: Changes, as returned by `_update_theoretical_hours`.
+        """
+        ranges = list(ranges)
+        if not ranges:
+            return {"count": 0, "sample": []}
+        employee_ids, dates_from, dates_to = zip(*ranges, strict=True)
+        self.flush_model(["employee_id", "check_in"])
+        self.env.cr.execute(
+            """
+            SELECT DISTINCT a.id
+            FROM hr_attendance AS a
+            INNER JOIN unnest(%s::int[], %s::date[], %s::date[])
+                AS r(employee_id, date_from, date_to)
+                ON (r.employee_id IS NULL OR a.employee_id = r.employee_id)
+                AND a.check_in >= r.date_from
+                AND a.check_in < r.date_to + 1
+            """,
+            (list(employee_ids), list(dates_from), list(dates_to)),
+        )
+        attendances = self.browse([row[0] for row in self.env.cr.fetchall()])
+        changes = attendances._update_theoretical_hours(dry_run=dry_run)
+        if not dry_run:
+            self.env["hr.attendance.theoretical.time.day"]._refresh_ranges(ranges)
+        return changes
+
+    @api.model
+    def _recompute_theoretical_time_weekdays(
+        self,
+        employee_ids,
+        weekdays,
+        date_from=None,
+        date_to=None,
+        batch_size=200,
+        dry_run=False,
+    ):
+        """Recompute the theoretical hours of the attendances and the stored
+        days of the report of the given employees falling on the given
+        weekdays (0 for Monday), optionally limited to the given interval of
+        dates (both included), in batches of employees.
+
+        :param dry_run: Only get the changes, without writing anything.
+        :return: Changes, as returned by `_update_theoretical_hours`.
+        """
+        employee_ids = sorted(employee_ids)
+        weekdays = sorted(weekdays)
+        result = {"count": 0, "sample": []}
+        if not employee_ids or not weekdays:
+            return result
+        where = """
+            employee_id = ANY(%s)
+            AND extract(isodow FROM check_in)::int - 1 = ANY(%s)
+        """
+        bounds = []
+        if date_from:
+            where += " AND check_in >= %s"
+            bounds.append(date_from)
+        if date_to:
+            where += " AND check_in < %s::date + 1"
+            bounds.append(date_to)
+        stored_days = self.env["hr.attendance.theoretical.time.day"]
+        for index in range(0, len(employee_ids), batch_size):
+            batch = employee_ids[index : index + batch_size]
+            self.flush_model(["employee_id", "check_in"])
+            self.env.cr.execute(
+                "SELECT id FROM hr_attendance WHERE %s" % where,
+                [batch, weekdays] + bounds,
+            )
+            attendances = self.browse([row[0] for row in self.env.cr.fetchall()])
+            changes = attendances._update_theoretical_hours(dry_run=dry_run)
+            result["count"] += changes["count"]
+            result["sample"] += changes["sample"]
+            if dry_run:
+                continue
+            stored_days._refresh_weekdays(batch, weekdays, date_from, date_to)
+            self.env.flush_all()
+        result["sample"] = result["sample"][:THEORETICAL_HOURS_CHANGES_SAMPLE]
+        return result
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env["hr.attendance.theoretical.time.day"]._refresh_days(
+            records._get_theoretical_time_days()
+        )
+        return records
+
+    def write(self, vals):
+        if not {"employee_id", "check_in", "check_out"} & set(vals):
+            return super().write(vals)
+        days = self._get_theoretical_time_days()
+        res = super().write(vals)
+        self.env["hr.attendance.theoretical.time.day"]._refresh_days(
+            days | self._get_theoretical_time_days()
+        )
+        return res
+
+    def unlink(self):
+        days = self._get_theoretical_time_days()
+        res = super().unlink()
+        self.env["hr.attendance.theoretical.time.day"]._refresh_days(days)
+        return res
 
     @api.model
     def _select(self):
@@ -0,0 +1,264 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import logging
+import math
+import threading
+from datetime import datetime, time, timedelta
+
+from psycopg2 import errors
+
+from odoo import api, fields, models
+from odoo.tools import config
+
+from .hr_attendance import THEORETICAL_HOURS_CHANGES_SAMPLE
+
+_logger = logging.getLogger(__name__)
+
+
+class HrAttendanceTheoreticalTimeJob(models.Model):
+    """Recomputation of the theoretical hours of some employees and dates,
+    split in chunks of employees and days that are committed one by one, so
+    that it can be followed and resumed from the last finished chunk when
+    it's interrupted.
+    """
+
+    _name = "hr.attendance.theoretical.time.job"
+    _description = "Recomputation of theoretical hours"
+    _order = "id desc"
+
+    name = fields.Char(required=True)
+    state = fields.Selection(
+        selection=[
+            ("running", "Running"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+            ("cancel", "Cancelled"),
+        ],
+        default="running",
+        required=True,
+        readonly=True,
+    )
+    employee_ids = fields.Many2many(comodel_name="hr.employee", readonly=True)
+    date_from = fields.Date(required=True, readonly=True)
+    date_to = fields.Date(required=True, readonly=True)
+    chunk_employees = fields.Integer(
+        default=100, required=True, help="Employees recomputed in each chunk."
+    )
+    chunk_days = fields.Integer(
+        default=31, required=True, help="Days recomputed in each chunk."
+    )
+    chunk_count = fields.Integer(compute="_compute_chunk_count", store=True)
+    chunk_done = fields.Integer(readonly=True)
+    changed_count = fields.Integer(
+        string="Changed Attendances",
+        readonly=True,
+        help="Attendances whose theoretical hours have changed.",
+    )
+    dry_run = fields.Boolean(
+        readonly=True,
+        help="Only count the attendances whose theoretical hours would change, "
+        "keeping some of them as examples, without writing anything.",
+    )
+    changes_sample = fields.Text(string="Examples of Changes", readonly=True)
+    progress = fields.Float(compute="_compute_progress")
+    date_done = fields.Datetime(readonly=True)
+    error = fields.Text(readonly=True)
+
+    @api.depends(
+        "employee_ids", "date_from", "date_to", "chunk_employees", "chunk_days"
+    )
+    def _compute_chunk_count(self):
+        for job in self:
+            job.chunk_count = len(job._get_employee_chunks()) * len(
+                job._get_date_chunks()
+            )
+
+    @api.depends("chunk_count", "chunk_done")
+    def _compute_progress(self):
+        for job in self:
+            job.progress = (
+                100.0 * job.chunk_done / job.chunk_count if job.chunk_count else 100.0
+            )
+
+    def _get_employee_chunks(self):
+        ids = sorted(self.employee_ids.ids)
+        size = max(self.chunk_employees, 1)
+        return [ids[index : index + size] for index in range(0, len(ids), size)]
+
+    def _get_date_chunks(self):
+        if not self.date_from or not self.date_to or self.date_from > self.date_to:
+            return []
+        size = max(self.chunk_days, 1)
+        count = math.ceil(((self.date_to - self.date_from).days + 1) / size)
+        return [
+            (
+                self.date_from + timedelta(days=index * size),
+                min(
+                    self.date_from + timedelta(days=(index + 1) * size - 1),
+                    self.date_to,
+                ),
+            )
+            for index in range(count)
+        ]
+
+    def _get_chunk(self, index):
+        """Return the employee IDs and the first and last dates of the chunk
+        with the given index, iterating the dates inside each group of
+        employees.
+        """
+        date_chunks = self._get_date_chunks()
+        employee_ids = self._get_employee_chunks()[index // len(date_chunks)]
+        return employee_ids, *date_chunks[index % len(date_chunks)]
+
+    def _lock(self):
+        """Lock the job row for processing its next chunk, unless another
+        worker is doing it, or has done a chunk of it since the current
+        transaction started.
+        """
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute(
+                    "SELECT id FROM %s WHERE id = %%s FOR UPDATE SKIP LOCKED"
+                    % self._table,
+                    (self.id,),
+                )
+                return bool(self.env.cr.fetchone())
+        except errors.SerializationFailure:
+            return False
+
+    def _run(self):
+        """Process the pending chunks of the jobs, committing after each one.
+        The chunks already done are skipped, so the job goes on from where it
+        was interrupted.
+        """
+        testing = getattr(threading.current_thread(), "testing", False)
+        attendances = self.env["hr.attendance"]
+        for job in self:
+            while True:
+                if not job._lock():
+                    break
+                job.invalidate_recordset(["state", "chunk_done"])
+                if job.state != "running":
+                    break
+                if job.chunk_done >= job.chunk_count:
+                    job.write({"state": "done", "date_done": fields.Datetime.now()})
+                    break
+                employee_ids, date_from, date_to = job._get_chunk(job.chunk_done)
+                try:
+                    with self.env.cr.savepoint():
+                        changes = attendances._recompute_theoretical_time_ranges(
+                            (
+                                (employee_id, date_from, date_to)
+                                for employee_id in employee_ids
+                            ),
+                            dry_run=job.dry_run,
+                        )
+                        job.changed_count += changes["count"]
+                        if job.dry_run:
+                            job._add_changes_sample(changes["sample"])
+                        job.chunk_done += 1
+                        self.env.flush_all()
+                except Exception as error:
+                    _logger.exception("Theoretical hours recompute job %s", job.id)
+                    job.write({"state": "failed", "error": str(error)})
+                    break
+                finally:
+                    if not testing:
+                        self.env.cr.commit()  # pylint: disable=invalid-commit
+                    # Keep the memory bounded on long jobs
+                    self.env.invalidate_all()
+
+    def _add_changes_sample(self, sample):
+        """Append the given (attendance ID, current hours, recomputed hours)
+        changes to the examples of the job, up to its maximum size.
+        """
+        lines = (self.changes_sample or "").splitlines()
+        sample = sample[: max(THEORETICAL_HOURS_CHANGES_SAMPLE - len(lines), 0)]
+        if not sample:
+            return
+        attendances = self.env["hr.attendance"].browse([change[0] for change in sample])
+        lines += [
+            f"{attendance.employee_id.name} "
+            f"{fields.Datetime.to_string(attendance.check_in)}: "
+            f"{old:.2f} → {new:.2f}"
+            for attendance, (__, old, new) in zip(attendances, sample, strict=True)
+        ]
+        self.changes_sample = "\n".join(lines)
+
+    def action_resume(self):
+        self.filtered(lambda job: job.state in ("failed", "cancel")).write(
+            {"state": "running", "error": False}
+        )
+        self.env.ref(
+            "hr_attendance_report_theoretical_time.theoretical_time_job_cron"
+        ).sudo()._trigger()
+
+    def action_cancel(self):
+        self.filtered(lambda job: job.state == "running").write({"state": "cancel"})
+
+    @api.model
+    def _create_partitions(self, employees, date_from, date_to, count, **vals):
+        """Create jobs recomputing the given employees and dates, splitting
+        the employees in up to `count` partitions with about the same number
+        of attendances. The partitions don't share employees, so they don't
+        touch the same rows and can run at the same time, giving the same
+        results as a single job.
+
+        :return: Created jobs.
+        """
+        attendances = self.env["hr.attendance"]._read_group(
+            [
+                ("employee_id", "in", employees.ids),
+                ("check_in", ">=", datetime.combine(date_from, time.min)),
+                ("check_in", "<=", datetime.combine(date_to, time.max)),
+            ],
+            ["employee_id"],
+            ["__count"],
+        )
+        weights = dict.fromkeys(employees.ids, 0)
+        weights.update((employee.id, number) for employee, number in attendances)
+        partitions = [[] for __ in range(max(min(count, len(weights)), 1))]
+        loads = [0] * len(partitions)
+        # Place the heaviest employees first on the least loaded partition
+        for employee_id in sorted(weights, key=lambda key: (-weights[key], key)):
+            index = loads.index(min(loads))
+            partitions[index].append(employee_id)
+            loads[index] += weights[employee_id] + 1
+        name = vals.pop("name", f"{date_from} - {date_to}")
+        return self.create(
+            [
+                dict(
+                    vals,
+                    name=f"{name} ({index}/{len(partitions)})",
+                    employee_ids=[(6, 0, employee_ids)],
+                    date_from=date_from,
+                    date_to=date_to,
+                )
+                for index, employee_ids in enumerate(partitions, start=1)
+            ]
+        )
+
+    @api.model
+    def _get_max_workers(self, count):
+        """Limit the given number of workers to the cron threads of the
+        server, which run the triggers of the scheduled action.
+        """
+        return max(min(count, config["max_cron_threads"]), 1)
+
+    @api.model
+    def _trigger_workers(self, count):
+        """Trigger the scheduled action running the jobs once per worker, up
+        to the cron threads of the server. Each run takes the chunks of the
+        jobs not locked by another worker, as the processes of the
+        `theoretical_time_recompute` command do.
+        """
+        cron = self.env.ref(
+            "hr_attendance_report_theoretical_time.theoretical_time_job_cron"
+        ).sudo()
+        for __ in range(self._get_max_workers(count)):
+            cron._trigger()
+
+    @api.model
+    def _cron_run(self):
+        """Resume the jobs interrupted by a crash or a restart."""
+        self.search([("state", "=", "running")], order="id")._run()
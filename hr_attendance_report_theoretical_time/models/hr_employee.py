@@ -1,7 +1,9 @@
 # Copyright 2018 Tecnativa - Pedro M. Baeza
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
-from odoo import fields, models
+from collections import defaultdict
+
+from odoo import api, fields, models
 
 
 class HrEmployee(models.Model):
@@ -13,3 +15,57 @@ class HrEmployee(models.Model):
         "not filled, employee creation date or the calendar start date "
         "will be used (the greatest of both)."
     )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env["hr.attendance.theoretical.time.day"]._refresh_employees(records.ids)
+        return records
+
+    def write(self, vals):
+        """Invalidate the cached theoretical hours when their inputs change,
+        and refresh the stored days of the report when the series of
+        generated days, the time zone, the address or the department of the
+        employees change.
+        """
+        calendars = {}
+        if "resource_calendar_id" in vals:
+            calendars = {employee: employee.resource_calendar_id for employee in self}
+        res = super().write(vals)
+        if {"resource_calendar_id", "tz", "address_id"} & set(vals):
+            self.env["hr.attendance.theoretical.time.cache"]._invalidate(self.ids)
+        stored_days = self.env["hr.attendance.theoretical.time.day"]
+        if {"theoretical_hours_start_date", "tz", "address_id"} & set(vals):
+            stored_days._refresh_employees(self.ids)
+        elif "department_id" in vals:
+            stored_days._update_department(self.ids, vals["department_id"])
+        self._recompute_theoretical_time_calendar(calendars)
+        return res
+
+    def _recompute_theoretical_time_calendar(self, calendars):
+        """Recompute the theoretical hours of the employees on the weekdays
+        whose working hours differ between their previous calendar and the
+        current one.
+
+        :param calendars: Dictionary {employee: previous calendar}.
+        """
+        employee_ids = defaultdict(list)
+        for employee, calendar in calendars.items():
+            weekdays = calendar._get_theoretical_time_weekdays(
+                employee.resource_calendar_id
+            )
+            if weekdays:
+                employee_ids[frozenset(weekdays)].append(employee.id)
+        attendances = self.env["hr.attendance"]
+        for weekdays, ids in employee_ids.items():
+            attendances._recompute_theoretical_time_weekdays(ids, weekdays)
+
+    def _get_theoretical_time_balance(self, date=None):
+        """Get the cumulative difference between worked and theoretical hours
+        of the employee since the beginning until the given date (included),
+        or today if not given.
+        """
+        self.ensure_one()
+        date = date or fields.Date.context_today(self)
+        balances = self.env["hr.attendance.theoretical.time.balance"]
+        return balances._get_balances(self, fields.Date.to_date(date))[self.id]
@@ -1,7 +1,7 @@
 # Copyright 2017-2019 Tecnativa - Pedro M. Baeza
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-from datetime import datetime, time
+from collections import defaultdict
 
 from odoo import api, fields, models
 
@@ -16,37 +16,101 @@ class HrHolidaysPublicLine(models.Model):
 
         :param: date: Date for recomputing attendances.
         """
-        if not date:
-            return
-        if isinstance(date, str):
-            date = fields.Date.from_string(date)
-        from_datetime = datetime.combine(date, time(0, 0, 0, 0))
-        to_datetime = datetime.combine(date, time(23, 59, 59, 99999))
-        records = self.env["hr.attendance"].search(
-            [
-                ("check_in", ">=", fields.Datetime.to_string(from_datetime)),
-                ("check_in", "<=", fields.Datetime.to_string(to_datetime)),
-            ]
+        self._check_theoretical_hours_dates([date])
+
+    @api.model
+    def _check_theoretical_hours_dates(self, dates):
+        """Recomputes at once all the theoretical hours that corresponds to
+        the given dates.
+
+        :param: dates: Dates for recomputing attendances.
+        """
+        dates = {fields.Date.to_date(date) for date in dates if date}
+        self.env["hr.attendance"]._recompute_theoretical_time_ranges(
+            (None, date, date) for date in dates
+        )
+
+    def _get_theoretical_time_ranges(self):
+        """Return the (employee id or None for all of them, first date, last
+        date) ranges of the days affected by the lines, limited to the
+        employees whose address matches the country and states of the
+        holidays, with a single search of employees for all the lines.
+        """
+        ranges = {
+            (None, line.date, line.date)
+            for line in self
+            if line.date and not line.year_id.country_id
+        }
+        lines = self.filtered(lambda line: line.date and line.year_id.country_id)
+        if not lines:
+            return ranges
+        employees = (
+            self.env["hr.employee"]
+            .with_context(active_test=False)
+            .search([("address_id.country_id", "in", lines.year_id.country_id.ids)])
         )
-        records._compute_theoretical_hours()
+        employee_ids = defaultdict(list)
+        for employee in employees:
+            address = employee.address_id
+            employee_ids[(address.country_id, address.state_id)].append(employee.id)
+        for line in lines:
+            for (country, state), ids in employee_ids.items():
+                if country == line.year_id.country_id and (
+                    not line.state_ids or state in line.state_ids
+                ):
+                    ranges.update(
+                        (employee_id, line.date, line.date) for employee_id in ids
+                    )
+        return ranges
+
+    @api.model
+    def _schedule_theoretical_hours(self, ranges):
+        """Invalidate the cached theoretical hours of the employees of the
+        given ranges, and recompute them, or queue them for the scheduled
+        action when the recomputation is asynchronous.
+        """
+        self.env["hr.attendance.theoretical.time.cache"]._invalidate(
+            employee_id for employee_id, *__ in ranges
+        )
+        queue = self.env["hr.attendance.theoretical.time.queue"]
+        if queue._is_enabled():
+            queue._enqueue(ranges)
+        else:
+            self.env["hr.attendance"]._recompute_theoretical_time_ranges(ranges)
 
     @api.model_create_multi
     def create(self, vals_list):
         """Trigger recomputation for the date of the new lines."""
         records = super().create(vals_list)
-        for record in records:
-            self._check_theoretical_hours(record.date)
+        self._schedule_theoretical_hours(records._get_theoretical_time_ranges())
         return records
 
     def write(self, vals):
-        """If the date of a line is changed, we first recompute hours of the
-        previous date, and then the theoretical hours of the current date.
+        """If the date or the area of a line is changed, we recompute both
+        the previous days and the current ones.
         """
-        if "date" in vals:
-            dates = set(self.mapped("date"))
-            dates.add(vals["date"])
+        if not {"date", "state_ids", "year_id"} & set(vals):
+            return super().write(vals)
+        ranges = self._get_theoretical_time_ranges()
+        res = super().write(vals)
+        self._schedule_theoretical_hours(ranges | self._get_theoretical_time_ranges())
+        return res
+
+    def unlink(self):
+        ranges = self._get_theoretical_time_ranges()
+        res = super().unlink()
+        self._schedule_theoretical_hours(ranges)
+        return res
+
+
+class HrHolidaysPublic(models.Model):
+    _inherit = "hr.holidays.public"
+
+    def write(self, vals):
+        if "country_id" not in vals:
+            return super().write(vals)
+        lines = self.line_ids
+        ranges = lines._get_theoretical_time_ranges()
         res = super().write(vals)
-        if "date" in vals:
-            for date in dates:
-                self._check_theoretical_hours(date=date)
+        lines._schedule_theoretical_hours(ranges | lines._get_theoretical_time_ranges())
         return res
@@ -11,35 +11,46 @@ class HrLeave(models.Model):
         """On leave creation, trigger the recomputation of the involved
         records."""
         res = super()._create_resource_leave()
-        self._check_theoretical_hours()
+        self._schedule_theoretical_hours()
         return res
 
     def _remove_resource_leave(self):
         """On leave cancellation, trigger the recomputation of the involved
         records."""
         res = super()._remove_resource_leave()
-        self._check_theoretical_hours()
+        self._schedule_theoretical_hours()
         return res
 
+    def _get_theoretical_time_ranges(self):
+        """Return the (employee id, first date, last date) ranges of the
+        days covered by the leaves.
+        """
+        return [
+            (leave.employee_id.id, leave.date_from.date(), leave.date_to.date())
+            for leave in self
+            if leave.employee_id and leave.date_from and leave.date_to
+        ]
+
+    def _schedule_theoretical_hours(self):
+        """Invalidate the cached theoretical hours of the employees of the
+        leaves, and recompute them, or queue them for the scheduled action
+        when the recomputation is asynchronous.
+        """
+        self.env["hr.attendance.theoretical.time.cache"]._invalidate(
+            self.employee_id.ids
+        )
+        queue = self.env["hr.attendance.theoretical.time.queue"]
+        if not queue._is_enabled():
+            self._check_theoretical_hours()
+            return
+        queue._enqueue(self._get_theoretical_time_ranges())
+
     def _check_theoretical_hours(self):
         """Recomputes all the theoretical hours that corresponds to the
         interval of dates and employee of the leaves.
 
         :param: self: Leave recordset.
         """
-        to_recompute = self.env["hr.attendance"]
-        for record in self.filtered(lambda x: x.date_from and x.date_to):
-            from_datetime = record.date_from.replace(
-                hour=0, minute=0, second=0, microsecond=0
-            )
-            to_datetime = record.date_to.replace(
-                hour=23, minute=59, second=59, microsecond=99999
-            )
-            to_recompute |= self.env["hr.attendance"].search(
-                [
-                    ("employee_id", "=", record.employee_id.id),
-                    ("check_in", ">=", from_datetime),
-                    ("check_in", "<=", to_datetime),
-                ]
-            )
-        to_recompute._compute_theoretical_hours()
+        self.env["hr.attendance"]._recompute_theoretical_time_ranges(
+            self._get_theoretical_time_ranges()
+        )
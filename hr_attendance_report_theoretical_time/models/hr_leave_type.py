@@ -12,3 +12,12 @@ class HrLeaveType(models.Model):
         help="If you check this mark, leaves in this category won't reduce "
         "the number of theoretical hours in the attendance report.",
     )
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "include_in_theoretical" in vals:
+            leaves = self.env["hr.leave"].search(
+                [("holiday_status_id", "in", self.ids), ("state", "=", "validate")]
+            )
+            leaves._schedule_theoretical_hours()
+        return res
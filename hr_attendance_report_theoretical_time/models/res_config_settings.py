@@ -0,0 +1,38 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import fields, models
+
+
+class ResConfigSettings(models.TransientModel):
+    _inherit = "res.config.settings"
+
+    theoretical_time_report_stored = fields.Boolean(
+        string="Stored theoretical time report",
+        config_parameter="hr_attendance_report_theoretical_time.report_stored",
+        help="Read the theoretical vs attended time report from a table with "
+        "one row per employee and day, refreshed when attendances, leaves, "
+        "public holidays, calendars or employees change, instead of "
+        "generating all the days on each query.",
+    )
+    theoretical_time_report_sql = fields.Boolean(
+        string="Theoretical hours computed in SQL",
+        config_parameter="hr_attendance_report_theoretical_time.report_sql_hours",
+        help="Compute the theoretical hours of the days without attendances "
+        "inside the database, so the report values can be aggregated, sorted "
+        "and filtered directly.",
+    )
+    theoretical_time_recompute_async = fields.Boolean(
+        string="Recompute theoretical hours in background",
+        config_parameter="hr_attendance_report_theoretical_time.recompute_async",
+        help="Queue the theoretical hours affected by leaves and public holidays "
+        "for a scheduled action instead of recomputing them when they are "
+        "approved or created.",
+    )
+
+    def set_values(self):
+        report = self.env["hr.attendance.theoretical.time.report"]
+        previous_mode = (report._is_stored_mode(), report._is_sql_mode())
+        res = super().set_values()
+        if (report._is_stored_mode(), report._is_sql_mode()) != previous_mode:
+            report._apply_report_mode()
+        return res
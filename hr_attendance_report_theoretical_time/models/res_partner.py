@@ -0,0 +1,25 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import models
+
+
+class ResPartner(models.Model):
+    _inherit = "res.partner"
+
+    def write(self, vals):
+        """Invalidate the cached theoretical hours and refresh the stored days
+        of the employees with these addresses when their area changes, as it
+        selects their public holidays.
+        """
+        res = super().write(vals)
+        if {"country_id", "state_id"} & set(vals):
+            employees = (
+                self.env["hr.employee"]
+                .with_context(active_test=False)
+                .search([("address_id", "in", self.ids)])
+            )
+            self.env["hr.attendance.theoretical.time.cache"]._invalidate(employees.ids)
+            self.env["hr.attendance.theoretical.time.day"]._refresh_employees(
+                employees.ids
+            )
+        return res
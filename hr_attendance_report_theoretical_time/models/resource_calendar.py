@@ -0,0 +1,48 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import models
+
+
+class ResourceCalendar(models.Model):
+    _inherit = "resource.calendar"
+
+    def _get_theoretical_time_lines(self):
+        """Return the values of the lines that change the theoretical hours."""
+        return {
+            (
+                int(line.dayofweek),
+                line.hour_from,
+                line.hour_to,
+                line.date_from,
+                line.date_to,
+                line.week_type,
+            )
+            for line in self.attendance_ids
+            if not line.display_type
+        }
+
+    def _get_theoretical_time_weekdays(self, other):
+        """Return the weekdays (0 for Monday) whose theoretical hours differ
+        between this calendar and the other one.
+        """
+        if self == other:
+            return set()
+        if (
+            not self
+            or not other
+            or self.tz != other.tz
+            or self.two_weeks_calendar != other.two_weeks_calendar
+        ):
+            return set(range(7))
+        lines = self._get_theoretical_time_lines()
+        return {line[0] for line in lines ^ other._get_theoretical_time_lines()}
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {"tz", "two_weeks_calendar"} & set(vals):
+            self.env["resource.calendar.attendance"]._recompute_theoretical_time(
+                (calendar.id, weekday, None, None)
+                for calendar in self
+                for weekday in range(7)
+            )
+        return res
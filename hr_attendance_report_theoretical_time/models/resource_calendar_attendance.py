@@ -0,0 +1,90 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from collections import defaultdict
+
+from odoo import api, models
+
+# Fields of the calendar lines that change the theoretical hours
+THEORETICAL_TIME_FIELDS = {
+    "calendar_id",
+    "dayofweek",
+    "hour_from",
+    "hour_to",
+    "date_from",
+    "date_to",
+    "week_type",
+    "display_type",
+}
+
+
+class ResourceCalendarAttendance(models.Model):
+    _inherit = "resource.calendar.attendance"
+
+    def _get_theoretical_time_scopes(self):
+        """Return the (calendar id, weekday, first date, last date) scopes of
+        the days where the lines apply, with None for no date limit.
+        """
+        return {
+            (line.calendar_id.id, int(line.dayofweek), line.date_from, line.date_to)
+            for line in self
+            if line.calendar_id and not line.display_type
+        }
+
+    @api.model
+    def _recompute_theoretical_time(self, scopes):
+        """Recompute the theoretical hours of the employees using the
+        calendars of the given scopes, only on their weekdays and dates.
+
+        :param scopes: Iterable of (calendar id, weekday, first date, last
+          date) tuples, with None for no date limit.
+        """
+        weekdays = defaultdict(set)
+        for calendar_id, weekday, date_from, date_to in scopes:
+            weekdays[(calendar_id, date_from, date_to)].add(weekday)
+        if not weekdays:
+            return
+        employees = (
+            self.env["hr.employee"]
+            .with_context(active_test=False)
+            .search_read(
+                [
+                    (
+                        "resource_calendar_id",
+                        "in",
+                        list({calendar_id for calendar_id, *__ in weekdays}),
+                    )
+                ],
+                ["resource_calendar_id"],
+            )
+        )
+        self.env["hr.attendance.theoretical.time.cache"]._invalidate(
+            employee["id"] for employee in employees
+        )
+        employee_ids = defaultdict(list)
+        for employee in employees:
+            employee_ids[employee["resource_calendar_id"][0]].append(employee["id"])
+        attendances = self.env["hr.attendance"]
+        for (calendar_id, date_from, date_to), days in weekdays.items():
+            attendances._recompute_theoretical_time_weekdays(
+                employee_ids[calendar_id], days, date_from, date_to
+            )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._recompute_theoretical_time(records._get_theoretical_time_scopes())
+        return records
+
+    def write(self, vals):
+        if not THEORETICAL_TIME_FIELDS & set(vals):
+            return super().write(vals)
+        scopes = self._get_theoretical_time_scopes()
+        res = super().write(vals)
+        self._recompute_theoretical_time(scopes | self._get_theoretical_time_scopes())
+        return res
+
+    def unlink(self):
+        scopes = self._get_theoretical_time_scopes()
+        res = super().unlink()
+        self._recompute_theoretical_time(scopes)
+        return res
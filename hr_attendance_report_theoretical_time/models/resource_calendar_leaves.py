@@ -0,0 +1,95 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+# Fields of the calendar leaves that change the theoretical hours
+THEORETICAL_TIME_FIELDS = {
+    "calendar_id",
+    "resource_id",
+    "date_from",
+    "date_to",
+    "time_type",
+}
+
+
+class ResourceCalendarLeaves(models.Model):
+    _inherit = "resource.calendar.leaves"
+
+    def _get_theoretical_time_ranges(self):
+        """Return the (employee id or None for all of them, first date, last
+        date) ranges of the days covered by the leaves not coming from time
+        off requests, which are handled by them: the employee of the
+        resource, the ones using the calendar, or all of them for global
+        leaves, with a single search of employees for all the leaves.
+        """
+        leaves = self.filtered(
+            lambda leave: not leave.holiday_id and leave.date_from and leave.date_to
+        )
+        ranges = {
+            (None, leave.date_from.date(), leave.date_to.date())
+            for leave in leaves
+            if not leave.resource_id and not leave.calendar_id
+        }
+        leaves -= leaves.filtered(
+            lambda leave: not leave.resource_id and not leave.calendar_id
+        )
+        if not leaves:
+            return ranges
+        calendar_leaves = leaves.filtered(lambda leave: not leave.resource_id)
+        employees = (
+            self.env["hr.employee"]
+            .with_context(active_test=False)
+            .search(
+                [
+                    "|",
+                    ("resource_id", "in", leaves.resource_id.ids),
+                    ("resource_calendar_id", "in", calendar_leaves.calendar_id.ids),
+                ]
+            )
+        )
+        for leave in leaves:
+            if leave.resource_id:
+                matched = employees.filtered(
+                    lambda employee, leave=leave: employee.resource_id
+                    == leave.resource_id
+                )
+            else:
+                matched = employees.filtered(
+                    lambda employee, leave=leave: employee.resource_calendar_id
+                    == leave.calendar_id
+                )
+            ranges.update(
+                (employee_id, leave.date_from.date(), leave.date_to.date())
+                for employee_id in matched.ids
+            )
+        return ranges
+
+    @api.model
+    def _refresh_theoretical_hours(self, ranges):
+        """Invalidate the cached theoretical hours of the employees of the
+        given ranges, and refresh their stored days.
+        """
+        self.env["hr.attendance.theoretical.time.cache"]._invalidate(
+            employee_id for employee_id, *__ in ranges
+        )
+        self.env["hr.attendance.theoretical.time.day"]._refresh_ranges(ranges)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._refresh_theoretical_hours(records._get_theoretical_time_ranges())
+        return records
+
+    def write(self, vals):
+        if not THEORETICAL_TIME_FIELDS & set(vals):
+            return super().write(vals)
+        ranges = self._get_theoretical_time_ranges()
+        res = super().write(vals)
+        self._refresh_theoretical_hours(ranges | self._get_theoretical_time_ranges())
+        return res
+
+    def unlink(self):
+        ranges = self._get_theoretical_time_ranges()
+        res = super().unlink()
+        self._refresh_theoretical_hours(ranges)
+        return res
@@ -1,3 +1,9 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+from . import hr_attendance_theoretical_time_balance
+from . import hr_attendance_theoretical_time_cache
+from . import hr_attendance_theoretical_time_day
+from . import hr_attendance_theoretical_time_queue
 from . import hr_attendance_theoretical_time_report
+from . import hr_attendance_theoretical_time_rollup
+from . import hr_attendance_theoretical_time_stats
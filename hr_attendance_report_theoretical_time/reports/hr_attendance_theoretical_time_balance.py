@@ -0,0 +1,169 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from psycopg2.extensions import AsIs
+
+from odoo import api, fields, models
+from odoo.tools import date_utils
+
+
+class HrAttendanceTheoreticalTimeBalance(models.Model):
+    """Monthly checkpoints of the cumulative difference between worked and
+    theoretical hours of each employee, built from the monthly totals of the
+    stored report. The balance at any date is the previous checkpoint plus
+    the stored days of its month.
+    """
+
+    _name = "hr.attendance.theoretical.time.balance"
+    _description = "Monthly balance of theoretical time vs attendance time"
+    _order = "employee_id,date"
+    _log_access = False
+
+    employee_id = fields.Many2one(
+        comodel_name="hr.employee", required=True, ondelete="cascade"
+    )
+    date = fields.Date(required=True, help="First day of the month.")
+    difference = fields.Float(help="Difference of the month.")
+    balance = fields.Float(help="Cumulative difference until the end of the month.")
+
+    _sql_constraints = [
+        (
+            "employee_date_unique",
+            "UNIQUE(employee_id, date)",
+            "Only one balance per employee and month is allowed.",
+        )
+    ]
+
+    def _flush_search(self, domain, fields=None, order=None, seen=None):
+        self.env["hr.attendance.theoretical.time.day"]._flush_rollup()
+        return super()._flush_search(domain, fields=fields, order=order, seen=seen)
+
+    @api.model
+    def _refresh_employees(self, dates_by_employee):
+        """Recompute the checkpoints of each employee from the month of the
+        given date on, keeping the previous ones.
+
+        :param dates_by_employee: Dictionary {employee id: first changed date}.
+        """
+        if not dates_by_employee:
+            return
+        cr = self.env.cr
+        params = (
+            list(dates_by_employee),
+            [date_utils.start_of(date, "month") for date in dates_by_employee.values()],
+        )
+        rollup_table = self.env["hr.attendance.theoretical.time.rollup"]._table
+        cr.execute(
+            f"""
+            DELETE FROM {self._table} AS b
+            USING unnest(%s::int[], %s::date[]) AS c(employee_id, date)
+            WHERE b.employee_id = c.employee_id AND b.date >= c.date
+            """,
+            params,
+        )
+        cr.execute(
+            f"""
+            INSERT INTO {self._table} (employee_id, date, difference, balance)
+            SELECT r.employee_id, r.date, r.difference,
+                COALESCE((
+                    SELECT b.balance FROM {self._table} AS b
+                    WHERE b.employee_id = r.employee_id AND b.date < r.date_from
+                    ORDER BY b.date DESC
+                    LIMIT 1
+                ), 0.0) + sum(r.difference) OVER (
+                    PARTITION BY r.employee_id ORDER BY r.date
+                )
+            FROM (
+                SELECT r.employee_id, r.date, c.date AS date_from,
+                    sum(r.difference) AS difference
+                FROM unnest(%s::int[], %s::date[]) AS c(employee_id, date)
+                INNER JOIN {rollup_table} AS r
+                    ON r.employee_id = c.employee_id
+                    AND r.granularity = 'month'
+                    AND r.date >= c.date
+                GROUP BY r.employee_id, r.date, c.date
+            ) AS r
+            """,
+            params,
+        )
+        self.invalidate_model()
+
+    @api.model
+    def _rebuild(self):
+        """Regenerate all the checkpoints from the monthly totals."""
+        cr = self.env.cr
+        cr.execute("DELETE FROM %s", (AsIs(self._table),))
+        cr.execute(
+            """
+            INSERT INTO %s (employee_id, date, difference, balance)
+            SELECT employee_id, date, difference,
+                sum(difference) OVER (PARTITION BY employee_id ORDER BY date)
+            FROM (
+                SELECT employee_id, date, sum(difference) AS difference
+                FROM %s
+                WHERE granularity = 'month'
+                GROUP BY employee_id, date
+            ) AS r
+            """,
+            (
+                AsIs(self._table),
+                AsIs(self.env["hr.attendance.theoretical.time.rollup"]._table),
+            ),
+        )
+        self.invalidate_model()
+
+    @api.model
+    def _get_balances(self, employees, date):
+        """Get the cumulative difference between worked and theoretical hours
+        of the employees until the given date (included).
+
+        :return: Dictionary {employee id: balance}.
+        """
+        res = dict.fromkeys(employees.ids, 0.0)
+        if not employees:
+            return res
+        report = self.env["hr.attendance.theoretical.time.report"]
+        if not report._is_stored_mode():
+            lines = report.read_group(
+                [("employee_id", "in", employees.ids), ("date", "<=", date)],
+                [
+                    "employee_id",
+                    "worked_hours:sum",
+                    "theoretical_hours:sum",
+                    "difference:sum",
+                ],
+                ["employee_id"],
+            )
+            for line in lines:
+                res[line["employee_id"][0]] = line["difference"]
+            return res
+        self.env["hr.attendance.theoretical.time.day"]._flush_rollup()
+        self.env.flush_all()
+        month_start = date_utils.start_of(date, "month")
+        cr = self.env.cr
+        cr.execute(
+            """
+            SELECT DISTINCT ON (employee_id) employee_id, balance
+            FROM %s
+            WHERE employee_id IN %s AND date < %s
+            ORDER BY employee_id, date DESC
+            """,
+            (AsIs(self._table), tuple(employees.ids), month_start),
+        )
+        res.update(cr.fetchall())
+        cr.execute(
+            """
+            SELECT employee_id, sum(difference)
+            FROM %s
+            WHERE employee_id IN %s AND date >= %s AND date <= %s
+            GROUP BY employee_id
+            """,
+            (
+                AsIs(self.env["hr.attendance.theoretical.time.day"]._table),
+                tuple(employees.ids),
+                month_start,
+                date,
+            ),
+        )
+        for employee_id, difference in cr.fetchall():
+            res[employee_id] += difference
+        return res
@@ -0,0 +1,155 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import threading
+
+from psycopg2.extensions import AsIs
+
+from odoo import api, fields, models
+from odoo.tools.lru import LRU
+
+# Maximum number of (employee, day) theoretical hours kept by each process
+THEORETICAL_HOURS_CACHE_SIZE = 200000
+# Days after which the superseded invalidations of an employee are removed,
+# long enough for not having transactions still open from that time
+THEORETICAL_HOURS_CACHE_COMPACT_DAYS = 1
+
+# Theoretical hours of each (database, employee id, date), with the version
+# of the inputs they were computed with, shared by the threads of the process
+_theoretical_hours_cache = LRU(THEORETICAL_HOURS_CACHE_SIZE)
+_theoretical_hours_cache_lock = threading.Lock()
+_theoretical_hours_cache_counters = {"hit": 0, "miss": 0}
+
+
+class HrAttendanceTheoreticalTimeCache(models.Model):
+    """Invalidations of the cached theoretical hours of an employee, or of
+    all the employees when empty. The version of the cached hours of an
+    employee is the number of its invalidations and the greatest ID of them,
+    so the cache entries of the other processes stop matching as soon as an
+    invalidation is committed, and the ones computed by a transaction with
+    its own uncommitted invalidations never match for the others. As the
+    queue, the triggers only append rows, so they don't conflict between
+    concurrent transactions.
+    """
+
+    _name = "hr.attendance.theoretical.time.cache"
+    _description = "Invalidation of cached theoretical hours"
+    _order = "id"
+
+    employee_id = fields.Many2one(comodel_name="hr.employee", ondelete="cascade")
+
+    def init(self):
+        self.env.cr.execute(
+            "CREATE INDEX IF NOT EXISTS %s ON %s (employee_id, id)",
+            (AsIs("%s_employee_id_index" % self._table), AsIs(self._table)),
+        )
+
+    @api.model
+    def _invalidate(self, employee_ids):
+        """Invalidate the cached theoretical hours of the given employees.
+
+        :param employee_ids: Iterable of employee IDs, None meaning all the
+          employees.
+        """
+        employee_ids = {employee_id or None for employee_id in employee_ids}
+        if not employee_ids:
+            return
+        if None in employee_ids:
+            employee_ids = {None}
+        self.env.cr.execute(
+            """
+            INSERT INTO %s (employee_id, create_uid, create_date)
+            SELECT employee_id, %s, now() AT TIME ZONE 'UTC'
+            FROM unnest(%s::int[]) AS employee_id
+            """,
+            (AsIs(self._table), self.env.uid, list(employee_ids)),
+        )
+
+    @api.model
+    def _get_versions(self, employee_ids):
+        """Get the current version of the cached hours of each employee.
+
+        :return: Dictionary {employee id: version}.
+        """
+        self.env.cr.execute(
+            """
+            SELECT employee_id, count(*), max(id) FROM %s
+            WHERE employee_id = ANY(%s) OR employee_id IS NULL
+            GROUP BY employee_id
+            """,
+            (AsIs(self._table), list(employee_ids)),
+        )
+        counts = {row[0]: tuple(row[1:]) for row in self.env.cr.fetchall()}
+        common = counts.pop(None, (0, 0))
+        return {
+            employee_id: (counts.get(employee_id, (0, 0)), common)
+            for employee_id in employee_ids
+        }
+
+    @api.model
+    def _get(self, versions, pairs):
+        """Get the cached theoretical hours of the given (employee id, date)
+        pairs computed with the current versions, counting hits and misses.
+
+        :param versions: Versions as returned by `_get_versions`.
+        :return: Dictionary {(employee id, date): hours} of the cached pairs.
+        """
+        dbname = self.env.cr.dbname
+        res = {}
+        misses = 0
+        for employee_id, date in pairs:
+            entry = _theoretical_hours_cache.get((dbname, employee_id, date))
+            if entry and entry[0] == versions[employee_id]:
+                res[(employee_id, date)] = entry[1]
+            else:
+                misses += 1
+        with _theoretical_hours_cache_lock:
+            _theoretical_hours_cache_counters["hit"] += len(res)
+            _theoretical_hours_cache_counters["miss"] += misses
+        return res
+
+    @api.model
+    def _set(self, versions, hours):
+        """Cache the given {(employee id, date): hours} values, computed with
+        the given versions.
+        """
+        dbname = self.env.cr.dbname
+        for (employee_id, date), value in hours.items():
+            _theoretical_hours_cache[(dbname, employee_id, date)] = (
+                versions[employee_id],
+                value,
+            )
+
+    @api.model
+    def _get_stats(self):
+        """Return the hit/miss counters and the size of the cache of this
+        process, for checking its efficiency.
+        """
+        counters = dict(_theoretical_hours_cache_counters)
+        total = counters["hit"] + counters["miss"]
+        return dict(
+            counters,
+            ratio=100.0 * counters["hit"] / total if total else 0.0,
+            size=len(_theoretical_hours_cache),
+        )
+
+    @api.model
+    def _cron_compact(self):
+        """Remove the old invalidations superseded by a later one of the same
+        employee. Versions change once more, which only causes misses.
+        """
+        self.env.cr.execute(
+            """
+            DELETE FROM %s AS c
+            WHERE c.create_date < now() AT TIME ZONE 'UTC' - %s * interval '1 day'
+            AND EXISTS (
+                SELECT 1 FROM %s AS n
+                WHERE n.employee_id IS NOT DISTINCT FROM c.employee_id
+                AND n.id > c.id
+            )
+            """,
+            (
+                AsIs(self._table),
+                THEORETICAL_HOURS_CACHE_COMPACT_DAYS,
+                AsIs(self._table),
+            ),
+        )
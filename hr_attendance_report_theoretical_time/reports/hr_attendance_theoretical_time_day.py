@@ -0,0 +1,319 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from collections import defaultdict
+
+from psycopg2.extensions import AsIs
+
+from odoo import api, fields, models
+
+
+class HrAttendanceTheoreticalTimeDay(models.Model):
+    """Stored version of the theoretical vs attendance time report, with one
+    row per employee and day. It's only filled when the stored mode of the
+    report is enabled, and it's refreshed incrementally when the inputs of
+    the report change.
+    """
+
+    _name = "hr.attendance.theoretical.time.day"
+    _description = "Stored day of theoretical time vs attendance time"
+    _order = "date,employee_id"
+    _log_access = False
+
+    employee_id = fields.Many2one(
+        comodel_name="hr.employee", required=True, ondelete="cascade"
+    )
+    department_id = fields.Many2one(comodel_name="hr.department")
+    date = fields.Date(required=True, index=True)
+    worked_hours = fields.Float()
+    theoretical_hours = fields.Float()
+    difference = fields.Float()
+
+    _sql_constraints = [
+        (
+            "employee_date_unique",
+            "UNIQUE(employee_id, date)",
+            "Only one stored day per employee and date is allowed.",
+        )
+    ]
+
+    def init(self):
+        # The report view computes its row IDs from the employee and the date,
+        # so index that expression for reading stored rows by ID.
+        report = self.env["hr.attendance.theoretical.time.report"]
+        self.env.cr.execute(
+            "CREATE INDEX IF NOT EXISTS %s ON %s ((%s))",
+            (
+                AsIs("%s_report_id_index" % self._table),
+                AsIs(self._table),
+                AsIs(report._select_id("employee_id", "date")),
+            ),
+        )
+
+    @api.model
+    def _is_enabled(self):
+        return self.env["hr.attendance.theoretical.time.report"]._is_stored_mode()
+
+    @api.model
+    def _refresh_where(
+        self,
+        where,
+        params=None,
+        date_from=None,
+        date_to=None,
+        rollup=True,
+        employee_ids=None,
+    ):
+        """Regenerate the stored days matching the given condition from the
+        live query of the report.
+
+        :param where: SQL condition over `employee_id` and `date` columns.
+        :param params: Parameters for the placeholders of the condition.
+        :param date_from: Optional first date matched by the condition.
+        :param date_to: Optional last date matched by the condition.
+        :param rollup: Schedule the refresh of the period totals containing
+          the days.
+        :param employee_ids: Optional employees matched by the condition.
+        """
+        if not self._is_enabled():
+            return
+        self.env.flush_all()
+        cr = self.env.cr
+        condition = AsIs(cr.mogrify(where, params or ()).decode())
+        cr.execute(
+            "DELETE FROM %s WHERE %s RETURNING employee_id, date",
+            (AsIs(self._table), condition),
+        )
+        days = set(cr.fetchall())
+        report = self.env["hr.attendance.theoretical.time.report"].with_context(
+            theoretical_time_report_bounds={
+                "date_from": date_from and fields.Date.to_string(date_from),
+                "date_to": date_to and fields.Date.to_string(date_to),
+                "employee_ids": employee_ids and sorted(employee_ids),
+            }
+        )
+        cr.execute(
+            """
+            INSERT INTO %s (
+                employee_id, department_id, date,
+                worked_hours, theoretical_hours, difference
+            )
+            SELECT
+                employee_id, department_id, date,
+                worked_hours, theoretical_hours, 0.0
+            FROM (%s) AS r
+            WHERE %s
+            RETURNING id, employee_id, date
+            """,
+            (
+                AsIs(self._table),
+                AsIs(report._query()),
+                condition,
+            ),
+        )
+        rows = cr.fetchall()
+        self._fill_theoretical_hours([row[0] for row in rows])
+        if rollup:
+            days.update(row[1:] for row in rows)
+            self._schedule_rollup(days)
+
+    @api.model
+    def _schedule_rollup(self, days):
+        """Record the given (employee id, date) pairs for refreshing the
+        period totals and the balances containing them once, when the
+        transaction is committed or before they are searched, instead of on
+        each change of the stored days.
+        """
+        precommit = self.env.cr.precommit
+        pending = precommit.data.setdefault("theoretical_time_rollup_days", set())
+        if not pending:
+            precommit.add(self._flush_rollup)
+        pending.update(days)
+
+    @api.model
+    def _flush_rollup(self):
+        """Refresh the period totals and the balances of the pending days."""
+        days = self.env.cr.precommit.data.pop("theoretical_time_rollup_days", None)
+        if days:
+            self.env["hr.attendance.theoretical.time.rollup"]._refresh_days(days)
+
+    def _fill_theoretical_hours(self, ids):
+        """Compute the theoretical hours of the given stored days that come
+        without them from the live query, and update the difference.
+        """
+        if not ids:
+            return
+        cr = self.env.cr
+        cr.execute(
+            """
+            SELECT id, employee_id, date FROM %s
+            WHERE id = ANY(%s) AND theoretical_hours < 0
+            """,
+            (AsIs(self._table), ids),
+        )
+        rows = cr.fetchall()
+        report = self.env["hr.attendance.theoretical.time.report"]
+        employees = self.env["hr.employee"].sudo().browse({row[1] for row in rows})
+        computed = report._theoretical_hours_by_day(
+            (employees.browse(employee_id), date) for _id, employee_id, date in rows
+        )
+        hours = [computed[(employee_id, date)] for _id, employee_id, date in rows]
+        cr.execute(
+            """
+            UPDATE %s AS t SET theoretical_hours = v.hours
+            FROM unnest(%s::int[], %s::float8[]) AS v(id, hours)
+            WHERE t.id = v.id
+            """,
+            (AsIs(self._table), [row[0] for row in rows], hours),
+        )
+        cr.execute(
+            """
+            UPDATE %s SET difference = worked_hours - theoretical_hours
+            WHERE id = ANY(%s)
+            """,
+            (AsIs(self._table), ids),
+        )
+        self.invalidate_model()
+
+    @api.model
+    def _refresh_days(self, pairs):
+        """Refresh the stored days of the given (employee id, date) pairs."""
+        pairs = {(employee_id, date) for employee_id, date in pairs if employee_id}
+        if pairs:
+            dates = [date for __, date in pairs]
+            self._refresh_where(
+                "(employee_id, date) IN %s",
+                (tuple(pairs),),
+                min(dates),
+                max(dates),
+                employee_ids={employee_id for employee_id, __ in pairs},
+            )
+
+    @api.model
+    def _refresh_employees(self, employee_ids, date_from=None, date_to=None):
+        """Refresh the stored days of the given employees, optionally limited
+        to the given interval of dates (both included).
+        """
+        if not employee_ids:
+            return
+        where = "employee_id IN %s"
+        params = [tuple(employee_ids)]
+        if date_from:
+            where += " AND date >= %s"
+            params.append(date_from)
+        if date_to:
+            where += " AND date <= %s"
+            params.append(date_to)
+        self._refresh_where(
+            where,
+            params,
+            date_from and fields.Date.to_date(date_from),
+            date_to and fields.Date.to_date(date_to),
+            employee_ids=employee_ids,
+        )
+
+    @api.model
+    def _refresh_weekdays(self, employee_ids, weekdays, date_from=None, date_to=None):
+        """Refresh the stored days of the given employees falling on the given
+        weekdays (0 for Monday), optionally limited to the given interval of
+        dates (both included).
+        """
+        if not employee_ids or not weekdays:
+            return
+        where = "employee_id IN %s AND extract(isodow FROM date)::int - 1 IN %s"
+        params = [tuple(employee_ids), tuple(weekdays)]
+        if date_from:
+            where += " AND date >= %s"
+            params.append(date_from)
+        if date_to:
+            where += " AND date <= %s"
+            params.append(date_to)
+        self._refresh_where(
+            where, params, date_from, date_to, employee_ids=employee_ids
+        )
+
+    @api.model
+    def _refresh_dates(self, dates):
+        """Refresh the stored days of all the employees for the given dates."""
+        dates = {fields.Date.to_date(date) for date in dates if date}
+        if dates:
+            self._refresh_where("date IN %s", (tuple(dates),), min(dates), max(dates))
+
+    @api.model
+    def _refresh_ranges(self, ranges):
+        """Refresh the stored days of the given (employee id or None for all
+        of them, first date, last date) ranges. The ranges are grouped by
+        their dates in conditions on the employees and an interval of dates,
+        which can be served by the index of the employee and date.
+        """
+        employees_by_dates = defaultdict(set)
+        for employee_id, date_from, date_to in ranges:
+            employees_by_dates[date_from, date_to].add(employee_id or None)
+        if not employees_by_dates:
+            return
+        conditions = []
+        params = []
+        for (date_from, date_to), employee_ids in employees_by_dates.items():
+            if None in employee_ids:
+                conditions.append("(date >= %s AND date <= %s)")
+                params += [date_from, date_to]
+            else:
+                conditions.append(
+                    "(employee_id = ANY(%s) AND date >= %s AND date <= %s)"
+                )
+                params += [sorted(employee_ids), date_from, date_to]
+        employee_ids = set().union(*employees_by_dates.values())
+        self._refresh_where(
+            " OR ".join(conditions),
+            params,
+            min(date_from for date_from, __ in employees_by_dates),
+            max(date_to for __, date_to in employees_by_dates),
+            employee_ids=None if None in employee_ids else employee_ids,
+        )
+
+    @api.model
+    def _update_department(self, employee_ids, department_id):
+        """Move the stored days and period totals of the given employees to
+        their new department.
+        """
+        if not employee_ids or not self._is_enabled():
+            return
+        self.env.flush_all()
+        rollups = self.env["hr.attendance.theoretical.time.rollup"]
+        for model in (self, rollups):
+            self.env.cr.execute(
+                "UPDATE %s SET department_id = %s WHERE employee_id IN %s",
+                (AsIs(model._table), department_id or None, tuple(employee_ids)),
+            )
+            model.invalidate_model(["department_id"])
+
+    @api.model
+    def _rebuild(self):
+        """Regenerate the whole stored table."""
+        self._refresh_where("TRUE", rollup=False)
+        self.env.cr.precommit.data.pop("theoretical_time_rollup_days", None)
+        self.env["hr.attendance.theoretical.time.rollup"]._rebuild()
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_attendance_report_theoretical_time.report_stored_date",
+            fields.Date.to_string(fields.Date.context_today(self)),
+        )
+
+    @api.model
+    def _cron_append_days(self):
+        """Append the days elapsed since the last execution, as the live query
+        generates days only up to the current date.
+        """
+        if not self._is_enabled():
+            return
+        icp = self.env["ir.config_parameter"].sudo()
+        today = fields.Date.context_today(self)
+        last_date = icp.get_param(
+            "hr_attendance_report_theoretical_time.report_stored_date"
+        )
+        date_from = fields.Date.to_date(last_date) if last_date else today
+        self._refresh_where(
+            "date >= %s AND date <= %s", (date_from, today), date_from, today
+        )
+        icp.set_param(
+            "hr_attendance_report_theoretical_time.report_stored_date",
+            fields.Date.to_string(today),
+        )
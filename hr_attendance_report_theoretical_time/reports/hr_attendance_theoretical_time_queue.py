@@ -0,0 +1,203 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import threading
+
+from psycopg2.extensions import AsIs
+
+from odoo import api, fields, models
+from odoo.osv import expression
+
+
+class HrAttendanceTheoreticalTimeQueue(models.Model):
+    """Ranges of days of an employee, or of all the employees when empty,
+    whose theoretical hours are pending to be recomputed. The triggers only
+    append rows, so they don't conflict between concurrent transactions, and
+    the overlapping ranges are merged when the queue is processed.
+    """
+
+    _name = "hr.attendance.theoretical.time.queue"
+    _description = "Pending recomputation of theoretical hours"
+    _order = "id"
+    _log_access = False
+
+    employee_id = fields.Many2one(comodel_name="hr.employee", ondelete="cascade")
+    date_from = fields.Date(required=True)
+    date_to = fields.Date(required=True)
+
+    def init(self):
+        self.env.cr.execute(
+            "CREATE INDEX IF NOT EXISTS %s ON %s (employee_id, date_from, date_to)",
+            (AsIs("%s_range_index" % self._table), AsIs(self._table)),
+        )
+
+    @api.model
+    def _is_enabled(self):
+        return bool(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("hr_attendance_report_theoretical_time.recompute_async")
+        )
+
+    @api.model
+    def _enqueue(self, ranges):
+        """Record the given ranges as pending recompute, skipping the ones
+        already covered by a pending range, and schedule the processing.
+
+        :param ranges: Iterable of (employee id or None for all of them,
+          first date, last date) tuples.
+        """
+        ranges = {
+            (employee_id or None, date_from, date_to)
+            for employee_id, date_from, date_to in ranges
+        }
+        if not ranges:
+            return
+        employee_ids, dates_from, dates_to = zip(*ranges, strict=True)
+        self.env.cr.execute(
+            """
+            INSERT INTO %s (employee_id, date_from, date_to)
+            SELECT n.employee_id, n.date_from, n.date_to
+            FROM unnest(%s::int[], %s::date[], %s::date[])
+                AS n(employee_id, date_from, date_to)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM %s AS q
+                WHERE q.employee_id IS NOT DISTINCT FROM n.employee_id
+                AND q.date_from <= n.date_from AND q.date_to >= n.date_to
+            )
+            """,
+            (
+                AsIs(self._table),
+                list(employee_ids),
+                list(dates_from),
+                list(dates_to),
+                AsIs(self._table),
+            ),
+        )
+        self._invalidate_pending()
+        cron = self.env.ref(
+            "hr_attendance_report_theoretical_time.theoretical_time_queue_cron",
+            raise_if_not_found=False,
+        )
+        if cron:
+            cron.sudo()._trigger()
+
+    @api.model
+    def _invalidate_pending(self):
+        self.invalidate_model()
+        self.env["hr.attendance.theoretical.time.report"].invalidate_model(
+            ["pending_recompute"]
+        )
+
+    @api.model
+    def _get_ranges(self, date_from=None, date_to=None, limit=None):
+        """Get the pending ranges merging the overlapping and contiguous ones
+        of the same employee, optionally only the ones intersecting the given
+        dates.
+
+        :return: List of (employee id or None, first date, last date, queue
+          IDs) tuples, the oldest first.
+        """
+        where = "TRUE"
+        params = []
+        if date_from:
+            where += " AND date_to >= %s"
+            params.append(date_from)
+        if date_to:
+            where += " AND date_from <= %s"
+            params.append(date_to)
+        self.flush_model()
+        self.env.cr.execute(
+            """
+            SELECT employee_id, min(date_from), max(date_to), array_agg(id)
+            FROM (
+                SELECT id, employee_id, date_from, date_to,
+                    sum(start) OVER (
+                        PARTITION BY employee_id ORDER BY date_from, date_to, id
+                    ) AS range_number
+                FROM (
+                    SELECT id, employee_id, date_from, date_to,
+                        CASE WHEN date_from <= max(date_to) OVER (
+                            PARTITION BY employee_id
+                            ORDER BY date_from, date_to, id
+                            ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                        ) + 1 THEN 0 ELSE 1 END AS start
+                    FROM %s
+                    WHERE %s
+                ) AS q
+            ) AS q
+            GROUP BY employee_id, range_number
+            ORDER BY min(id)
+            LIMIT %s
+            """,
+            (
+                AsIs(self._table),
+                AsIs(self.env.cr.mogrify(where, params).decode()),
+                AsIs(int(limit)) if limit else AsIs("ALL"),
+            ),
+        )
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _process_ranges(self, ranges):
+        """Recompute the theoretical hours of the attendances and the stored
+        days of the given merged ranges, and remove them from the queue.
+        """
+        if not ranges:
+            return
+        self.env["hr.attendance"]._recompute_theoretical_time_ranges(
+            (employee_id, date_from, date_to)
+            for employee_id, date_from, date_to, _ids in ranges
+        )
+        self.env.cr.execute(
+            "DELETE FROM %s WHERE id = ANY(%s)",
+            (AsIs(self._table), [id_ for *_range, ids in ranges for id_ in ids]),
+        )
+        self._invalidate_pending()
+
+    @api.model
+    def _cron_process(self, chunk_size=50):
+        """Drain the queue in chunks of merged ranges, committing each one so
+        that the locks are short and the progress is kept.
+        """
+        testing = getattr(threading.current_thread(), "testing", False)
+        while True:
+            ranges = self._get_ranges(limit=chunk_size)
+            if not ranges:
+                break
+            self._process_ranges(ranges)
+            self.env.flush_all()
+            if not testing:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    @api.model
+    def _is_pending(self, pairs):
+        """Get which of the given (employee id, date) pairs are pending
+        recompute.
+
+        :return: Set of the pending pairs.
+        """
+        pairs = set(pairs)
+        if not pairs:
+            return set()
+        dates = [date for __, date in pairs]
+        ranges = self._get_ranges(min(dates), max(dates))
+        return {
+            (employee_id, date)
+            for employee_id, date in pairs
+            if any(
+                range_employee_id in (None, employee_id)
+                and date_from <= date <= date_to
+                for range_employee_id, date_from, date_to, _ids in ranges
+            )
+        }
+
+    @api.model
+    def _get_pending_domain(self):
+        """Domain over employee_id and date matching the pending days."""
+        return expression.OR(
+            [
+                [("date", ">=", date_from), ("date", "<=", date_to)]
+                + ([("employee_id", "=", employee_id)] if employee_id else [])
+                for employee_id, date_from, date_to, _ids in self._get_ranges()
+            ]
+        )
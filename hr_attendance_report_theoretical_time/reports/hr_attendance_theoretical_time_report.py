@@ -2,12 +2,29 @@
 # Copyright 2021 Tecnativa - Víctor Martínez
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
-from datetime import datetime, time
+import json
+import logging
+import threading
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from time import perf_counter
 
 import pytz
 from psycopg2.extensions import AsIs
 
 from odoo import api, fields, models, tools
+from odoo.osv import expression
+from odoo.tools import SQL, date_utils, get_lang
+
+_logger = logging.getLogger(__name__)
+
+# Figures of the instrumented operation running in the current thread
+_instrumentation = threading.local()
+# Held by the instrumented operation tracing the memory allocations, which is
+# a state of the whole process
+_instrumentation_memory_lock = threading.Lock()
 
 
 class HrAttendanceTheoreticalTimeReport(models.Model):
@@ -16,6 +33,9 @@ class HrAttendanceTheoreticalTimeReport(models.Model):
     _auto = False
     _rec_name = "date"
     _order = "date,employee_id,theoretical_hours desc"
+    # Maximum days between dates whose theoretical hours are computed in the
+    # same pass, as computing the days between them is cheaper than a new one
+    _theoretical_hours_window_gap = 31
 
     employee_id = fields.Many2one(
         comodel_name="hr.employee", string="Employee", readonly=True
@@ -30,29 +50,53 @@ class HrAttendanceTheoreticalTimeReport(models.Model):
     worked_hours = fields.Float(string="Worked", readonly=True)
     theoretical_hours = fields.Float(string="Theoric", readonly=True)
     difference = fields.Float(readonly=True)
+    pending_recompute = fields.Boolean(
+        compute="_compute_pending_recompute",
+        search="_search_pending_recompute",
+        help="The theoretical hours of the day are waiting to be recomputed.",
+    )
+
+    def _select_id(self, employee_column, date_column):
+        """SQL expression of the report row ID, combining the employee ID
+        shifted 20 bits and the ordinal of the day, which fits in those bits
+        until year 2871. This way, the ID is unique and cheap to compute, and
+        the employee and date of a row can be obtained back from its ID.
+        """
+        return (
+            f"(({employee_column}::bigint << 20) + ({date_column} - DATE '0001-01-01'))"
+        )
+
+    @api.model
+    def _split_id(self, record_id):
+        """Return the employee ID and the date encoded in a report row ID."""
+        days = timedelta(days=record_id & 0xFFFFF)
+        return record_id >> 20, datetime.min.date() + days
 
     def _select(self):
         # We put "max" aggregation function for theoretical hours because
         # we will recompute for other detail levels different than day
-        # through recursivity by day results and will aggregate them manually
-        return """
-            min(id) AS id,
+        # through recursivity by day results and will aggregate them manually.
+        # When computed in SQL, the function is called once per employee and
+        # day without attendances, on the grouped rows.
+        theoretical_hours = (
+            "CASE WHEN max(theoretical_hours) < 0"
+            " THEN hr_attendance_theoretical_hours(employee_id, date)"
+            " ELSE max(theoretical_hours) END"
+            if self._is_sql_mode()
+            else "max(theoretical_hours)"
+        )
+        return f"""
+            {self._select_id("employee_id", "date")} AS id,
             employee_id,
             department_id,
             date,
             sum(worked_hours) AS worked_hours,
-            max(theoretical_hours) AS theoretical_hours,
+            {theoretical_hours} AS theoretical_hours,
             sum(difference) AS difference
             """
 
     def _select_sub1(self):
-        # Unique ID is assured (mostly, as we lose some precission) through
-        # this MD5 hash converted to integer. See
-        # https://stackoverflow.com/a/9812029 for details.
         return """
-            (
-                ('x'||substr(MD5('HA' || ha.id::text), 1, 8))::bit(32)::int
-            ) AS id,
             ha.employee_id AS employee_id,
             hahe.department_id AS department_id,
             ha.check_in::date AS date,
@@ -68,16 +112,19 @@ class HrAttendanceTheoreticalTimeReport(models.Model):
             """
 
     def _where_sub1(self):
-        return "True"
+        date_from, date_to = self._get_report_bounds()
+        where = "True"
+        if date_from:
+            where += self._mogrify(" AND ha.check_in >= %s", date_from)
+        if date_to:
+            where += self._mogrify(" AND ha.check_in < %s::date + 1", date_to)
+        employee_ids = self._get_report_employee_ids()
+        if employee_ids:
+            where += self._mogrify(" AND ha.employee_id = ANY(%s)", employee_ids)
+        return where
 
     def _select_sub2(self):
-        # Same comment about ID uniqueness of sub1.
         return """
-            (
-                ('x'||substr(MD5(
-                    'HE' || he.id::text || gs::text
-                ), 1, 8))::bit(32)::int
-            ) AS id,
             he.id AS employee_id,
             he.department_id AS department_id,
             gs::date AS date,
@@ -89,8 +136,23 @@ class HrAttendanceTheoreticalTimeReport(models.Model):
     def _from_sub2(self):
         # We generate one record for each of the theoretical working days
         # since the employee creation / working schedule beginning for not
-        # depending on the registered attendances.
-        return """
+        # depending on the registered attendances. When the report is
+        # searched for some dates, only the days in those bounds are generated.
+        date_from, date_to = self._get_report_bounds()
+        start_bound = date_from and self._mogrify(", %s", date_from) or ""
+        end_bound = date_to and self._mogrify(", %s", date_to) or ""
+        series_start = f"""greatest(
+                        COALESCE(he.theoretical_hours_start_date,
+                                 he.create_date::date),
+                        COALESCE(rca.date_from,
+                                 he.theoretical_hours_start_date,
+                                 he.create_date::date){start_bound}
+                    )"""
+        series_end = f"""least(
+                        COALESCE(rca.date_to, current_date),
+                        current_date{end_bound}
+                    )"""
+        return f"""
                 hr_employee he
             INNER JOIN
                 resource_resource rr ON he.resource_id = rr.id
@@ -99,38 +161,24 @@ class HrAttendanceTheoreticalTimeReport(models.Model):
                     ON rca.calendar_id = rr.calendar_id
             CROSS JOIN
                 generate_series(
-                    greatest(
-                        COALESCE(he.theoretical_hours_start_date,
-                                 he.create_date::date),
-                        COALESCE(rca.date_from,
-                                 he.theoretical_hours_start_date,
-                                 he.create_date::date)
-                    )
+                    {series_start}
                     + (8 + rca.dayofweek::int -
-                        extract(dow from greatest(
-                            COALESCE(he.theoretical_hours_start_date,
-                                     he.create_date::date),
-                            COALESCE(rca.date_from,
-                                     he.theoretical_hours_start_date,
-                                     he.create_date::date)
-                        ))::int) % 7,
-                    least(
-                        COALESCE(rca.date_to, current_date),
-                        current_date
-                    )
+                        extract(dow from {series_start})::int) % 7,
+                    {series_end}
                     + (-6 + rca.dayofweek::int -
-                        extract(dow from least(
-                            COALESCE(rca.date_to, current_date),
-                            current_date
-                        ))::int) % 7,
+                        extract(dow from {series_end})::int) % 7,
                     '7 days'
                 ) AS gs
             """
 
     def _where_sub2(self):
-        return """
+        where = """
             rca.id IS NOT NULL
             """
+        employee_ids = self._get_report_employee_ids()
+        if employee_ids:
+            where += self._mogrify(" AND he.id = ANY(%s)", employee_ids)
+        return where
 
     def _group_by(self):
         return """
@@ -139,85 +187,754 @@ class HrAttendanceTheoreticalTimeReport(models.Model):
             date
             """
 
-    def init(self):
-        tools.drop_view_if_exists(self.env.cr, self._table)
-        self.env.cr.execute(
-            """
-CREATE or REPLACE VIEW %s as (
-    SELECT %s
+    def _query(self):
+        """Live query generating the report rows from the attendances and the
+        working calendars of the employees.
+        """
+        query = f"""
+    SELECT {self._select()}
     FROM (
         (
-            SELECT %s
-            FROM %s
-            WHERE %s
+            SELECT {self._select_sub1()}
+            FROM {self._from_sub1()}
+            WHERE {self._where_sub1()}
         )
-        UNION (
-            SELECT %s
-            FROM %s
-            WHERE %s
+        UNION ALL (
+            SELECT {self._select_sub2()}
+            FROM {self._from_sub2()}
+            WHERE {self._where_sub2()}
         )
     ) AS u
-    GROUP BY %s
-)
-            """,
+    GROUP BY {self._group_by()}
+            """
+        if not self._is_sql_mode():
+            return query
+        # The difference is computed on the grouped rows, for not calling the
+        # SQL function a second time for it
+        return f"""
+    SELECT
+        id,
+        employee_id,
+        department_id,
+        date,
+        worked_hours,
+        theoretical_hours,
+        worked_hours - theoretical_hours AS difference
+    FROM ({query}) AS g
+            """
+
+    @property
+    def _table_query(self):
+        """When searching with date bounds, use the report query limited to
+        them instead of the view, which generates all the days since the
+        beginning of each employee.
+        """
+        if self._is_stored_mode() or not (
+            any(self._get_report_bounds()) or self._get_report_employee_ids()
+        ):
+            return None
+        return SQL(self._query().replace("%", "%%"))
+
+    def _mogrify(self, query, *params):
+        """Render the query with the given parameters bound by the database
+        driver, for the fragments of the report query, which is composed as
+        a string.
+        """
+        return self.env.cr.mogrify(query, params).decode()
+
+    def _get_report_bounds(self):
+        """Date bounds (both included) of the searched report rows, as put in
+        the context by `_search`, parsed as dates.
+        """
+        bounds = self.env.context.get("theoretical_time_report_bounds") or {}
+        return (
+            fields.Date.to_date(bounds.get("date_from")),
+            fields.Date.to_date(bounds.get("date_to")),
+        )
+
+    def _get_report_employee_ids(self):
+        """IDs of the employees the report rows are restricted to, if any."""
+        bounds = self.env.context.get("theoretical_time_report_bounds") or {}
+        return [int(employee_id) for employee_id in bounds.get("employee_ids") or []]
+
+    @api.model
+    def _domain_date_bounds(self, domain):
+        """Get the interval of dates that contains all the report rows matched
+        by the domain.
+
+        :return: Tuple (date_from, date_to), with None for no bound.
+        """
+
+        def parse(index):
+            token = domain[index]
+            if token in (expression.AND_OPERATOR, expression.OR_OPERATOR):
+                (left_from, left_to), index = parse(index + 1)
+                (right_from, right_to), index = parse(index)
+                if token == expression.AND_OPERATOR:
+                    date_froms = [d for d in (left_from, right_from) if d]
+                    date_tos = [d for d in (left_to, right_to) if d]
+                    return (
+                        max(date_froms, default=None),
+                        min(date_tos, default=None),
+                    ), index
+                return (
+                    left_from and right_from and min(left_from, right_from),
+                    left_to and right_to and max(left_to, right_to),
+                ), index
+            if token == expression.NOT_OPERATOR:
+                return (None, None), parse(index + 1)[1]
+            return self._leaf_date_bounds(token), index + 1
+
+        domain = expression.normalize_domain(domain)
+        return parse(0)[0]
+
+    @api.model
+    def _leaf_date_bounds(self, leaf):
+        if not expression.is_leaf(leaf) or leaf[0] != "date":
+            return None, None
+        operator, value = leaf[1], leaf[2]
+        try:
+            value = fields.Date.to_date(value)
+        except (TypeError, ValueError):
+            return None, None
+        if not value:
+            return None, None
+        date_from = {">=": value, ">": value + timedelta(days=1), "=": value}
+        date_to = {"<=": value, "<": value - timedelta(days=1), "=": value}
+        return date_from.get(operator), date_to.get(operator)
+
+    @api.model
+    def _domain_employee_ids(self, domain):
+        """Get the employees that have all the report rows matched by the
+        domain, from its `employee_id` leaves with a list of IDs.
+
+        :return: Set of employee IDs, or None for no restriction.
+        """
+
+        def parse(index):
+            token = domain[index]
+            if token in (expression.AND_OPERATOR, expression.OR_OPERATOR):
+                left, index = parse(index + 1)
+                right, index = parse(index)
+                if token == expression.AND_OPERATOR:
+                    if left is None or right is None:
+                        return left if right is None else right, index
+                    return left & right, index
+                if left is None or right is None:
+                    return None, index
+                return left | right, index
+            if token == expression.NOT_OPERATOR:
+                return None, parse(index + 1)[1]
+            return self._leaf_employee_ids(token), index + 1
+
+        domain = expression.normalize_domain(domain)
+        return parse(0)[0]
+
+    @api.model
+    def _leaf_employee_ids(self, leaf):
+        if not expression.is_leaf(leaf) or leaf[0] != "employee_id":
+            return None
+        operator, value = leaf[1], leaf[2]
+        if operator not in ("=", "in"):
+            return None
+        values = value if isinstance(value, list | tuple) else [value]
+        if not all(isinstance(item, int) and item for item in values):
+            return None
+        return set(values)
+
+    @api.model
+    def _search(self, domain, *args, **kwargs):
+        # The bounds are always set from the domain, never taken from the
+        # context of the caller
+        date_from, date_to = self._domain_date_bounds(domain)
+        employee_ids = self._domain_employee_ids(domain)
+        self = self.with_context(
+            theoretical_time_report_bounds={
+                "date_from": date_from and fields.Date.to_string(date_from),
+                "date_to": date_to and fields.Date.to_string(date_to),
+                "employee_ids": employee_ids and sorted(employee_ids),
+            }
+        )
+        return super()._search(domain, *args, **kwargs)
+
+    def fetch(self, field_names):
+        # Reading rows by ID would generate the whole report for filtering
+        # them afterwards, so restrict it to the employees and days of the IDs.
+        ids = [record_id for record_id in self._ids if isinstance(record_id, int)]
+        bounds = {}
+        if ids and not self._is_stored_mode():
+            employee_ids, dates = zip(*map(self._split_id, ids), strict=True)
+            bounds = {
+                "date_from": fields.Date.to_string(min(dates)),
+                "date_to": fields.Date.to_string(max(dates)),
+                "employee_ids": sorted(set(employee_ids)),
+            }
+        self = self.with_context(theoretical_time_report_bounds=bounds)
+        return super().fetch(field_names)
+
+    def _compute_pending_recompute(self):
+        queue = self.env["hr.attendance.theoretical.time.queue"].sudo()
+        pending = queue._is_pending(self._split_id(record.id) for record in self)
+        for record in self:
+            record.pending_recompute = self._split_id(record.id) in pending
+
+    def _search_pending_recompute(self, operator, value):
+        if operator not in ("=", "!="):
+            raise ValueError("Unsupported operator %s" % operator)
+        queue = self.env["hr.attendance.theoretical.time.queue"].sudo()
+        domain = queue._get_pending_domain()
+        if (operator == "=") != bool(value):
+            domain = ["!"] + expression.normalize_domain(domain)
+        return domain
+
+    def _stored_query(self):
+        """Query reading the report rows from the stored day table."""
+        return f"""
+    SELECT
+        {self._select_id("employee_id", "date")} AS id,
+        employee_id,
+        department_id,
+        date,
+        worked_hours,
+        theoretical_hours,
+        difference
+    FROM {self.env["hr.attendance.theoretical.time.day"]._table}
+            """
+
+    @api.model
+    def _is_stored_mode(self):
+        return bool(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("hr_attendance_report_theoretical_time.report_stored")
+        )
+
+    @api.model
+    def _is_sql_mode(self):
+        return bool(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("hr_attendance_report_theoretical_time.report_sql_hours")
+        )
+
+    def _create_theoretical_hours_function(self):
+        """Create the SQL function computing the theoretical hours of an
+        employee for a day, with the same rules as `_theoretical_hours`:
+
+        * Sum of the hours of the calendar lines of that week day, taking
+          into account their validity dates and the week type for 2 weeks
+          calendars.
+        * Minus the time of those lines covered by the calendar leaves of
+          the employee company, except those coming from leaves whose type is
+          included in theoretical hours. Overlapping leaves are merged first
+          for not subtracting the same time twice.
+        * Zero on public holidays applying to the employee address.
+        """
+        self.env.cr.execute(
+            """
+CREATE OR REPLACE FUNCTION hr_attendance_theoretical_hours(
+    p_employee_id integer, p_date date
+) RETURNS double precision AS $$
+    WITH employee AS (
+        SELECT
+            he.company_id,
+            rr.id AS resource_id,
+            rc.id AS calendar_id,
+            rc.tz,
+            rc.two_weeks_calendar,
+            addr.country_id,
+            addr.state_id
+        FROM hr_employee he
+        JOIN resource_resource rr ON rr.id = he.resource_id
+        JOIN resource_calendar rc ON rc.id = rr.calendar_id
+        LEFT JOIN res_partner addr ON addr.id = he.address_id
+        WHERE he.id = p_employee_id
+    ), lines AS (
+        SELECT
+            p_date + rca.hour_from * interval '1 hour' AS date_from,
+            p_date + rca.hour_to * interval '1 hour' AS date_to,
+            rca.hour_to - rca.hour_from AS hours
+        FROM employee e
+        JOIN resource_calendar_attendance rca ON rca.calendar_id = e.calendar_id
+        WHERE rca.dayofweek::int = extract(isodow FROM p_date)::int - 1
+            AND rca.display_type IS NULL
+            AND rca.day_period IS DISTINCT FROM 'lunch'
+            AND (rca.resource_id IS NULL OR rca.resource_id = e.resource_id)
+            AND (rca.date_from IS NULL OR rca.date_from <= p_date)
+            AND (rca.date_to IS NULL OR rca.date_to >= p_date)
+            AND (
+                NOT COALESCE(e.two_weeks_calendar, False)
+                OR rca.week_type IS NULL
+                OR rca.week_type::int = ((p_date - DATE '0001-01-01') / 7) % 2
+            )
+            AND NOT EXISTS (
+                SELECT 1
+                FROM hr_holidays_public_line hhpl
+                JOIN hr_holidays_public hhp ON hhp.id = hhpl.year_id
+                WHERE hhpl.date = p_date
+                    AND (hhp.country_id IS NULL OR hhp.country_id = e.country_id)
+                    AND (
+                        NOT EXISTS (
+                            SELECT 1 FROM hr_holiday_public_state_rel hps
+                            WHERE hps.line_id = hhpl.id
+                        )
+                        OR EXISTS (
+                            SELECT 1 FROM hr_holiday_public_state_rel hps
+                            WHERE hps.line_id = hhpl.id
+                                AND hps.state_id = e.state_id
+                        )
+                    )
+            )
+    ), leaves AS (
+        SELECT
+            (rcl.date_from AT TIME ZONE 'UTC') AT TIME ZONE e.tz AS date_from,
+            (rcl.date_to AT TIME ZONE 'UTC') AT TIME ZONE e.tz AS date_to
+        FROM employee e
+        JOIN resource_calendar_leaves rcl
+            ON (rcl.resource_id IS NULL OR rcl.resource_id = e.resource_id)
+            AND (rcl.calendar_id IS NULL OR rcl.calendar_id = e.calendar_id)
+            AND (rcl.company_id IS NULL OR rcl.company_id = e.company_id)
+        LEFT JOIN hr_leave hl ON hl.id = rcl.holiday_id
+        LEFT JOIN hr_leave_type hlt ON hlt.id = hl.holiday_status_id
+        WHERE NOT COALESCE(hlt.include_in_theoretical, False)
+            AND (rcl.date_from AT TIME ZONE 'UTC') AT TIME ZONE e.tz
+                < p_date + interval '1 day'
+            AND (rcl.date_to AT TIME ZONE 'UTC') AT TIME ZONE e.tz > p_date
+    ), islands AS (
+        -- A leave starts a new group of overlapping leaves when it begins
+        -- after the end of all the previous ones
+        SELECT
+            date_from,
+            date_to,
+            sum(CASE WHEN date_from <= previous_to THEN 0 ELSE 1 END)
+                OVER (ORDER BY date_from, date_to) AS island
+        FROM (
+            SELECT
+                date_from,
+                date_to,
+                max(date_to) OVER (
+                    ORDER BY date_from, date_to
+                    ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                ) AS previous_to
+            FROM leaves
+        ) AS l
+    ), merged_leaves AS (
+        SELECT min(date_from) AS date_from, max(date_to) AS date_to
+        FROM islands
+        GROUP BY island
+    )
+    SELECT COALESCE(sum(greatest(
+        lines.hours - COALESCE((
+            SELECT sum(greatest(0.0, extract(epoch FROM
+                least(lines.date_to, ml.date_to)
+                - greatest(lines.date_from, ml.date_from)
+            ) / 3600.0))
+            FROM merged_leaves ml
+        ), 0.0),
+        0.0
+    )), 0.0)::double precision
+    FROM lines
+$$ LANGUAGE sql STABLE
+            """
+        )
+
+    @api.model
+    def _apply_report_mode(self):
+        """Fill the stored days if needed and regenerate the report view
+        according the current mode.
+        """
+        if self._is_stored_mode():
+            self.env["hr.attendance.theoretical.time.day"]._rebuild()
+        self.init()
+
+    def init(self):
+        self._create_theoretical_hours_function()
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(
+            """CREATE or REPLACE VIEW %s as (%s)""",
             (
                 AsIs(self._table),
-                AsIs(self._select()),
-                AsIs(self._select_sub1()),
-                AsIs(self._from_sub1()),
-                AsIs(self._where_sub1()),
-                AsIs(self._select_sub2()),
-                AsIs(self._from_sub2()),
-                AsIs(self._where_sub2()),
-                AsIs(self._group_by()),
+                AsIs(self._stored_query() if self._is_stored_mode() else self._query()),
             ),
         )
 
-    # TODO: To be activated for performance assuring cache clearing on changes
-    # @tools.ormcache('employee.id', 'date')
     @api.model
     def _theoretical_hours(self, employee, date):
         """Get theoretical working hours for the day where the check-in is
         done for that employee.
         """
-        if not employee.resource_id.calendar_id:
-            return 0
-        tz = employee.resource_id.calendar_id.tz
-        res = employee.with_context(
-            exclude_public_holidays=True, employee_id=employee.id
-        )._get_work_days_data_batch(
-            datetime.combine(date, time(0, 0, 0, 0, tzinfo=pytz.timezone(tz))),
-            datetime.combine(date, time(23, 59, 59, 99999, tzinfo=pytz.timezone(tz))),
-            # Pass this domain for excluding leaves whose type is included in
-            # theoretical hours
-            domain=[
-                "|",
-                ("holiday_id", "=", False),
-                ("holiday_id.holiday_status_id.include_in_theoretical", "=", False),
+        if isinstance(date, datetime):
+            date = date.date()
+        self._instrument_count("theoretical_hours_calls")
+        return self._theoretical_hours_by_day([(employee, date)])[(employee.id, date)]
+
+    @api.model
+    def _theoretical_hours_leave_domain(self):
+        # Pass this domain for excluding leaves whose type is included in
+        # theoretical hours
+        return [
+            "|",
+            ("holiday_id", "=", False),
+            ("holiday_id.holiday_status_id.include_in_theoretical", "=", False),
+        ]
+
+    @api.model
+    def _theoretical_hours_batch(self, employees, date_from, date_to):
+        """Get theoretical working hours of each day of the interval for the
+        given employees, fetching the calendar, leaves and public holidays
+        once per group of employees sharing them and splitting the resulting
+        intervals by day.
+
+        :param employees: Employees recordset.
+        :param date_from: First date of the interval.
+        :param date_to: Last date of the interval (included).
+        :return: Dictionary {(employee id, date): hours} with all the days.
+        """
+        res = {}
+        days = [
+            date_from + timedelta(days=offset)
+            for offset in range((date_to - date_from).days + 1)
+        ]
+        for employee in employees:
+            res.update(dict.fromkeys([(employee.id, day) for day in days], 0.0))
+        for group in self._theoretical_hours_groups(employees):
+            calendar = group[:1].resource_id.calendar_id
+            if not calendar or not days:
+                continue
+            tz = pytz.timezone(calendar.tz)
+            with self._instrument_phase("work_intervals"):
+                intervals = calendar.with_context(
+                    exclude_public_holidays=True, employee_id=group[:1].id
+                )._work_intervals_batch(
+                    tz.localize(datetime.combine(date_from, time.min)),
+                    tz.localize(datetime.combine(date_to, time.max)),
+                    resources=group.resource_id,
+                    domain=self._theoretical_hours_leave_domain(),
+                )
+            for employee in group:
+                for start, stop, _meta in intervals[employee.resource_id.id]:
+                    key = (employee.id, start.astimezone(tz).date())
+                    if key in res:
+                        res[key] += (stop - start).total_seconds() / 3600
+        return res
+
+    @api.model
+    def _theoretical_hours_groups(self, employees):
+        """Split the employees in groups sharing the working calendar and the
+        public holidays, which depend on the country and state of their
+        address, so that their work intervals are computed together.
+
+        :return: List of employees recordsets.
+        """
+        groups = defaultdict(lambda: employees.browse())
+        for employee in employees:
+            address = employee.address_id
+            key = (
+                employee.resource_id.calendar_id,
+                address.country_id,
+                address.state_id,
+            )
+            groups[key] |= employee
+        return list(groups.values())
+
+    @api.model
+    def _theoretical_hours_windows(self, dates):
+        """Split the given dates in intervals without gaps longer than
+        `_theoretical_hours_window_gap` days between them, for not computing
+        the whole span of sparse dates.
+
+        :return: List of (first date, last date) tuples.
+        """
+        windows = []
+        for date in sorted(dates):
+            if windows and (date - windows[-1][1]).days <= (
+                self._theoretical_hours_window_gap
+            ):
+                windows[-1][1] = date
+            else:
+                windows.append([date, date])
+        return [tuple(window) for window in windows]
+
+    @api.model
+    def _theoretical_hours_by_day(self, pairs):
+        """Get theoretical working hours for several (employee, date) pairs.
+        The pairs computed before with the same inputs are taken from the
+        cache, and the rest are computed and cached, resolving together the
+        employees sharing the calendar and public holidays, in one pass for
+        each window of close dates.
+
+        :param pairs: Iterable of (employee record, date) tuples.
+        :return: Dictionary {(employee id, date): hours}.
+        """
+        dates_by_employee = defaultdict(set)
+        for employee, date in pairs:
+            dates_by_employee[employee].add(date)
+        if not dates_by_employee:
+            return {}
+        cache = self.env["hr.attendance.theoretical.time.cache"]
+        versions = cache._get_versions([employee.id for employee in dates_by_employee])
+        cached = cache._get(
+            versions,
+            [
+                (employee.id, date)
+                for employee, dates in dates_by_employee.items()
+                for date in dates
             ],
         )
-        return res[employee.id]["hours"]
+        missing = defaultdict(set)
+        for employee, dates in dates_by_employee.items():
+            for date in dates:
+                if (employee.id, date) not in cached:
+                    missing[employee].add(date)
+        dates_by_employee = missing
+        res = {}
+        employees = self.env["hr.employee"]
+        if dates_by_employee:
+            employees = next(iter(dates_by_employee)).union(*dates_by_employee)
+        for group in self._theoretical_hours_groups(employees):
+            group_dates = set().union(*(dates_by_employee[e] for e in group))
+            for date_from, date_to in self._theoretical_hours_windows(group_dates):
+                hours = self._theoretical_hours_batch(group, date_from, date_to)
+                res.update(
+                    {
+                        (employee.id, date): hours[(employee.id, date)]
+                        for employee in group
+                        for date in dates_by_employee[employee]
+                        if date_from <= date <= date_to
+                    }
+                )
+        self._instrument_count("resolved_days", len(res))
+        cache._set(versions, res)
+        res.update(cached)
+        return res
+
+    @contextmanager
+    def _instrument(self, operation):
+        """Measure the wrapped operation when the context key
+        `theoretical_time_instrument` is set: wall time, SQL queries, peak
+        memory, calls to the single day computation, resolved (employee, day)
+        pairs and the figures of each phase. They are logged as a JSON line,
+        and also stored as statistics if the key value is `store`. Operations
+        nested in an instrumented one are measured as part of it.
+
+        The peak memory is traced for the whole process, so it includes the
+        allocations of the other threads meanwhile. It's only measured by one
+        operation at a time, and not when the memory is already traced by
+        something else, being left empty otherwise.
+        """
+        mode = self.env.context.get("theoretical_time_instrument")
+        if not mode or getattr(_instrumentation, "stats", None) is not None:
+            yield
+            return
+        stats = _instrumentation.stats = {
+            "operation": operation,
+            "theoretical_hours_calls": 0,
+            "resolved_days": 0,
+            "phases": {},
+        }
+        tracing = _instrumentation_memory_lock.acquire(blocking=False)
+        if tracing and tracemalloc.is_tracing():
+            _instrumentation_memory_lock.release()
+            tracing = False
+        if tracing:
+            tracemalloc.start()
+        queries = self.env.cr.sql_log_count
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            stats["duration"] = perf_counter() - start
+            stats["query_count"] = self.env.cr.sql_log_count - queries
+            stats["peak_memory"] = None
+            if tracing:
+                stats["peak_memory"] = tracemalloc.get_traced_memory()[1] // 1024
+                tracemalloc.stop()
+                _instrumentation_memory_lock.release()
+            _instrumentation.stats = None
+        _logger.info("theoretical_time_stats %s", json.dumps(stats))
+        if mode == "store":
+            self.env["hr.attendance.theoretical.time.stats"].sudo().create(
+                dict(stats, user_id=self.env.uid, phases=json.dumps(stats["phases"]))
+            )
+
+    @contextmanager
+    def _instrument_phase(self, phase):
+        """Add the wall time and SQL queries of the wrapped code to the given
+        phase of the instrumented operation in progress, if any.
+        """
+        stats = getattr(_instrumentation, "stats", None)
+        if stats is None:
+            yield
+            return
+        queries = self.env.cr.sql_log_count
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            figures = stats["phases"].setdefault(
+                phase, {"calls": 0, "duration": 0.0, "query_count": 0}
+            )
+            figures["calls"] += 1
+            figures["duration"] += perf_counter() - start
+            figures["query_count"] += self.env.cr.sql_log_count - queries
+
+    @api.model
+    def _instrument_count(self, counter, value=1):
+        """Increase a counter of the instrumented operation in progress."""
+        stats = getattr(_instrumentation, "stats", None)
+        if stats is not None:
+            stats[counter] += value
+
+    @api.model
+    def _export_rows(self, employees, date_from, date_to, by_day=False, chunk=200):
+        """Generate the report rows of the given employees between both dates
+        (included) for exporting them. Employees are processed in chunks and
+        their rows are read through a server-side cursor, so the memory used
+        doesn't depend on the number of employees nor on the length of the
+        period.
+
+        :param by_day: Generate a row per employee and day instead of a row
+          with the totals per employee.
+        :param chunk: Number of employees processed at once.
+        :return: Generator of tuples (employee, department, date, worked hours,
+          theoretical hours, difference), with date False for totals.
+        """
+        self.env.flush_all()
+        # Only the employees the user can read, the report rows being also
+        # searched with the access rules
+        employees = employees.browse(
+            employees.with_context(active_test=False)._search(
+                [("id", "in", employees.ids)]
+            )
+        )
+        python_hours = not (self._is_stored_mode() or self._is_sql_mode())
+        for index in range(0, len(employees), chunk):
+            chunk_employees = employees[index : index + chunk]
+            computed = {}
+            if python_hours:
+                computed = self._theoretical_hours_batch(
+                    chunk_employees.sudo(), date_from, date_to
+                )
+            totals = {}
+            rows = self._export_cursor(chunk_employees, date_from, date_to)
+            for employee_id, department_id, date, worked, theoretical in rows:
+                if theoretical < 0:
+                    theoretical = computed.get((employee_id, date), 0.0)
+                if by_day:
+                    yield (
+                        employees.browse(employee_id),
+                        self.env["hr.department"].browse(department_id),
+                        date,
+                        worked,
+                        theoretical,
+                        worked - theoretical,
+                    )
+                    continue
+                employee_totals = totals.setdefault(employee_id, [0.0, 0.0])
+                employee_totals[0] += worked
+                employee_totals[1] += theoretical
+            for employee in employees.browse(list(totals)):
+                worked, theoretical = totals[employee.id]
+                yield (
+                    employee,
+                    employee.department_id,
+                    False,
+                    worked,
+                    theoretical,
+                    worked - theoretical,
+                )
+            chunk_employees.invalidate_recordset()
+
+    def _export_cursor(self, employees, date_from, date_to, fetch_size=2000):
+        """Iterate through a server-side cursor over the day rows of the given
+        employees between both dates, ordered by employee and date. The rows
+        are searched with the access rules of the user.
+        """
+        query = self._search(
+            [
+                ("employee_id", "in", employees.ids),
+                ("date", ">=", date_from),
+                ("date", "<=", date_to),
+            ]
+        )
+        query.order = SQL(
+            "%s, %s",
+            SQL.identifier(query.table, "employee_id"),
+            SQL.identifier(query.table, "date"),
+        )
+        cr = self.env.cr
+        cr.execute(
+            SQL(
+                "DECLARE theoretical_time_export NO SCROLL CURSOR FOR %s",
+                query.select(
+                    *(
+                        SQL.identifier(query.table, column)
+                        for column in (
+                            "employee_id",
+                            "department_id",
+                            "date",
+                            "worked_hours",
+                            "theoretical_hours",
+                        )
+                    )
+                ),
+            )
+        )
+        try:
+            while True:
+                cr.execute(
+                    "FETCH FORWARD %s FROM theoretical_time_export", (fetch_size,)
+                )
+                rows = cr.fetchall()
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            if not cr.closed:
+                cr.execute("CLOSE theoretical_time_export")
 
     @api.model
     def read_group(
         self, domain, fields, groupby, offset=0, limit=None, orderby=False, lazy=True
+    ):
+        with self._instrument("read_group"):
+            return self._read_group_theoretical_hours(
+                domain, fields, groupby, offset, limit, orderby, lazy
+            )
+
+    def _read_group_theoretical_hours(
+        self, domain, fields, groupby, offset, limit, orderby, lazy
     ):
         """Compute dynamically theoretical hours amount, computing on the fly
         theoretical hours for non existing attendances with stored hours.
-        This technique has proven to be more efficient than trying to call
-        recursively `read_group` grouping by date and employee.
+        All the rows are fetched in only one query over the whole domain and
+        distributed in Python among the result lines by their group values,
+        so the number of queries doesn't depend on the number of groups.
+        When the stored mode is enabled and the grouping allows it, the
+        result is read from the period totals instead.
         """
-        res = super().read_group(
-            domain,
-            fields,
-            groupby,
-            offset=offset,
-            limit=limit,
-            orderby=orderby,
-            lazy=lazy,
-        )
+        with self._instrument_phase("rollup"):
+            res = self._read_group_rollup(
+                domain, fields, groupby, offset, limit, orderby, lazy
+            )
+        if res is not None:
+            return res
+        with self._instrument_phase("read_group"):
+            res = super().read_group(
+                domain,
+                fields,
+                groupby,
+                offset=offset,
+                limit=limit,
+                orderby=orderby,
+                lazy=lazy,
+            )
 
-        if "theoretical_hours:sum" not in fields:
+        if (
+            "theoretical_hours:sum" not in fields
+            or self._is_stored_mode()
+            or self._is_sql_mode()
+        ):
             return res
 
         full_fields = all(
@@ -225,19 +942,32 @@ CREATE or REPLACE VIEW %s as (
             for x in {"theoretical_hours:sum", "worked_hours:sum", "difference:sum"}
         )
         difference_field = "difference:sum" in fields
-        for line in res:
-            day_dict = {}
-            records = self.search(line.get("__domain", domain))
-            for record in records:
-                key = (record.employee_id.id, record.date)
-                if key not in day_dict:
-                    if record.theoretical_hours < 0:
-                        day_dict[key] = self._theoretical_hours(
-                            record.employee_id.sudo(), record.date
-                        )
-                    else:
-                        day_dict[key] = record.theoretical_hours
-            line["theoretical_hours"] = sum(day_dict.values())
+        groupby = [groupby] if isinstance(groupby, str) else list(groupby)
+        if lazy:
+            groupby = groupby[:1]
+        lines_days = [{} for _line in res]
+        line_index = {
+            self._read_group_line_key(line, groupby): index
+            for index, line in enumerate(res)
+        }
+        to_compute = set()
+        employees = self.env["hr.employee"].sudo()
+        with self._instrument_phase("day_rows"):
+            rows = self._read_group_day_rows(domain, groupby) if res else []
+        for row in rows:
+            employee_id, date, hours = row[:3]
+            index = line_index.get(self._read_group_row_key(row[3:], date, groupby))
+            if index is None:  # group out of offset/limit
+                continue
+            lines_days[index].setdefault((employee_id, date), hours)
+            if hours < 0:
+                to_compute.add((employees.browse(employee_id), date))
+        with self._instrument_phase("theoretical_hours"):
+            computed = self._theoretical_hours_by_day(to_compute)
+        for line, day_dict in zip(res, lines_days, strict=True):
+            line["theoretical_hours"] = sum(
+                computed[key] if hours < 0 else hours for key, hours in day_dict.items()
+            )
             if full_fields:  # compute difference
                 line["difference"] = (line["worked_hours"] or 0.0) - line[
                     "theoretical_hours"
@@ -245,3 +975,150 @@ CREATE or REPLACE VIEW %s as (
             elif difference_field:  # Remove wrong 0 values
                 del line["difference"]
         return res
+
+    def _read_group_day_rows(self, domain, groupby):
+        """Fetch in one query the employee, date and theoretical hours of all
+        the rows matching the domain, followed by the values of the non date
+        group by fields.
+        """
+        query = self._search(domain)
+        columns = ["employee_id", "date", "theoretical_hours"] + [
+            spec.split(":")[0]
+            for spec in groupby
+            if self._fields[spec.split(":")[0]].type not in ("date", "datetime")
+        ]
+        self.env.cr.execute(
+            query.select(*[SQL.identifier(self._table, fname) for fname in columns])
+        )
+        return self.env.cr.fetchall()
+
+    def _read_group_line_key(self, line, groupby):
+        """Key identifying a `read_group` result line by its group values."""
+        key = []
+        for spec in groupby:
+            fname = spec.split(":")[0]
+            value = line.get(spec)
+            if self._fields[fname].type in ("date", "datetime"):
+                value_range = line.get("__range", {}).get(spec)
+                value = value_range and fields.Date.to_date(value_range["from"])
+            elif isinstance(value, tuple):
+                value = value[0]
+            key.append(value or False)
+        return tuple(key)
+
+    def _read_group_row_key(self, values, date, groupby):
+        """Key of the `read_group` result line where a row fetched by
+        `_read_group_day_rows` is aggregated.
+        """
+        values = iter(values)
+        key = []
+        for spec in groupby:
+            fname, __, granularity = spec.partition(":")
+            if self._fields[fname].type in ("date", "datetime"):
+                value = self._period_start(date, granularity or "month")
+            else:
+                value = next(values)
+            key.append(value or False)
+        return tuple(key)
+
+    def _period_start(self, date, granularity):
+        """First day of the `read_group` period of the given granularity that
+        contains the date, with weeks starting on the day of the language.
+        """
+        if granularity == "week":
+            week_start = int(get_lang(self.env).week_start)
+            return date - timedelta(days=(date.isoweekday() - week_start) % 7)
+        return date_utils.start_of(date, granularity)
+
+    def _read_group_rollup_granularity(self, domain, fields, groupby):
+        """Granularity of the period totals that can answer the `read_group`
+        with the given parameters, or None if the day rows are needed: it
+        has to group only by employee, department and periods made of whole
+        periods of totals, with the date conditions of the domain at their
+        boundaries, and to aggregate the hours as sums.
+        """
+        if not self._is_stored_mode():
+            return None
+        granularities = set()
+        for spec in groupby:
+            fname, __, granularity = spec.partition(":")
+            if fname == "date":
+                granularities.add(granularity or "month")
+            elif fname not in ("employee_id", "department_id"):
+                return None
+        allowed = {"employee_id", "department_id", "date", "__count"}
+        allowed |= {"worked_hours", "theoretical_hours", "difference"}
+        for spec in fields:
+            fname, __, aggregate = spec.partition(":")
+            if fname not in allowed or aggregate not in ("", "sum"):
+                return None
+        candidates = ["year", "month"]
+        if int(get_lang(self.env).week_start) == 1:
+            candidates.append("week")
+        coarser = {"year": {"year"}, "month": {"month", "quarter", "year"}}
+        coarser["week"] = {"week"}
+        for rollup_granularity in candidates:
+            if granularities <= coarser[rollup_granularity] and all(
+                self._is_period_boundary_leaf(leaf, rollup_granularity)
+                for leaf in expression.normalize_domain(domain)
+                if expression.is_leaf(leaf)
+            ):
+                return rollup_granularity
+        return None
+
+    def _is_period_boundary_leaf(self, leaf, granularity):
+        """Tell if the domain leaf can be evaluated on period totals of the
+        given granularity.
+        """
+        if tuple(leaf) in (expression.TRUE_LEAF, expression.FALSE_LEAF):
+            return True
+        fname = leaf[0].split(".")[0]
+        if fname in ("employee_id", "department_id", "company_id"):
+            return True
+        if fname != "date" or leaf[1] not in (">=", ">", "<", "<="):
+            return False
+        try:
+            value = fields.Date.to_date(leaf[2])
+        except (TypeError, ValueError):
+            return False
+        if not value:
+            return False
+        if leaf[1] in (">", "<="):
+            value += timedelta(days=1)
+        if granularity == "week":
+            return value.isoweekday() == 1
+        return date_utils.start_of(value, granularity) == value
+
+    def _read_group_rollup(self, domain, fields, groupby, offset, limit, orderby, lazy):
+        """Answer the `read_group` from the period totals if possible.
+
+        :return: The `read_group` result, or None if it can't be done.
+        """
+        groupby = [groupby] if isinstance(groupby, str) else list(groupby)
+        granularity = self._read_group_rollup_granularity(domain, fields, groupby)
+        if not granularity:
+            return None
+        rollup_leaf = ("granularity", "=", granularity)
+        res = self.env["hr.attendance.theoretical.time.rollup"].read_group(
+            expression.AND([domain, [rollup_leaf]]),
+            [spec for spec in fields if spec != "__count"] + ["day_count:sum"],
+            groupby,
+            offset=offset,
+            limit=limit,
+            orderby=orderby,
+            lazy=lazy,
+        )
+        for line in res:
+            day_count = line.pop("day_count") or 0
+            for key in line:
+                if key == "__count" or key.endswith("_count"):
+                    line[key] = day_count
+            if "__domain" in line:
+                # Keep the domain valid for the report rows
+                line["__domain"] = [
+                    expression.TRUE_LEAF
+                    if isinstance(leaf, list | tuple) and tuple(leaf) == rollup_leaf
+                    else leaf
+                    for leaf in line["__domain"]
+                ]
+        return res
@@ -0,0 +1,138 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from psycopg2.extensions import AsIs
+
+from odoo import api, fields, models
+
+ROLLUP_GRANULARITIES = ["week", "month", "year"]
+
+
+class HrAttendanceTheoreticalTimeRollup(models.Model):
+    """Totals of the stored days of the theoretical vs attendance time report
+    per employee and week, month or year, used by the report `read_group`
+    instead of the days when the grouping allows it, and for the monthly
+    balance checkpoints. Periods are refreshed only when some of their
+    stored days are.
+    """
+
+    _name = "hr.attendance.theoretical.time.rollup"
+    _description = "Period totals of theoretical time vs attendance time"
+    _order = "date,employee_id"
+    _log_access = False
+
+    employee_id = fields.Many2one(
+        comodel_name="hr.employee", required=True, ondelete="cascade"
+    )
+    company_id = fields.Many2one(related="employee_id.company_id")
+    department_id = fields.Many2one(comodel_name="hr.department")
+    granularity = fields.Selection(
+        selection=[("week", "Week"), ("month", "Month"), ("year", "Year")],
+        required=True,
+    )
+    date = fields.Date(
+        required=True, help="First day of the period (weeks start on Monday)."
+    )
+    worked_hours = fields.Float()
+    theoretical_hours = fields.Float()
+    difference = fields.Float()
+    day_count = fields.Integer()
+
+    def init(self):
+        self.env.cr.execute(
+            """
+            CREATE INDEX IF NOT EXISTS %s ON %s (granularity, date, employee_id)
+            """,
+            (AsIs("%s_granularity_date_index" % self._table), AsIs(self._table)),
+        )
+
+    def _flush_search(self, domain, fields=None, order=None, seen=None):
+        self.env["hr.attendance.theoretical.time.day"]._flush_rollup()
+        return super()._flush_search(domain, fields=fields, order=order, seen=seen)
+
+    def _periods_query(self):
+        """Query of the (employee, granularity, period start) periods that
+        contain the (employee, date) pairs given as 2 array parameters.
+        """
+        granularities = ", ".join(f"'{g}'" for g in ROLLUP_GRANULARITIES)
+        return f"""
+            SELECT DISTINCT p.employee_id, g.granularity,
+                date_trunc(g.granularity, p.date)::date AS date
+            FROM unnest(%s::int[], %s::date[]) AS p(employee_id, date)
+            CROSS JOIN unnest(ARRAY[{granularities}]) AS g(granularity)
+            """
+
+    @api.model
+    def _refresh_days(self, pairs):
+        """Recompute the totals of the periods containing the given
+        (employee id, date) pairs from the stored days.
+        """
+        if not pairs:
+            return
+        cr = self.env.cr
+        employee_ids, dates = zip(*pairs, strict=True)
+        params = (list(employee_ids), list(dates))
+        day_table = self.env["hr.attendance.theoretical.time.day"]._table
+        cr.execute(
+            f"""
+            DELETE FROM {self._table} AS r USING ({self._periods_query()}) AS p
+            WHERE r.employee_id = p.employee_id
+                AND r.granularity = p.granularity
+                AND r.date = p.date
+            """,
+            params,
+        )
+        cr.execute(
+            f"""
+            INSERT INTO {self._table} (
+                employee_id, department_id, granularity, date,
+                worked_hours, theoretical_hours, difference, day_count
+            )
+            SELECT d.employee_id, d.department_id, p.granularity, p.date,
+                sum(d.worked_hours), sum(d.theoretical_hours),
+                sum(d.difference), count(*)
+            FROM ({self._periods_query()}) AS p
+            INNER JOIN {day_table} AS d
+                ON d.employee_id = p.employee_id
+                AND d.date >= p.date
+                AND d.date < p.date + ('1 ' || p.granularity)::interval
+            GROUP BY d.employee_id, d.department_id, p.granularity, p.date
+            """,
+            params,
+        )
+        self.invalidate_model()
+        dates_by_employee = {}
+        for employee_id, date in pairs:
+            if date < dates_by_employee.get(employee_id, date.max):
+                dates_by_employee[employee_id] = date
+        balances = self.env["hr.attendance.theoretical.time.balance"]
+        balances._refresh_employees(dates_by_employee)
+
+    @api.model
+    def _rebuild(self):
+        """Regenerate all the totals from the stored days."""
+        cr = self.env.cr
+        cr.execute("DELETE FROM %s", (AsIs(self._table),))
+        for granularity in ROLLUP_GRANULARITIES:
+            cr.execute(
+                """
+                INSERT INTO %s (
+                    employee_id, department_id, granularity, date,
+                    worked_hours, theoretical_hours, difference, day_count
+                )
+                SELECT employee_id, department_id, %s,
+                    date_trunc(%s, date)::date,
+                    sum(worked_hours), sum(theoretical_hours),
+                    sum(difference), count(*)
+                FROM %s
+                GROUP BY employee_id, department_id, date_trunc(%s, date)
+                """,
+                (
+                    AsIs(self._table),
+                    granularity,
+                    granularity,
+                    AsIs(self.env["hr.attendance.theoretical.time.day"]._table),
+                    granularity,
+                ),
+            )
+        self.invalidate_model()
+        self.env["hr.attendance.theoretical.time.balance"]._rebuild()
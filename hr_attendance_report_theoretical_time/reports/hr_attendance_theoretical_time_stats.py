@@ -0,0 +1,27 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import fields, models
+
+
+class HrAttendanceTheoreticalTimeStats(models.Model):
+    """Figures of instrumented runs of the theoretical time computation, kept
+    when the instrumentation is enabled with the `store` value.
+    """
+
+    _name = "hr.attendance.theoretical.time.stats"
+    _description = "Statistics of theoretical time computations"
+    _order = "date desc, id desc"
+
+    date = fields.Datetime(default=fields.Datetime.now, required=True)
+    user_id = fields.Many2one(comodel_name="res.users")
+    operation = fields.Char(required=True)
+    duration = fields.Float(string="Duration (s)", digits=(16, 4))
+    query_count = fields.Integer(string="SQL Queries")
+    theoretical_hours_calls = fields.Integer(
+        help="Calls to the single day theoretical hours computation."
+    )
+    resolved_days = fields.Integer(
+        help="(employee, day) pairs whose theoretical hours were computed."
+    )
+    peak_memory = fields.Integer(string="Peak Memory (KiB)")
+    phases = fields.Text(help="Duration and SQL queries of each phase, as JSON.")
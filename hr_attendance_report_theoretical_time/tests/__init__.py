@@ -1,3 +1,4 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 from . import test_hr_attendance_report_theoretical_time
+from . import test_benchmark
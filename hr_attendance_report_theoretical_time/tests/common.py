@@ -0,0 +1,286 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import random
+import time as timer
+from datetime import date, datetime, time, timedelta
+
+# (month, day) of the generated public holidays
+HOLIDAYS = {(1, 1), (3, 19), (10, 12), (12, 25), (12, 26)}
+
+
+def measure(env, function):
+    """Run the function with empty caches, flushing what it writes.
+
+    :return: Tuple (wall time in seconds, number of SQL queries issued).
+    """
+    env.flush_all()
+    env.invalidate_all()
+    queries = env.cr.sql_log_count
+    start = timer.perf_counter()
+    function()
+    env.flush_all()
+    return timer.perf_counter() - start, env.cr.sql_log_count - queries
+
+
+class TheoreticalTimeDataGenerator:
+    """Deterministic generator of calendars, employees, attendances, leaves
+    and public holidays for measuring how the theoretical time computation
+    scales. The same seed and sizes always produce the same data.
+    """
+
+    def __init__(self, env, seed=0):
+        self.env = env
+        self.random = random.Random(seed)
+        self.prefix = f"Generated {seed}"
+
+    def _calendar_lines(self, hours, sequence=10, **vals):
+        lines = []
+        for day in range(5):
+            for hour_from, hour_to in hours:
+                lines.append(
+                    (
+                        0,
+                        0,
+                        {
+                            "name": "Attendance",
+                            "dayofweek": str(day),
+                            "hour_from": hour_from,
+                            "hour_to": hour_to,
+                            "sequence": sequence,
+                            **vals,
+                        },
+                    )
+                )
+        return lines
+
+    def _week_section(self, week_type, sequence):
+        return (
+            0,
+            0,
+            {
+                "name": f"Week {week_type}",
+                "dayofweek": "0",
+                "hour_from": 0,
+                "hour_to": 0,
+                "week_type": week_type,
+                "display_type": "line_section",
+                "sequence": sequence,
+            },
+        )
+
+    def _create_calendars(self, count, date_from, date_to):
+        """Create the calendars, cycling between a plain one, a two weeks one
+        and one whose lines change in the middle of the period.
+        """
+        middle = date_from + (date_to - date_from) / 2
+        calendars = self.env["resource.calendar"]
+        for index in range(count):
+            vals = {
+                "name": f"{self.prefix} calendar {index}",
+                "tz": "UTC",
+            }
+            if index % 3 == 1:
+                vals["two_weeks_calendar"] = True
+                vals["attendance_ids"] = (
+                    [self._week_section("0", 0)]
+                    + self._calendar_lines([(8, 12), (13, 17)], 1, week_type="0")
+                    + [self._week_section("1", 20)]
+                    + self._calendar_lines([(8, 14)], 21, week_type="1")
+                )
+            elif index % 3 == 2:
+                vals["attendance_ids"] = self._calendar_lines(
+                    [(8, 12), (13, 17)], date_to=middle
+                ) + self._calendar_lines(
+                    [(9, 15)], date_from=middle + timedelta(days=1)
+                )
+            else:
+                vals["attendance_ids"] = self._calendar_lines([(8, 12), (13, 17)])
+            calendars |= calendars.create(vals)
+        return calendars
+
+    def _create_public_holidays(self, years):
+        """Create global, country and state public holidays for each year."""
+        holidays = self.env["hr.holidays.public"]
+        spain = self.env.ref("base.es")
+        for year in years:
+            holidays |= holidays.create(
+                {
+                    "year": year,
+                    "line_ids": [
+                        (0, 0, {"name": "New year", "date": date(year, 1, 1)}),
+                        (0, 0, {"name": "Christmas", "date": date(year, 12, 25)}),
+                    ],
+                }
+            )
+            holidays |= holidays.create(
+                {
+                    "year": year,
+                    "country_id": spain.id,
+                    "line_ids": [
+                        (0, 0, {"name": "National", "date": date(year, 10, 12)}),
+                        (
+                            0,
+                            0,
+                            {
+                                "name": "Regional",
+                                "date": date(year, 3, 19),
+                                "state_ids": [
+                                    (6, 0, self.env.ref("base.state_es_cr").ids)
+                                ],
+                            },
+                        ),
+                    ],
+                }
+            )
+            holidays |= holidays.create(
+                {
+                    "year": year,
+                    "country_id": self.env.ref("base.uk").id,
+                    "line_ids": [
+                        (0, 0, {"name": "Boxing day", "date": date(year, 12, 26)})
+                    ],
+                }
+            )
+        return holidays
+
+    def _create_employees(self, count, calendars, date_from):
+        addresses = self.env["res.partner"].create(
+            [
+                {
+                    "name": f"{self.prefix} UK",
+                    "country_id": self.env.ref("base.uk").id,
+                },
+                {
+                    "name": f"{self.prefix} Ciudad Real",
+                    "country_id": self.env.ref("base.es").id,
+                    "state_id": self.env.ref("base.state_es_cr").id,
+                },
+                {
+                    "name": f"{self.prefix} Madrid",
+                    "country_id": self.env.ref("base.es").id,
+                    "state_id": self.env.ref("base.state_es_m").id,
+                },
+            ]
+        )
+        employees = self.env["hr.employee"].create(
+            [
+                {
+                    "name": f"{self.prefix} employee {index}",
+                    "resource_calendar_id": calendars[index % len(calendars)].id,
+                    "address_id": self.random.choice(addresses).id,
+                }
+                for index in range(count)
+            ]
+        )
+        # Report days are generated since the employee creation
+        self.env.cr.execute(
+            "UPDATE hr_employee SET create_date = %s WHERE id IN %s",
+            (datetime.combine(date_from, time.min), tuple(employees.ids)),
+        )
+        employees.invalidate_recordset(["create_date"])
+        return employees
+
+    def _create_leaves(self, employees, years, per_year):
+        """Create one day leaves on random week days, with types both included
+        and excluded from the theoretical time.
+        """
+        leave_types = self.env["hr.leave.type"].create(
+            [
+                {
+                    "name": f"{self.prefix} leave type {include}",
+                    "requires_allocation": "no",
+                    "include_in_theoretical": include,
+                }
+                for include in (False, True)
+            ]
+        )
+        leaves = self.env["hr.leave"]
+        for employee in employees:
+            for year in years:
+                days = set()
+                while len(days) < per_year:
+                    day = date(year, 1, 1) + timedelta(days=self.random.randrange(364))
+                    if day.weekday() < 5 and (day.month, day.day) not in HOLIDAYS:
+                        days.add(day)
+                for day in sorted(days):
+                    leave = leaves.create(
+                        {
+                            "employee_id": employee.id,
+                            "holiday_status_id": self.random.choice(leave_types).id,
+                            "date_from": datetime.combine(day, time.min),
+                            "date_to": datetime.combine(day, time(23, 59, 59)),
+                            "request_date_from": day,
+                            "request_date_to": day,
+                        }
+                    )
+                    leave._compute_date_from_to()
+                    leave.action_validate()
+                    leaves |= leave
+        return leaves
+
+    def _create_attendances(self, employees, date_from, date_to, leaves):
+        """Create a morning and an afternoon attendance on each week day
+        without leave, with some minutes of random deviation.
+        """
+        leave_days = {
+            (leave.employee_id.id, leave.date_from.date()) for leave in leaves
+        }
+        attendances = self.env["hr.attendance"]
+        for employee in employees:
+            vals_list = []
+            day = date_from
+            while day <= date_to:
+                if day.weekday() < 5 and (employee.id, day) not in leave_days:
+                    for hour_from, hour_to in ((8, 12), (13, 17)):
+                        start = datetime.combine(day, time(hour_from)) + timedelta(
+                            minutes=self.random.randint(-15, 15)
+                        )
+                        stop = datetime.combine(day, time(hour_to)) + timedelta(
+                            minutes=self.random.randint(-15, 15)
+                        )
+                        vals_list.append(
+                            {
+                                "employee_id": employee.id,
+                                "check_in": start,
+                                "check_out": stop,
+                            }
+                        )
+                day += timedelta(days=1)
+            attendances |= attendances.create(vals_list)
+        return attendances
+
+    def generate(
+        self, employees=10, calendars=3, years=1, start_year=1960, leaves_per_year=2
+    ):
+        """Generate a dataset.
+
+        :param employees: Number of employees.
+        :param calendars: Number of calendars the employees are spread on.
+        :param years: Number of years with attendances, leaves and holidays.
+        :param start_year: First year of the data. Datasets generated in the
+          same database must not share years because of public holidays.
+        :param leaves_per_year: Number of one day leaves of each employee and
+          year.
+        :return: Dictionary with the created records and the period.
+        """
+        year_list = list(range(start_year, start_year + years))
+        date_from = date(start_year, 1, 1)
+        date_to = date(start_year + years - 1, 12, 31)
+        calendar_records = self._create_calendars(calendars, date_from, date_to)
+        holidays = self._create_public_holidays(year_list)
+        employee_records = self._create_employees(
+            employees, calendar_records, date_from
+        )
+        leaves = self._create_leaves(employee_records, year_list, leaves_per_year)
+        attendances = self._create_attendances(
+            employee_records, date_from, date_to, leaves
+        )
+        return {
+            "calendars": calendar_records,
+            "employees": employee_records,
+            "holidays": holidays,
+            "leaves": leaves,
+            "attendances": attendances,
+            "date_from": date_from,
+            "date_to": date_to,
+        }
@@ -0,0 +1,118 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import logging
+from datetime import date
+
+from odoo.tests import tagged
+
+from odoo.addons.base.tests.common import BaseCommon
+
+from .common import TheoreticalTimeDataGenerator, measure
+
+_logger = logging.getLogger(__name__)
+
+# (employees, calendars, years) of each measured dataset
+BENCHMARK_SIZES = [(5, 3, 1), (20, 3, 2), (50, 6, 3)]
+
+
+@tagged("-standard", "benchmark")
+class TestHrAttendanceTheoreticalTimeBenchmark(BaseCommon):
+    """Measure wall time and SQL queries of the main paths on generated data
+    of several sizes. Not run by default: use `--test-tags benchmark`.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.datasets = []
+        for index, (employees, calendars, years) in enumerate(BENCHMARK_SIZES):
+            dataset = TheoreticalTimeDataGenerator(cls.env, seed=index).generate(
+                employees=employees,
+                calendars=calendars,
+                years=years,
+                start_year=1960 + 10 * index,
+            )
+            size = f"{employees} employees, {calendars} calendars, {years} years"
+            dataset["size"] = size
+            cls.datasets.append(dataset)
+
+    def _benchmark(self, name, dataset, function):
+        """Run the function with empty caches and log its wall time, the
+        number of SQL queries it issues and the hits and misses of the
+        theoretical hours cache.
+        """
+        cache = self.env["hr.attendance.theoretical.time.cache"]
+        # Measure the computation instead of the hits of the previous runs
+        cache._invalidate([None])
+        stats = cache._get_stats()
+        duration, queries = measure(self.env, function)
+        new_stats = cache._get_stats()
+        _logger.info(
+            "Benchmark %s (%s): %.3f s, %s queries, %s cache hits, %s misses",
+            name,
+            dataset["size"],
+            duration,
+            queries,
+            new_stats["hit"] - stats["hit"],
+            new_stats["miss"] - stats["miss"],
+        )
+
+    def test_benchmark_read_group(self):
+        report = self.env["hr.attendance.theoretical.time.report"]
+        fields = ["theoretical_hours:sum", "worked_hours:sum", "difference:sum"]
+        for dataset in self.datasets:
+            domain = [
+                ("employee_id", "in", dataset["employees"].ids),
+                ("date", ">=", dataset["date_from"]),
+                ("date", "<=", dataset["date_to"]),
+            ]
+            for granularity in ("day", "month", "year"):
+                self._benchmark(
+                    f"read_group by {granularity}",
+                    dataset,
+                    lambda domain=domain, granularity=granularity: report.read_group(
+                        domain,
+                        fields,
+                        ["employee_id", f"date:{granularity}"],
+                        lazy=False,
+                    ),
+                )
+
+    def test_benchmark_compute_theoretical_hours(self):
+        for dataset in self.datasets:
+            self._benchmark(
+                f"_compute_theoretical_hours ({len(dataset['attendances'])} "
+                "attendances)",
+                dataset,
+                dataset["attendances"]._compute_theoretical_hours,
+            )
+
+    def test_benchmark_leave_recompute(self):
+        for dataset in self.datasets:
+            self._benchmark(
+                f"leave recompute ({len(dataset['leaves'])} leaves)",
+                dataset,
+                dataset["leaves"]._check_theoretical_hours,
+            )
+
+    def test_benchmark_public_holiday_recompute(self):
+        holidays = self.env["hr.holidays.public"]
+        for dataset in self.datasets:
+            years = range(dataset["date_from"].year, dataset["date_to"].year + 1)
+            self._benchmark(
+                f"public holiday recompute ({len(years)} years)",
+                dataset,
+                lambda years=years: holidays.create(
+                    [
+                        {
+                            "year": year,
+                            "country_id": self.env.ref("base.fr").id,
+                            "line_ids": [
+                                (0, 0, {"name": "Holiday", "date": date(year, 5, day)})
+                                for day in (1, 8)
+                            ],
+                        }
+                        for year in years
+                    ]
+                ),
+            )
@@ -3,8 +3,25 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 import datetime
+from unittest.mock import patch
+
+from odoo.tests import new_test_user
+from odoo.tools import config
 
 from odoo.addons.base.tests.common import BaseCommon
+from odoo.addons.hr_attendance_report_theoretical_time.reports import (
+    hr_attendance_theoretical_time_report,
+)
+
+from .common import measure
+
+# Maximum number of queries of the hot paths on the fixtures
+READ_GROUP_MAX_QUERIES = 40
+LEAVE_RECOMPUTE_MAX_QUERIES = 40
+HOLIDAY_RECOMPUTE_MAX_QUERIES = 40
+# Queries allowed over the count of the run on half of the records, as the
+# records with different computed values are updated in different queries
+QUERY_COUNT_TOLERANCE = 3
 
 
 class TestHrAttendanceReportTheoreticalTimeBase(BaseCommon):
@@ -173,9 +190,17 @@ class TestHrAttendanceReportTheoreticalTime(TestHrAttendanceReportTheoreticalTim
         self.employee_1.resource_calendar_id.attendance_ids.filtered(
             lambda x: x.hour_from == 14.0
         ).unlink()
-        # The attendances theoretical hours remain at 8 if not recomputed
-        self.assertEqual(self.attendances[0].theoretical_hours, 8)
-        self.assertEqual(self.attendances[1].theoretical_hours, 8)
+        # The attendances theoretical hours are recomputed automatically
+        self.assertEqual(self.attendances[0].theoretical_hours, 4)
+        self.assertEqual(self.attendances[2].theoretical_hours, 4)
+        # Simulate outdated values for checking the wizard
+        attendances = self.attendances[0] | self.attendances[1]
+        attendances |= self.attendances[2] | self.attendances[3]
+        self.env.cr.execute(
+            "UPDATE hr_attendance SET theoretical_hours = 8 WHERE id IN %s",
+            (tuple(attendances.ids),),
+        )
+        attendances.invalidate_recordset(["theoretical_hours"])
         # Then we run the wizard just for day 23
         wizard = self.env["recompute.theoretical.attendance"].create(
             {
@@ -184,7 +209,13 @@ class TestHrAttendanceReportTheoreticalTime(TestHrAttendanceReportTheoreticalTim
                 "date_to": "1946-12-23 23:59:59",
             }
         )
-        wizard.action_recompute()
+        action = wizard.action_recompute()
+        job = self.env["hr.attendance.theoretical.time.job"].browse(action["res_id"])
+        # The job is run by the scheduled action
+        self.assertEqual(job.state, "running")
+        self.assertEqual(self.attendances[0].theoretical_hours, 8)
+        job._cron_run()
+        self.assertEqual(job.state, "done")
         # Attendances for day 23 are recomputed
         self.assertEqual(self.attendances[0].theoretical_hours, 4)
         self.assertEqual(self.attendances[1].theoretical_hours, 4)
@@ -192,6 +223,271 @@ class TestHrAttendanceReportTheoreticalTime(TestHrAttendanceReportTheoreticalTim
         self.assertEqual(self.attendances[2].theoretical_hours, 8)
         self.assertEqual(self.attendances[3].theoretical_hours, 8)
 
+    def test_theoretical_hours_recompute_job_resume(self):
+        job = self.env["hr.attendance.theoretical.time.job"].create(
+            {
+                "name": "Job",
+                "employee_ids": [(6, 0, (self.employee_1 | self.employee_2).ids)],
+                "date_from": "1946-12-23",
+                "date_to": "1946-12-24",
+                "chunk_employees": 1,
+                "chunk_days": 1,
+            }
+        )
+        self.assertEqual(job.chunk_count, 4)
+        self.assertEqual(
+            job._get_chunk(2),
+            (
+                self.employee_2.ids,
+                datetime.date(1946, 12, 23),
+                datetime.date(1946, 12, 23),
+            ),
+        )
+        attendances = self.attendances[0] | self.attendances[8]
+        self.env.cr.execute(
+            "UPDATE hr_attendance SET theoretical_hours = 99 WHERE id IN %s",
+            (tuple(attendances.ids),),
+        )
+        attendances.invalidate_recordset(["theoretical_hours"])
+        # Interrupted after the chunks of the first employee
+        job.chunk_done = 2
+        job._run()
+        self.assertEqual(job.state, "done")
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(self.attendances[0].theoretical_hours, 99)
+        self.assertEqual(self.attendances[8].theoretical_hours, 0)
+
+    def test_theoretical_hours_recompute_changes(self):
+        attendances = self.attendances[0] | self.attendances[1]
+        self.assertEqual(self.attendances[0].theoretical_hours, 8)
+        self.env.cr.execute(
+            "UPDATE hr_attendance SET theoretical_hours = 99 WHERE id = %s",
+            (self.attendances[0].id,),
+        )
+        attendances.invalidate_recordset(["theoretical_hours"])
+        write_date = self.attendances[1].write_date
+        day = datetime.date(1946, 12, 23)
+        ranges = [(self.employee_1.id, day, day)]
+        attendance_obj = self.env["hr.attendance"]
+        changes = attendance_obj._recompute_theoretical_time_ranges(
+            ranges, dry_run=True
+        )
+        self.assertEqual(changes["count"], 1)
+        self.assertEqual(changes["sample"], [(self.attendances[0].id, 99, 8)])
+        self.assertEqual(self.attendances[0].theoretical_hours, 99)
+        # Only the changed attendance is written
+        changes = attendance_obj._recompute_theoretical_time_ranges(ranges)
+        self.assertEqual(changes["count"], 1)
+        self.assertEqual(self.attendances[0].theoretical_hours, 8)
+        self.assertEqual(self.attendances[1].write_date, write_date)
+        changes = attendance_obj._recompute_theoretical_time_ranges(ranges)
+        self.assertEqual(changes, {"count": 0, "sample": []})
+        # The dry run of the wizard is done by a job without writing anything
+        self.env.cr.execute(
+            "UPDATE hr_attendance SET theoretical_hours = 99 WHERE id = %s",
+            (self.attendances[0].id,),
+        )
+        attendances.invalidate_recordset(["theoretical_hours"])
+        wizard = self.env["recompute.theoretical.attendance"].create(
+            {
+                "employee_ids": [(4, self.employee_1.id)],
+                "date_from": "1946-12-23 00:00:00",
+                "date_to": "1946-12-23 23:59:59",
+                "dry_run": True,
+            }
+        )
+        action = wizard.action_recompute()
+        job = self.env[action["res_model"]].browse(action["res_id"])
+        self.assertTrue(job.dry_run)
+        job._cron_run()
+        self.assertEqual(job.state, "done")
+        self.assertEqual(job.changed_count, 1)
+        self.assertEqual(
+            job.changes_sample, "Employee 1 1946-12-23 08:00:00: 99.00 → 8.00"
+        )
+        self.assertEqual(self.attendances[0].theoretical_hours, 99)
+
+    def test_theoretical_hours_recompute_partitions(self):
+        attendances = self.env["hr.attendance"].browse(
+            [attendance.id for attendance in self.attendances]
+        )
+        expected = attendances.mapped("theoretical_hours")
+        jobs = self.env["hr.attendance.theoretical.time.job"]._create_partitions(
+            self.employee_1 | self.employee_2,
+            datetime.date(1946, 12, 23),
+            datetime.date(1946, 12, 26),
+            3,
+        )
+        # No more partitions than employees, and no shared employees
+        self.assertEqual(len(jobs), 2)
+        self.assertEqual(len(jobs[0].employee_ids), 1)
+        self.assertEqual(jobs.employee_ids, self.employee_1 | self.employee_2)
+        # A trigger of the single scheduled action for each partition, up to
+        # the cron threads
+        cron = self.env.ref(
+            "hr_attendance_report_theoretical_time.theoretical_time_job_cron"
+        )
+        triggers = self.env["ir.cron.trigger"]
+        triggers.search([("cron_id", "=", cron.id)]).unlink()
+        with patch.dict(config.options, {"max_cron_threads": 4}):
+            jobs._trigger_workers(len(jobs))
+        self.assertEqual(triggers.search_count([("cron_id", "=", cron.id)]), 2)
+        with patch.dict(config.options, {"max_cron_threads": 1}):
+            jobs._trigger_workers(len(jobs))
+        self.assertEqual(triggers.search_count([("cron_id", "=", cron.id)]), 3)
+        self.assertEqual(
+            cron.search_count(
+                [("model_id", "=", cron.model_id.id), ("code", "=", cron.code)]
+            ),
+            1,
+        )
+        self.env.cr.execute(
+            "UPDATE hr_attendance SET theoretical_hours = 99 WHERE id IN %s",
+            (tuple(attendances.ids),),
+        )
+        attendances.invalidate_recordset(["theoretical_hours"])
+        jobs._run()
+        self.assertEqual(set(jobs.mapped("state")), {"done"})
+        self.assertEqual(attendances.mapped("theoretical_hours"), expected)
+
+    def test_calendar_change_recompute(self):
+        attendances = self.attendances[0] | self.attendances[2]
+        # Outdated value on Tuesday, for checking that it's not recomputed
+        self.env.cr.execute(
+            "UPDATE hr_attendance SET theoretical_hours = 99 WHERE id = %s",
+            (self.attendances[2].id,),
+        )
+        attendances.invalidate_recordset(["theoretical_hours"])
+        # Remove the Monday afternoon line
+        self.calendar.attendance_ids.filtered(
+            lambda line: line.dayofweek == "0" and line.hour_from == 14
+        ).unlink()
+        self.assertEqual(self.attendances[0].theoretical_hours, 4)
+        self.assertEqual(self.attendances[2].theoretical_hours, 99)
+        # Lines are only recomputed in their validity dates
+        line = self.calendar.attendance_ids.filtered(
+            lambda line: line.dayofweek == "1" and line.hour_from == 14
+        )
+        line.date_from = "1947-01-01"
+        self.assertEqual(self.attendances[2].theoretical_hours, 4)
+        self.env.cr.execute(
+            "UPDATE hr_attendance SET theoretical_hours = 99 WHERE id = %s",
+            (self.attendances[2].id,),
+        )
+        attendances.invalidate_recordset(["theoretical_hours"])
+        line.hour_to = 17
+        self.assertEqual(self.attendances[2].theoretical_hours, 99)
+        line.date_from = "1946-12-01"
+        self.assertEqual(self.attendances[2].theoretical_hours, 7)
+
+    def test_employee_calendar_change_recompute(self):
+        calendar = self.calendar.copy()
+        calendar.attendance_ids.filtered(
+            lambda line: line.dayofweek == "1" and line.hour_from == 14
+        ).unlink()
+        self.env.cr.execute(
+            "UPDATE hr_attendance SET theoretical_hours = 99 WHERE id = %s",
+            (self.attendances[0].id,),
+        )
+        self.attendances[0].invalidate_recordset(["theoretical_hours"])
+        self.assertEqual(self.calendar._get_theoretical_time_weekdays(calendar), {1})
+        self.employee_1.resource_calendar_id = calendar
+        # Only Tuesday is recomputed
+        self.assertEqual(self.attendances[0].theoretical_hours, 99)
+        self.assertEqual(self.attendances[2].theoretical_hours, 4)
+
+    def test_theoretical_hours_batch(self):
+        obj = self.env["hr.attendance.theoretical.time.report"]
+        res = obj._theoretical_hours_batch(
+            self.employee_1 | self.employee_2,
+            datetime.date(1946, 12, 23),
+            datetime.date(1946, 12, 27),
+        )
+        self.assertEqual(len(res), 10)
+        for day, hours_1, hours_2 in (
+            (23, 8, 0),  # Public holiday for state of employee 2
+            (24, 8, 0),  # Public holiday for country of employee 2
+            (25, 0, 0),  # Global public holiday
+            (26, 0, 8),  # Employee 1 leave
+            (27, 8, 8),
+        ):
+            date = datetime.date(1946, 12, day)
+            self.assertEqual(res[(self.employee_1.id, date)], hours_1)
+            self.assertEqual(res[(self.employee_2.id, date)], hours_2)
+
+    def test_theoretical_hours_by_day_groups(self):
+        obj = self.env["hr.attendance.theoretical.time.report"]
+        employee_3 = self.env["hr.employee"].create(
+            {
+                "name": "Employee 3",
+                "resource_calendar_id": self.calendar.id,
+                "address_id": self.address_1.id,
+            }
+        )
+        employees = self.employee_1 | self.employee_2 | employee_3
+        groups = obj._theoretical_hours_groups(employees)
+        self.assertEqual(len(groups), 2)
+        self.assertIn(self.employee_1 | employee_3, groups)
+        dates = [
+            datetime.date(1946, 12, 23),
+            datetime.date(1946, 12, 26),
+            datetime.date(1947, 6, 2),
+        ]
+        self.assertEqual(
+            obj._theoretical_hours_windows(dates),
+            [(dates[0], dates[1]), (dates[2], dates[2])],
+        )
+        res = obj._theoretical_hours_by_day(
+            (employee, date) for employee in employees for date in dates
+        )
+        self.assertEqual(len(res), 9)
+        for employee in employees:
+            for date in dates:
+                self.assertEqual(
+                    res[(employee.id, date)],
+                    obj._theoretical_hours_batch(employee, date, date)[
+                        (employee.id, date)
+                    ],
+                )
+
+    def test_theoretical_hours_cache(self):
+        obj = self.env["hr.attendance.theoretical.time.report"]
+        cache = self.env["hr.attendance.theoretical.time.cache"]
+        date = datetime.date(1946, 12, 27)
+        self.assertEqual(obj._theoretical_hours(self.employee_1, date), 8)
+        self.assertEqual(obj._theoretical_hours(self.employee_2, date), 8)
+        stats = cache._get_stats()
+        self.assertEqual(obj._theoretical_hours(self.employee_1, date), 8)
+        new_stats = cache._get_stats()
+        self.assertEqual(new_stats["hit"] - stats["hit"], 1)
+        self.assertEqual(new_stats["miss"], stats["miss"])
+        # Changing the address of an employee only invalidates its own days
+        self.employee_1.address_id = self.address_2
+        stats = new_stats
+        self.assertEqual(obj._theoretical_hours(self.employee_1, date), 8)
+        self.assertEqual(obj._theoretical_hours(self.employee_2, date), 8)
+        new_stats = cache._get_stats()
+        self.assertEqual(new_stats["hit"] - stats["hit"], 1)
+        self.assertEqual(new_stats["miss"] - stats["miss"], 1)
+        # Changing the calendar invalidates the days
+        self.calendar.attendance_ids.filtered(lambda x: x.hour_from == 14.0).unlink()
+        self.assertEqual(obj._theoretical_hours(self.employee_1, date), 4)
+        # Same for leave types included in theoretical time
+        date = datetime.date(1946, 12, 26)
+        self.assertEqual(obj._theoretical_hours(self.employee_1, date), 0)
+        self.leave_type.include_in_theoretical = True
+        self.assertEqual(obj._theoretical_hours(self.employee_1, date), 4)
+        # Same for global leaves of the calendar
+        self.env["resource.calendar.leaves"].create(
+            {
+                "name": "Closure",
+                "calendar_id": self.calendar.id,
+                "date_from": datetime.datetime(1946, 12, 26),
+                "date_to": datetime.datetime(1946, 12, 26, 23, 59, 59),
+            }
+        )
+        self.assertEqual(obj._theoretical_hours(self.employee_1, date), 0)
+
     def test_hr_attendance_read_group(self):
         # TODO: Test when having theoretical_hours_start_date set
         # Group by employee
@@ -234,6 +530,426 @@ class TestHrAttendanceReportTheoreticalTime(TestHrAttendanceReportTheoreticalTim
         self.assertEqual(res[4]["theoretical_hours"], 8)  # 1946-12-27(virtual)
         self.assertEqual(res[5]["theoretical_hours"], 8)  # 1946-12-30(virtual)
 
+    def test_hr_attendance_read_group_several_groupbys(self):
+        res = self.env["hr.attendance.theoretical.time.report"].read_group(
+            [
+                ("date", ">=", "1946-12-23"),
+                ("date", "<", "1946-12-31"),
+                ("employee_id", "in", (self.employee_1.id, self.employee_2.id)),
+            ],
+            ["employee_id", "theoretical_hours:sum", "date"],
+            ["employee_id", "date:week"],
+            lazy=False,
+        )
+        hours = {
+            (line["employee_id"][0], line["__range"]["date:week"]["from"]): line[
+                "theoretical_hours"
+            ]
+            for line in res
+        }
+        self.assertEqual(hours[(self.employee_1.id, "1946-12-23")], 24)
+        self.assertEqual(hours[(self.employee_1.id, "1946-12-30")], 8)
+        self.assertEqual(hours[(self.employee_2.id, "1946-12-23")], 16)
+        self.assertEqual(hours[(self.employee_2.id, "1946-12-30")], 8)
+
+    def test_domain_date_bounds(self):
+        obj = self.env["hr.attendance.theoretical.time.report"]
+        self.assertEqual(
+            obj._domain_date_bounds(
+                [("date", ">=", "2020-01-01"), ("date", "<", "2020-02-01")]
+            ),
+            (datetime.date(2020, 1, 1), datetime.date(2020, 1, 31)),
+        )
+        self.assertEqual(
+            obj._domain_date_bounds(
+                ["|", ("date", "=", "2020-01-05"), ("date", "=", "2020-03-01")]
+            ),
+            (datetime.date(2020, 1, 5), datetime.date(2020, 3, 1)),
+        )
+        self.assertEqual(
+            obj._domain_date_bounds(
+                ["|", ("date", ">", "2020-01-05"), ("employee_id", "=", 1)]
+            ),
+            (None, None),
+        )
+        self.assertEqual(obj._domain_date_bounds([]), (None, None))
+
+    def test_report_search_date_bounds(self):
+        report = self.env["hr.attendance.theoretical.time.report"]
+        self.assertTrue(report.search([], limit=1))
+        res = report.read_group(
+            [
+                ("date", ">=", "1946-12-23"),
+                ("date", "<=", "1946-12-24"),
+                ("employee_id", "=", self.employee_1.id),
+            ],
+            ["employee_id", "theoretical_hours:sum", "worked_hours:sum"],
+            ["employee_id"],
+        )
+        self.assertEqual(res[0]["theoretical_hours"], 16)
+        self.assertEqual(res[0]["worked_hours"], 16)
+
+    def test_report_bounds_context(self):
+        report = self.env["hr.attendance.theoretical.time.report"].with_context(
+            theoretical_time_report_bounds={
+                "date_from": "1946-12-23' OR TRUE --",
+                "employee_ids": ["0) OR (TRUE"],
+            }
+        )
+        # The bounds given by the caller are replaced by the ones of the domain
+        self.assertTrue(report.search([], limit=1))
+        # Only dates and integers get into the query
+        self.assertEqual(
+            report._get_report_bounds(), (datetime.date(1946, 12, 23), None)
+        )
+        with self.assertRaises(ValueError):
+            report._query()
+
+    def test_hr_attendance_read_group_or_domain(self):
+        res = self.env["hr.attendance.theoretical.time.report"].read_group(
+            [
+                "|",
+                "&",
+                ("date", ">=", "1946-12-23"),
+                ("date", "<", "1946-12-25"),
+                ("date", "=", "1946-12-27"),
+                ("employee_id", "=", self.employee_1.id),
+            ],
+            ["employee_id", "theoretical_hours:sum", "worked_hours:sum"],
+            ["employee_id"],
+        )
+        self.assertEqual(res[0]["theoretical_hours"], 24)
+        self.assertEqual(res[0]["worked_hours"], 16)
+
+    def test_report_ids(self):
+        report = self.env["hr.attendance.theoretical.time.report"]
+        rows = report.search(
+            [
+                ("date", ">=", "1946-12-23"),
+                ("date", "<=", "1946-12-27"),
+                ("employee_id", "=", self.employee_1.id),
+            ]
+        )
+        self.assertEqual(len(rows), 5)
+        for row in rows:
+            self.assertEqual(report._split_id(row.id), (self.employee_1.id, row.date))
+        # Reading by ID out of a search gets the same values
+        worked_hours = rows[0].worked_hours
+        report.invalidate_model()
+        row = report.browse(rows[0].id)
+        self.assertEqual(row.employee_id, self.employee_1)
+        self.assertEqual(str(row.date), "1946-12-23")
+        self.assertEqual(row.worked_hours, worked_hours)
+
+    def test_instrumentation(self):
+        report = self.env["hr.attendance.theoretical.time.report"]
+        stats = self.env["hr.attendance.theoretical.time.stats"]
+        domain = [
+            ("employee_id", "=", self.employee_1.id),
+            ("date", ">=", "1946-12-23"),
+            ("date", "<=", "1946-12-27"),
+        ]
+        fields = ["employee_id", "theoretical_hours:sum"]
+        report.read_group(domain, fields, ["employee_id"])
+        self.assertFalse(stats.search([]))
+        report.with_context(theoretical_time_instrument="store").read_group(
+            domain, fields, ["employee_id"]
+        )
+        stat = stats.search([])
+        self.assertEqual(stat.operation, "read_group")
+        self.assertTrue(stat.query_count)
+        self.assertTrue(stat.resolved_days)
+        self.assertIn("theoretical_hours", stat.phases)
+        self.assertTrue(stat.peak_memory)
+        # The memory of the process is traced by one operation at a time
+        with hr_attendance_theoretical_time_report._instrumentation_memory_lock:
+            report.with_context(theoretical_time_instrument="store").read_group(
+                domain, fields, ["employee_id"]
+            )
+        stat = stats.search([], order="id desc", limit=1)
+        self.assertTrue(stat.query_count)
+        self.assertFalse(stat.peak_memory)
+
+    def test_hr_attendance_read_group_stored(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_attendance_report_theoretical_time.report_stored", "1"
+        )
+        report = self.env["hr.attendance.theoretical.time.report"]
+        report.init()
+        employees = self.employee_1 | self.employee_2
+        self.env["hr.attendance.theoretical.time.day"]._refresh_employees(
+            employees.ids, "1946-12-23", "1946-12-30"
+        )
+        domain = [
+            ("date", ">=", "1946-12-23"),
+            ("date", "<", "1946-12-31"),
+            ("employee_id", "in", employees.ids),
+        ]
+        fields = [
+            "employee_id",
+            "theoretical_hours:sum",
+            "worked_hours:sum",
+            "difference:sum",
+        ]
+        res = report.read_group(domain, fields, ["employee_id"])
+        self.assertEqual(res[0]["theoretical_hours"], 32)
+        self.assertEqual(res[0]["worked_hours"], 32)
+        self.assertEqual(res[0]["difference"], 0)
+        self.assertEqual(res[1]["theoretical_hours"], 24)
+        self.assertEqual(res[1]["worked_hours"], 32)
+        self.assertEqual(res[1]["difference"], 8)
+        # New attendances are reflected without refreshing the whole table
+        self.env["hr.attendance"].create(
+            {
+                "employee_id": self.employee_2.id,
+                "check_in": "1946-12-27 08:00:00",
+                "check_out": "1946-12-27 12:00:00",
+            }
+        )
+        res = report.read_group(domain, fields, ["employee_id"])
+        self.assertEqual(res[1]["theoretical_hours"], 24)
+        self.assertEqual(res[1]["worked_hours"], 36)
+        self.assertEqual(res[1]["difference"], 12)
+
+    def test_stored_days_refresh_ranges(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_attendance_report_theoretical_time.report_stored", "1"
+        )
+        self.env["hr.attendance.theoretical.time.report"].init()
+        stored_days = self.env["hr.attendance.theoretical.time.day"]
+        employees = self.employee_1 | self.employee_2
+        stored_days._refresh_employees(employees.ids, "1946-12-23", "1946-12-24")
+        self.env.cr.execute(
+            "UPDATE hr_attendance_theoretical_time_day SET worked_hours = 99 "
+            "WHERE employee_id IN %s",
+            (tuple(employees.ids),),
+        )
+        day_23 = datetime.date(1946, 12, 23)
+        day_24 = datetime.date(1946, 12, 24)
+        stored_days._refresh_ranges(
+            [(self.employee_1.id, day_23, day_23), (None, day_24, day_24)]
+        )
+        stored_days.invalidate_model()
+        rows = stored_days.search([("employee_id", "in", employees.ids)])
+        worked_hours = {(row.employee_id, row.date): row.worked_hours for row in rows}
+        self.assertEqual(worked_hours[self.employee_1, day_23], 8)
+        self.assertEqual(worked_hours[self.employee_2, day_23], 99)
+        self.assertEqual(worked_hours[self.employee_1, day_24], 8)
+        self.assertEqual(worked_hours[self.employee_2, day_24], 8)
+
+    def test_stored_days_refresh_inputs(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_attendance_report_theoretical_time.report_stored", "1"
+        )
+        self.env["hr.attendance.theoretical.time.report"].init()
+        stored_days = self.env["hr.attendance.theoretical.time.day"]
+        employees = self.employee_1 | self.employee_2
+        stored_days._refresh_employees(employees.ids, "1946-12-23", "1946-12-27")
+
+        def theoretical_hours():
+            stored_days.invalidate_model()
+            rows = stored_days.search([("employee_id", "in", employees.ids)])
+            return {
+                (row.employee_id, row.date.day): row.theoretical_hours for row in rows
+            }
+
+        self.assertEqual(theoretical_hours()[self.employee_1, 23], 8)
+        # The area of the address selects the public holidays
+        self.address_1.write(
+            {
+                "country_id": self.address_2.country_id.id,
+                "state_id": self.address_2.state_id.id,
+            }
+        )
+        hours = theoretical_hours()
+        self.assertEqual(hours[self.employee_1, 23], 0)
+        self.assertEqual(hours[self.employee_1, 24], 0)
+        # Leaves of the calendar not coming from time off
+        self.assertEqual(hours[self.employee_2, 27], 8)
+        self.env["resource.calendar.leaves"].create(
+            {
+                "name": "Closure",
+                "calendar_id": self.calendar.id,
+                "date_from": datetime.datetime(1946, 12, 27),
+                "date_to": datetime.datetime(1946, 12, 27, 23, 59, 59),
+            }
+        )
+        hours = theoretical_hours()
+        self.assertEqual(hours[self.employee_1, 27], 0)
+        self.assertEqual(hours[self.employee_2, 27], 0)
+
+    def test_hr_attendance_read_group_rollup(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_attendance_report_theoretical_time.report_stored", "1"
+        )
+        report = self.env["hr.attendance.theoretical.time.report"]
+        report.init()
+        employees = self.employee_1 | self.employee_2
+        self.env["hr.attendance.theoretical.time.day"]._refresh_employees(
+            employees.ids, "1946-12-01", "1946-12-31"
+        )
+        fields = ["theoretical_hours:sum", "worked_hours:sum", "difference:sum"]
+        groupby = ["employee_id", "date:month"]
+        domain = [("employee_id", "in", employees.ids)]
+        month_domain = domain + [
+            ("date", ">=", "1946-12-01"),
+            ("date", "<", "1947-01-01"),
+        ]
+        day_domain = domain + [("date", ">=", "1946-12-02")]
+        self.assertEqual(
+            report._read_group_rollup_granularity(month_domain, fields, groupby),
+            "month",
+        )
+        self.assertFalse(
+            report._read_group_rollup_granularity(day_domain, fields, groupby)
+        )
+        res = report.read_group(month_domain, fields, groupby, lazy=False)
+        expected = report.read_group(day_domain, fields, groupby, lazy=False)
+        self.assertEqual(len(res), 2)
+        for line, expected_line in zip(res, expected, strict=True):
+            for fname in ("theoretical_hours", "worked_hours", "difference"):
+                self.assertAlmostEqual(line[fname], expected_line[fname])
+            self.assertEqual(line["__count"], expected_line["__count"])
+            self.assertEqual(
+                report.search_count(line["__domain"]), expected_line["__count"]
+            )
+        # Totals of the period follow the changes of its days, refreshed once
+        # before being read
+        self.env["hr.attendance"].create(
+            [
+                {
+                    "employee_id": self.employee_2.id,
+                    "check_in": "1946-12-27 08:00:00",
+                    "check_out": "1946-12-27 10:00:00",
+                },
+                {
+                    "employee_id": self.employee_2.id,
+                    "check_in": "1946-12-27 10:00:00",
+                    "check_out": "1946-12-27 12:00:00",
+                },
+            ]
+        )
+        self.assertEqual(
+            self.env.cr.precommit.data["theoretical_time_rollup_days"],
+            {(self.employee_2.id, datetime.date(1946, 12, 27))},
+        )
+        new_res = report.read_group(month_domain, fields, groupby, lazy=False)
+        self.assertEqual(new_res[1]["worked_hours"], res[1]["worked_hours"] + 4)
+
+    def test_theoretical_time_balance(self):
+        balance = self.employee_2._get_theoretical_time_balance("1946-12-31")
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_attendance_report_theoretical_time.report_stored", "1"
+        )
+        self.env["hr.attendance.theoretical.time.report"].init()
+        self.env["hr.attendance.theoretical.time.day"]._refresh_employees(
+            self.employee_2.ids, "1946-12-01", "1946-12-31"
+        )
+        self.assertEqual(
+            self.employee_2._get_theoretical_time_balance("1946-12-31"), balance
+        )
+        balances = self.env["hr.attendance.theoretical.time.balance"]
+        checkpoint = balances.search([("employee_id", "=", self.employee_2.id)])
+        self.assertEqual(str(checkpoint.date), "1946-12-01")
+        self.assertEqual(checkpoint.balance, balance)
+        self.env["hr.attendance"].create(
+            {
+                "employee_id": self.employee_2.id,
+                "check_in": "1946-12-27 08:00:00",
+                "check_out": "1946-12-27 12:00:00",
+            }
+        )
+        self.assertEqual(
+            self.employee_2._get_theoretical_time_balance("1946-12-31"), balance + 4
+        )
+        checkpoint = balances.search([("employee_id", "=", self.employee_2.id)])
+        self.assertEqual(checkpoint.balance, balance + 4)
+
+    def test_hr_attendance_read_group_sql(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_attendance_report_theoretical_time.report_sql_hours", "1"
+        )
+        report = self.env["hr.attendance.theoretical.time.report"]
+        report.init()
+        res = report.read_group(
+            [
+                ("date", ">=", "1946-12-23"),
+                ("date", "<", "1946-12-31"),
+                ("employee_id", "in", (self.employee_1.id, self.employee_2.id)),
+            ],
+            [
+                "employee_id",
+                "theoretical_hours:sum",
+                "worked_hours:sum",
+                "difference:sum",
+            ],
+            ["employee_id"],
+        )
+        self.assertEqual(res[0]["theoretical_hours"], 32)
+        self.assertEqual(res[0]["worked_hours"], 32)
+        self.assertEqual(res[0]["difference"], 0)
+        self.assertEqual(res[1]["theoretical_hours"], 24)
+        self.assertEqual(res[1]["worked_hours"], 32)
+        self.assertEqual(res[1]["difference"], 8)
+        # Same values as the Python computation, including leaves
+        self.leave_type.include_in_theoretical = True
+        for employee in (self.employee_1, self.employee_2):
+            for day in range(23, 31):
+                date = datetime.date(1946, 12, day)
+                self.env.cr.execute(
+                    "SELECT hr_attendance_theoretical_hours(%s, %s)",
+                    (employee.id, date),
+                )
+                self.assertEqual(
+                    self.env.cr.fetchone()[0],
+                    report._theoretical_hours(employee, date),
+                )
+
+    def test_hr_attendance_read_group_sql_overlapping_leaves(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_attendance_report_theoretical_time.report_sql_hours", "1"
+        )
+        report = self.env["hr.attendance.theoretical.time.report"]
+        report.init()
+        other_company = self.env["res.company"].create({"name": "Other company"})
+        self.env["resource.calendar.leaves"].create(
+            [
+                {
+                    "name": "Overlapping leave 1",
+                    "resource_id": self.employee_2.resource_id.id,
+                    "date_from": datetime.datetime(1946, 12, 27, 9),
+                    "date_to": datetime.datetime(1946, 12, 27, 11),
+                },
+                {
+                    "name": "Overlapping leave 2",
+                    "resource_id": self.employee_2.resource_id.id,
+                    "date_from": datetime.datetime(1946, 12, 27, 10),
+                    "date_to": datetime.datetime(1946, 12, 27, 12),
+                },
+                {
+                    "name": "Other company closure",
+                    "company_id": other_company.id,
+                    "date_from": datetime.datetime(1946, 12, 27, 14),
+                    "date_to": datetime.datetime(1946, 12, 27, 18),
+                },
+            ]
+        )
+        # The 3 hours covered by both leaves are subtracted once, and the
+        # leave of the other company is ignored
+        self.env.cr.execute(
+            "SELECT hr_attendance_theoretical_hours(%s, %s)",
+            (self.employee_2.id, datetime.date(1946, 12, 27)),
+        )
+        self.assertEqual(self.env.cr.fetchone()[0], 5)
+        row = report.search(
+            [
+                ("date", "=", "1946-12-27"),
+                ("employee_id", "=", self.employee_2.id),
+            ]
+        )
+        self.assertEqual(row.theoretical_hours, 5)
+        self.assertEqual(row.difference, -5)
+
     def test_change_hr_holidays_public(self):
         self.public_holiday_global.line_ids[0].write({"date": "1946-12-23"})
         # 1946-12-23
@@ -243,17 +959,220 @@ class TestHrAttendanceReportTheoreticalTime(TestHrAttendanceReportTheoreticalTim
         self.assertEqual(self.attendances[4].theoretical_hours, 8)
         self.assertEqual(self.attendances[12].theoretical_hours, 8)
 
+    def test_change_hr_holidays_public_country(self):
+        line = self.public_holiday_country.line_ids.filtered(
+            lambda line: not line.state_ids
+        )
+        self.assertEqual(
+            line._get_theoretical_time_ranges(),
+            {(self.employee_2.id, line.date, line.date)},
+        )
+        # Outdated value of employee 1, which is not in the holiday country
+        self.env.cr.execute(
+            "UPDATE hr_attendance SET theoretical_hours = 99 WHERE id = %s",
+            (self.attendances[2].id,),
+        )
+        self.attendances[2].invalidate_recordset(["theoretical_hours"])
+        line.date = "1946-12-26"
+        # EMPLOYEE 2
+        # 1946-12-24
+        self.assertEqual(self.attendances[10].theoretical_hours, 8)
+        # 1946-12-26
+        self.assertEqual(self.attendances[14].theoretical_hours, 0)
+        # EMPLOYEE 1 is not recomputed
+        self.assertEqual(self.attendances[2].theoretical_hours, 99)
+
     def test_change_hr_holidays(self):
         self.leave.action_refuse()
         # 1946-12-26 - Employee 2
         self.assertEqual(self.attendances[14].theoretical_hours, 8)
 
+    def _count_queries(self, function):
+        return measure(self.env, function)[1]
+
+    def test_read_group_query_count(self):
+        """The queries of the report don't grow with the searched days."""
+        report = self.env["hr.attendance.theoretical.time.report"]
+        employees = self.employee_1 | self.employee_2
+        fields = ["theoretical_hours:sum", "worked_hours:sum", "difference:sum"]
+
+        def read_group(date_to):
+            return report.read_group(
+                [
+                    ("employee_id", "in", employees.ids),
+                    ("date", ">=", "1946-12-23"),
+                    ("date", "<=", date_to),
+                ],
+                fields,
+                ["employee_id", "date:day"],
+                lazy=False,
+            )
+
+        count = self._count_queries(lambda: read_group("1946-12-24"))
+        self.assertLessEqual(count, READ_GROUP_MAX_QUERIES)
+        self.assertLessEqual(
+            self._count_queries(lambda: read_group("1946-12-28")),
+            count + QUERY_COUNT_TOLERANCE,
+        )
+
+    def test_leave_recompute_query_count(self):
+        """The queries of the leaves recompute don't grow with the leaves."""
+        leaves = self.HrLeave
+        for day in (6, 7, 8, 9):
+            self.env["hr.attendance"].create(
+                {
+                    "employee_id": self.employee_2.id,
+                    "check_in": f"1947-01-0{day} 08:00:00",
+                    "check_out": f"1947-01-0{day} 12:00:00",
+                }
+            )
+            leave = self.HrLeave.create(
+                {
+                    "date_from": f"1947-01-0{day} 00:00:00",
+                    "date_to": f"1947-01-0{day} 23:59:59",
+                    "request_date_from": f"1947-01-0{day}",
+                    "request_date_to": f"1947-01-0{day}",
+                    "employee_id": self.employee_2.id,
+                    "holiday_status_id": self.leave_type.id,
+                }
+            )
+            leave._compute_date_from_to()
+            leave.action_validate()
+            leaves |= leave
+        count = self._count_queries(leaves[:2]._check_theoretical_hours)
+        self.assertLessEqual(count, LEAVE_RECOMPUTE_MAX_QUERIES)
+        self.assertLessEqual(
+            self._count_queries(leaves._check_theoretical_hours),
+            count + QUERY_COUNT_TOLERANCE,
+        )
+
+    def test_holiday_recompute_query_count(self):
+        """The queries of creating public holiday lines don't grow with the
+        lines.
+        """
+        holidays = self.HrHolidaysPublic.create({"year": 1947})
+        days = [6, 7, 8, 9, 10, 13]
+        self.env["hr.attendance"].create(
+            [
+                {
+                    "employee_id": employee.id,
+                    "check_in": datetime.datetime(1947, 1, day, 8),
+                    "check_out": datetime.datetime(1947, 1, day, 12),
+                }
+                for employee in (self.employee_1, self.employee_2)
+                for day in days
+            ]
+        )
+
+        def create_lines(days):
+            return self.env["hr.holidays.public.line"].create(
+                [
+                    {
+                        "name": "Holiday",
+                        "date": datetime.date(1947, 1, day),
+                        "year_id": holidays.id,
+                    }
+                    for day in days
+                ]
+            )
+
+        count = self._count_queries(lambda: create_lines(days[:2]))
+        self.assertLessEqual(count, HOLIDAY_RECOMPUTE_MAX_QUERIES)
+        self.assertLessEqual(
+            self._count_queries(lambda: create_lines(days[2:])),
+            count + QUERY_COUNT_TOLERANCE,
+        )
+        attendances = self.env["hr.attendance"].search(
+            [("employee_id", "=", self.employee_1.id), ("check_in", ">=", "1947-01-01")]
+        )
+        self.assertEqual(set(attendances.mapped("theoretical_hours")), {0})
+
+    def test_recompute_queue(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "hr_attendance_report_theoretical_time.recompute_async", "1"
+        )
+        queue = self.env["hr.attendance.theoretical.time.queue"]
+        self.public_holiday_global.line_ids[0].write({"date": "1946-12-23"})
+        self.leave.action_refuse()
+        # Nothing is recomputed until the queue is processed
+        self.assertEqual(self.attendances[0].theoretical_hours, 8)
+        self.assertEqual(self.attendances[4].theoretical_hours, 0)
+        self.assertEqual(self.attendances[6].theoretical_hours, 0)
+        ranges = queue._get_ranges()
+        self.assertEqual(len(ranges), 3)
+        self.assertIn(
+            (None, datetime.date(1946, 12, 23), datetime.date(1946, 12, 23)),
+            [range_[:3] for range_ in ranges],
+        )
+        report = self.env["hr.attendance.theoretical.time.report"]
+        rows = report.search(
+            [
+                ("employee_id", "=", self.employee_1.id),
+                ("date", ">=", "1946-12-23"),
+                ("date", "<=", "1946-12-26"),
+            ]
+        )
+        self.assertEqual(
+            rows.filtered("pending_recompute").mapped("date"),
+            [
+                datetime.date(1946, 12, 23),
+                datetime.date(1946, 12, 25),
+                datetime.date(1946, 12, 26),
+            ],
+        )
+        self.assertEqual(
+            report.search(
+                [
+                    ("employee_id", "=", self.employee_1.id),
+                    ("date", ">=", "1946-12-23"),
+                    ("date", "<=", "1946-12-26"),
+                    ("pending_recompute", "=", False),
+                ]
+            ).mapped("date"),
+            [datetime.date(1946, 12, 24)],
+        )
+        # Ranges covered by a pending one are not queued again
+        queue._enqueue(
+            [(None, datetime.date(1946, 12, 23), datetime.date(1946, 12, 23))]
+        )
+        self.assertEqual(len(queue.search([])), 3)
+        queue._cron_process()
+        self.assertFalse(queue.search([]))
+        self.assertEqual(self.attendances[0].theoretical_hours, 0)
+        self.assertEqual(self.attendances[4].theoretical_hours, 8)
+        self.assertEqual(self.attendances[6].theoretical_hours, 8)
+        self.assertFalse(rows.filtered("pending_recompute"))
+
+    def test_recompute_queue_merge(self):
+        queue = self.env["hr.attendance.theoretical.time.queue"]
+        employee_id = self.employee_1.id
+        queue._enqueue(
+            [
+                (employee_id, datetime.date(1946, 12, 23), datetime.date(1946, 12, 24)),
+                (employee_id, datetime.date(1946, 12, 25), datetime.date(1946, 12, 26)),
+                (employee_id, datetime.date(1946, 12, 26), datetime.date(1946, 12, 27)),
+                (employee_id, datetime.date(1946, 12, 30), datetime.date(1946, 12, 30)),
+            ]
+        )
+        self.assertEqual(
+            [range_[:3] for range_ in queue._get_ranges()],
+            [
+                (employee_id, datetime.date(1946, 12, 23), datetime.date(1946, 12, 27)),
+                (employee_id, datetime.date(1946, 12, 30), datetime.date(1946, 12, 30)),
+            ],
+        )
+
     def test_hr_holidays_status_include_in_theoretical(self):
         obj = self.env["hr.attendance.theoretical.time.report"]
         self.leave.holiday_status_id.include_in_theoretical = True
         # 1946-12-26 - Employee 1
         a = self.attendances[6]
         self.assertEqual(obj._theoretical_hours(a.employee_id, a.check_in), 8)
+        # The attendances of the leave days are recomputed
+        self.assertEqual(a.theoretical_hours, 8)
+        self.assertEqual(self.attendances[7].theoretical_hours, 8)
+        # Other days are untouched
+        self.assertEqual(self.attendances[4].theoretical_hours, 0)
 
     def test_wizard_theoretical_time(self):
         department = self.env["hr.department"].create({"name": "Department"})
@@ -272,6 +1191,110 @@ class TestHrAttendanceReportTheoreticalTime(TestHrAttendanceReportTheoreticalTim
             report["domain"], [("employee_id", "in", [self.employee_1.id])]
         )
 
+    def test_wizard_theoretical_time_filters(self):
+        department = self.env["hr.department"].create({"name": "Department"})
+        self.employee_1.department_id = department
+        wizard = self.env["wizard.theoretical.time"].create(
+            {
+                "department_id": department.id,
+                "date_from": "1946-12-23",
+                "date_to": "1946-12-27",
+            }
+        )
+        # Without selected employees, nothing is shown
+        self.assertEqual(wizard.view_report()["domain"], [("employee_id", "in", [])])
+        self.assertFalse(wizard._get_employees())
+        # When the filters match too many employees for listing them, they are
+        # used instead, archived employees included
+        with patch(
+            "odoo.addons.hr_attendance_report_theoretical_time.wizards."
+            "wizard_theoretical_time.POPULATE_LIMIT",
+            0,
+        ):
+            wizard.populate()
+        self.assertFalse(wizard.employee_ids)
+        self.assertEqual(wizard.filter_employee_count, 1)
+        self.employee_1.active = False
+        domain = wizard.view_report()["domain"]
+        self.assertEqual(
+            domain,
+            [
+                (
+                    "employee_id",
+                    "any",
+                    [
+                        ("active", "in", [True, False]),
+                        ("department_id", "child_of", department.id),
+                    ],
+                )
+            ],
+        )
+        rows = self.env["hr.attendance.theoretical.time.report"].search(
+            domain + [("date", ">=", "1946-12-23"), ("date", "<=", "1946-12-27")]
+        )
+        self.assertTrue(rows)
+        self.assertEqual(rows.employee_id, self.employee_1)
+        lines = list(wizard._export_lines())
+        self.assertEqual([line[0] for line in lines], [self.employee_1.name])
+        # Changing the filters requires populating them again
+        wizard.department_id = False
+        wizard._onchange_employee_filters()
+        self.assertEqual(wizard.view_report()["domain"], [("employee_id", "in", [])])
+        self.assertFalse(wizard._get_employees())
+
+    def test_wizard_theoretical_time_export(self):
+        wizard = self.env["wizard.theoretical.time"].create(
+            {
+                "employee_ids": [(4, self.employee_1.id)],
+                "date_from": "1946-12-23",
+                "date_to": "1946-12-27",
+            }
+        )
+        report = self.env["hr.attendance.theoretical.time.report"].read_group(
+            [
+                ("date", ">=", "1946-12-23"),
+                ("date", "<=", "1946-12-27"),
+                ("employee_id", "=", self.employee_1.id),
+            ],
+            ["employee_id", "theoretical_hours:sum", "worked_hours:sum"],
+            ["employee_id"],
+        )[0]
+        lines = list(wizard._export_lines())
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0][0], self.employee_1.name)
+        self.assertEqual(lines[0][3], report["theoretical_hours"])
+        self.assertEqual(lines[0][2], report["worked_hours"])
+        wizard.export_by_day = True
+        csv = b"".join(wizard._export_csv()).decode().splitlines()
+        self.assertEqual(len(csv), 6)
+        self.assertIn("1946-12-23", csv[1])
+        self.assertTrue(b"".join(wizard._export_xlsx()).startswith(b"PK"))
+        action = wizard.action_export_csv()
+        self.assertEqual(action["type"], "ir.actions.act_url")
+
+    def test_export_access_rules(self):
+        user = new_test_user(
+            self.env,
+            login="theoretical_time_own_reader",
+            groups="base.group_user,hr_attendance.group_hr_attendance_own_reader",
+        )
+        self.employee_1.user_id = user
+        report = self.env["hr.attendance.theoretical.time.report"]
+        self.assertEqual(
+            report._domain_employee_ids(
+                [("employee_id", "in", [1, 2]), ("employee_id", "=", 2)]
+            ),
+            {2},
+        )
+        rows = report.with_user(user)._export_rows(
+            self.employee_1 | self.employee_2,
+            datetime.date(1946, 12, 23),
+            datetime.date(1946, 12, 27),
+            by_day=True,
+        )
+        # Only the rows of the own employee are exported
+        self.assertEqual({row[0].id for row in rows}, {self.employee_1.id})
+
 
 class TestHrAttendanceReportTheoreticalTimeResource(BaseCommon):
     @classmethod
@@ -432,3 +1455,12 @@ class TestHrAttendanceReportTheoreticalTimeResource(BaseCommon):
         self.assertEqual(hours, 4)
         hours = obj._theoretical_hours(self.employee, datetime.date(2022, 1, 17))
         self.assertEqual(hours, 8)
+
+    def test_theoretical_time_report_two_weeks_batch(self):
+        obj = self.env["hr.attendance.theoretical.time.report"]
+        res = obj._theoretical_hours_batch(
+            self.employee, datetime.date(2022, 1, 10), datetime.date(2022, 1, 17)
+        )
+        self.assertEqual(res[(self.employee.id, datetime.date(2022, 1, 10))], 4)
+        self.assertEqual(res[(self.employee.id, datetime.date(2022, 1, 11))], 0)
+        self.assertEqual(res[(self.employee.id, datetime.date(2022, 1, 17))], 8)
@@ -1,6 +1,6 @@
 # Copyright 2019 Tecnativa - David Vidal
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
-from odoo import fields, models
+from odoo import _, fields, models
 
 
 class RecomputeTheoreticalAttendance(models.TransientModel):
@@ -19,15 +19,63 @@ class RecomputeTheoreticalAttendance(models.TransientModel):
     date_to = fields.Datetime(
         string="To", required=True, help="Recompute attendances up to this date"
     )
+    workers = fields.Integer(
+        default=1,
+        required=True,
+        help="Number of runs of the scheduled action recomputing disjoint sets "
+        "of employees, up to the cron threads of the server.",
+    )
+    dry_run = fields.Boolean(
+        help="Only count the attendances whose theoretical hours would change, "
+        "keeping some of them as examples, without writing anything.",
+    )
 
     def action_recompute(self):
+        """Recompute the attendances through a job run by a scheduled action
+        once the transaction ends, committing each chunk of employees and
+        days, and resumed by it if it's interrupted. With several workers,
+        the employees are split in jobs run by that number of scheduled
+        actions. A dry run is done by a single job the same way, only counting
+        the changes.
+        """
         self.ensure_one()
-        attendances = self.env["hr.attendance"].search(
-            [
-                ("employee_id", "in", self.employee_ids.ids),
-                ("check_in", ">=", self.date_from),
-                ("check_out", "<=", self.date_to),
-            ]
+        jobs = self.env["hr.attendance.theoretical.time.job"]
+        vals = {
+            "name": f"{fields.Datetime.to_string(self.date_from)} - "
+            f"{fields.Datetime.to_string(self.date_to)}",
+            "dry_run": self.dry_run,
+        }
+        workers = 1 if self.dry_run else jobs._get_max_workers(self.workers)
+        if workers > 1:
+            jobs = jobs._create_partitions(
+                self.employee_ids,
+                self.date_from.date(),
+                self.date_to.date(),
+                workers,
+                **vals,
+            )
+            jobs._trigger_workers(workers)
+            return {
+                "type": "ir.actions.act_window",
+                "name": _("Theoretical Hours Recomputations"),
+                "res_model": jobs._name,
+                "domain": [("id", "in", jobs.ids)],
+                "view_mode": "tree,form",
+                "target": "current",
+            }
+        job = jobs.create(
+            dict(
+                vals,
+                employee_ids=[(6, 0, self.employee_ids.ids)],
+                date_from=self.date_from.date(),
+                date_to=self.date_to.date(),
+            )
         )
-        attendances._compute_theoretical_hours()
-        return {"type": "ir.actions.act_window_close"}
+        job._trigger_workers(1)
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": job._name,
+            "res_id": job.id,
+            "view_mode": "form",
+            "target": "current",
+        }
@@ -2,7 +2,19 @@
 # Copyright 2021 Tecnativa - Víctor Martínez
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import csv
+import io
+import tempfile
+
+import xlsxwriter
+
 from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools import date_utils
+
+# Employees listed by the populate button, above which the filters are used as
+# the selection instead of the list
+POPULATE_LIMIT = 500
 
 
 class WizardTheoreticalTime(models.TransientModel):
@@ -13,6 +25,20 @@ class WizardTheoreticalTime(models.TransientModel):
 
     department_id = fields.Many2one(comodel_name="hr.department", string="Department")
     category_ids = fields.Many2many(comodel_name="hr.employee.category", string="Tag")
+    filter_employee_count = fields.Integer(
+        readonly=True,
+        help="Employees matching the filters, when they are too many for listing them.",
+    )
+    date_from = fields.Date(
+        string="Export From",
+        default=lambda self: date_utils.start_of(
+            fields.Date.context_today(self), "year"
+        ),
+    )
+    date_to = fields.Date(string="Export To", default=fields.Date.context_today)
+    export_by_day = fields.Boolean(
+        help="Export a line per employee and day instead of the totals per employee.",
+    )
 
     @api.model
     def default_get(self, fields):
@@ -26,6 +52,11 @@ class WizardTheoreticalTime(models.TransientModel):
                 res["department_id"] = department.id
         return res
 
+    @api.onchange("department_id", "category_ids")
+    def _onchange_employee_filters(self):
+        # The filters are used as selection only after populating them
+        self.filter_employee_count = 0
+
     def _prepare_employee_domain(self):
         res = []
         if self.category_ids:
@@ -35,8 +66,19 @@ class WizardTheoreticalTime(models.TransientModel):
         return res
 
     def populate(self):
+        """List the employees matching the filters, unless they are more than
+        `POPULATE_LIMIT`. Then the list is left empty, and the report and the
+        export are done for the filters.
+        """
         domain = self._prepare_employee_domain()
-        self.employee_ids = self.env["hr.employee"].search(domain)
+        employees = self.env["hr.employee"].search(domain, limit=POPULATE_LIMIT + 1)
+        count = 0
+        if len(employees) > POPULATE_LIMIT:
+            count = self.env["hr.employee"].search_count(domain)
+            employees = employees.browse()
+        self.write(
+            {"employee_ids": [(6, 0, employees.ids)], "filter_employee_count": count}
+        )
         action = {
             "name": _("Select Employees to Analyze Theoretical Time"),
             "type": "ir.actions.act_window",
@@ -53,10 +95,121 @@ class WizardTheoreticalTime(models.TransientModel):
         action = self.env["ir.actions.act_window"]._for_xml_id(
             "hr_attendance_report_theoretical_time.hr_attendance_theoretical_action"
         )
-        action["domain"] = [
-            ("employee_id", "in", self.with_context(active_test=False).employee_ids.ids)
-        ]
+        action["domain"] = self._get_report_domain()
         action[
             "context"
         ] = "{'search_default_previous_month': 1, 'search_default_current_month': 1}"
         return action
+
+    def _get_filter_domain(self):
+        """Domain of the employees matching the filters, archived ones
+        included as for the selected employees, when populating them left
+        the list empty because they are too many, or False otherwise, as
+        then only the selected employees are used.
+        """
+        if self.employee_ids or not self.filter_employee_count:
+            return False
+        # The `active` leaf disables the implicit filter on active records
+        return [("active", "in", [True, False])] + self._prepare_employee_domain()
+
+    def _get_report_domain(self):
+        """Domain of the report on the selected employees, or on the filters
+        when they match too many employees for listing them, which is
+        resolved with a subquery on the employees, so its size doesn't
+        depend on how many of them match.
+        """
+        domain = self._get_filter_domain()
+        if domain:
+            return [("employee_id", "any", domain)]
+        employees = self.with_context(active_test=False).employee_ids
+        return [("employee_id", "in", employees.ids)]
+
+    def _get_employees(self):
+        """Get the selected employees, or the ones matching the filters when
+        they are too many for listing them.
+        """
+        domain = self._get_filter_domain()
+        if domain:
+            return self.env["hr.employee"].search(domain)
+        return self.with_context(active_test=False).employee_ids
+
+    def _action_export(self, file_format):
+        self.ensure_one()
+        if not self.date_from or not self.date_to:
+            raise UserError(_("Set the dates of the period to export."))
+        domain = self._get_filter_domain()
+        if not self.employee_ids and not (
+            domain and self.env["hr.employee"].search_count(domain, limit=1)
+        ):
+            raise UserError(_("Select the employees to export."))
+        return {
+            "type": "ir.actions.act_url",
+            "url": f"/hr_attendance_report_theoretical_time/export/{self.id}/"
+            f"{file_format}",
+            "target": "new",
+        }
+
+    def action_export_csv(self):
+        return self._action_export("csv")
+
+    def action_export_xlsx(self):
+        return self._action_export("xlsx")
+
+    def _export_header(self):
+        header = [_("Employee"), _("Department")]
+        if self.export_by_day:
+            header.append(_("Date"))
+        return header + [_("Worked"), _("Theoretical"), _("Difference")]
+
+    def _export_lines(self):
+        """Generate the exported lines as lists of values, as they are
+        computed by the report.
+        """
+        report = self.env["hr.attendance.theoretical.time.report"]
+        rows = report._export_rows(
+            self._get_employees(),
+            self.date_from,
+            self.date_to,
+            by_day=self.export_by_day,
+        )
+        for employee, department, date, worked, theoretical, difference in rows:
+            line = [employee.name, department.name or ""]
+            if self.export_by_day:
+                line.append(date)
+            yield line + [worked, theoretical, difference]
+
+    def _export_csv(self, flush_lines=1000):
+        """Generate the CSV export in blocks of bytes."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self._export_header())
+        for count, line in enumerate(self._export_lines(), start=1):
+            writer.writerow(line)
+            if not count % flush_lines:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+
+    def _export_xlsx(self, block_size=65536):
+        """Generate the XLSX export in blocks of bytes. The workbook is written
+        in constant memory mode to a temporary file, which is then streamed.
+        """
+        with tempfile.TemporaryFile() as output:
+            workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+            worksheet = workbook.add_worksheet(_("Theoretical Time"))
+            bold = workbook.add_format({"bold": True})
+            date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+            hours_format = workbook.add_format({"num_format": "0.00"})
+            worksheet.write_row(0, 0, self._export_header(), bold)
+            for row, line in enumerate(self._export_lines(), start=1):
+                for col, value in enumerate(line):
+                    if isinstance(value, float):
+                        worksheet.write_number(row, col, value, hours_format)
+                    elif col == 2 and self.export_by_day:
+                        worksheet.write_datetime(row, col, value, date_format)
+                    else:
+                        worksheet.write_string(row, col, value)
+            workbook.close()
+            output.seek(0)
+            yield from iter(lambda: output.read(block_size), b"")